@@ -0,0 +1,146 @@
+import math
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion
+
+# Chỉ mục ngược theo thuộc tính object: màu lượng tử hóa, nhóm kích thước (theo
+# log2 của rộng, cao) và ô lưới chứa tâm. Mỗi khóa trỏ tới danh sách (tên ảnh,
+# vị trí object) có thuộc tính đó, nên việc tìm object gần một object cho trước
+# chỉ đọc vài danh sách thay vì duyệt mọi object của mọi ảnh.
+
+ATTRIBUTES = ("color", "size", "cell")
+
+Posting = Tuple[str, int]  # (tên ảnh, vị trí object trong ImageMeta.objects)
+
+
+class AttributeMatch(NamedTuple):
+    """Một object tìm được và số thuộc tính khớp với object truy vấn"""
+    image: str
+    index: int
+    score: int
+
+
+class AttributeIndex:
+    """Chỉ mục ngược (thuộc tính, giá trị) -> các object, tự cập nhật theo sự kiện của db"""
+
+    def __init__(self, db: ImageDatabase, color_step=32, cell_size=100):
+        if color_step <= 0 or cell_size <= 0:
+            raise ValueError("color_step va cell_size phai duong")
+        self.db = db
+        self.color_step = color_step
+        self.cell_size = cell_size
+        self.postings: Dict[Tuple[str, Hashable], Set[Posting]] = {}
+        self._image_keys: Dict[str, List[Tuple[Posting, List[Tuple[str, Hashable]]]]] = {}
+        for name, image in db.images.items():
+            self._add(name, image)
+        db.add_listener(self.on_change)
+
+    def on_change(self, event: str, name: str, image: Optional[ImageMeta]):
+        self._remove(name)
+        if event in ("add", "update"):
+            self._add(name, image)
+
+    def close(self):
+        self.db.remove_listener(self.on_change)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._image_keys.values())
+
+    def keys(self, obj: ImageObjectRegion) -> List[Tuple[str, Hashable]]:
+        """Các khóa (thuộc tính, giá trị) của object theo thứ tự ATTRIBUTES"""
+        color = tuple(c // self.color_step for c in obj.color)
+        size = (self._bucket(obj.x2 - obj.x1), self._bucket(obj.y2 - obj.y1))
+        cell = (int((obj.x1 + obj.x2) / 2 // self.cell_size), int((obj.y1 + obj.y2) / 2 // self.cell_size))
+        return [("color", color), ("size", size), ("cell", cell)]
+
+    @staticmethod
+    def _bucket(length) -> int:
+        """Nhóm kích thước: các độ dài trong [2^b, 2^(b+1)) cùng nhóm b (-1 nếu không dương)"""
+        return int(math.floor(math.log2(length))) if length > 0 else -1
+
+    def _add(self, name: str, image: ImageMeta):
+        entries = []
+        for index, obj in enumerate(image.objects):
+            posting = (name, index)
+            keys = self.keys(obj)
+            for key in keys:
+                self.postings.setdefault(key, set()).add(posting)
+            entries.append((posting, keys))
+        self._image_keys[name] = entries
+
+    def _remove(self, name: str):
+        for posting, keys in self._image_keys.pop(name, ()):
+            for key in keys:
+                bucket = self.postings.get(key)
+                if bucket is None:
+                    continue
+                bucket.discard(posting)
+                if not bucket:
+                    del self.postings[key]
+
+    def _neighbours(self, key: Tuple[str, Hashable], radius: int) -> Iterable[Tuple[str, Hashable]]:
+        """Khóa key và các khóa liền kề (nhóm kích thước, ô lưới) trong phạm vi radius"""
+        attribute, value = key
+        if attribute == "color" or radius <= 0:
+            yield key
+            return
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                yield attribute, (value[0] + dx, value[1] + dy)
+
+    def _posting_lists(self, obj: ImageObjectRegion, attributes, radius) -> List[Set[Posting]]:
+        lists = []
+        for key in self.keys(obj):
+            if key[0] not in attributes:
+                continue
+            found = [self.postings[k] for k in self._neighbours(key, radius) if k in self.postings]
+            lists.append(found[0] if len(found) == 1 else set().union(*found))
+        return lists
+
+    def query(self, obj: ImageObjectRegion, min_match: Optional[int] = None, radius=0,
+              attributes=ATTRIBUTES, exclude: Optional[str] = None, limit: Optional[int] = None
+              ) -> List[AttributeMatch]:
+        """Các object khớp ít nhất min_match thuộc tính với obj (mặc định tất cả), xếp theo số thuộc tính khớp.
+
+        radius > 0 coi các nhóm kích thước và ô lưới lân cận là khớp; exclude bỏ qua một ảnh.
+        """
+        unknown = set(attributes) - set(ATTRIBUTES)
+        if unknown:
+            raise ValueError(f"thuoc tinh khong hop le: {sorted(unknown)}")
+        lists = sorted(self._posting_lists(obj, attributes, radius), key=len)
+        need = len(lists) if min_match is None else min_match
+        if need <= 0 or need > len(lists):
+            return []
+
+        scores: Dict[Posting, int] = {}
+        if need == len(lists):
+            # Giao đầy đủ: bắt đầu từ danh sách ngắn nhất
+            matched = set(lists[0])
+            for postings in lists[1:]:
+                matched.intersection_update(postings)
+                if not matched:
+                    break
+            scores = dict.fromkeys(matched, len(lists))
+        else:
+            # Một object chỉ có thể đạt need nếu có mặt trong một trong (số danh sách - need + 1)
+            # danh sách ngắn nhất, nên chỉ lấy ứng viên từ các danh sách đó
+            candidates = set().union(*lists[:len(lists) - need + 1])
+            for posting in candidates:
+                scores[posting] = sum(posting in postings for postings in lists)
+
+        matches = [AttributeMatch(name, index, score) for (name, index), score in scores.items()
+                   if score >= need and name != exclude]
+        matches.sort(key=lambda m: (-m.score, m.image, m.index))
+        return matches if limit is None else matches[:limit]
+
+    def images(self, obj: ImageObjectRegion, **kwargs) -> List[Tuple[str, int]]:
+        """Các ảnh có object khớp với obj kèm số thuộc tính khớp tốt nhất, xếp giảm dần"""
+        limit = kwargs.pop("limit", None)
+        best: Dict[str, int] = {}
+        for match in self.query(obj, **kwargs):
+            best[match.image] = max(best.get(match.image, 0), match.score)
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def object(self, match: AttributeMatch) -> ImageObjectRegion:
+        return self.db.images[match.image].objects[match.index]
@@ -0,0 +1,142 @@
+"""Đo hiệu năng ObjectConvertor.convert trên một bộ cặp object cố định.
+
+Bộ cặp object đi từ trường hợp tầm thường (hai object giống nhau), qua các
+trường hợp chỉ cần một phép biến đổi, tới các trường hợp cần nhiều phép biến
+đổi liên tiếp; tất cả dùng thư viện data/*.json đi kèm. Với mỗi trường hợp in
+ra thời gian (tốt nhất sau --repeat lần), số nút mở rộng, bộ nhớ đỉnh và chi
+phí lời giải, và ghi kết quả dạng JSON để so sánh giữa các commit.
+
+Chạy từ thư mục gốc của dự án:
+    python benchmarks/bench_convert.py [--repeat 3] [--algorithm astar] [--output results.json]
+    python benchmarks/bench_convert.py --compare results_cu.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cost_function_server import CostFunctionServer
+from object_converter import ObjectConvertor
+from object_manager import ImageObjectRegion
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+
+# (tên, object đầu, object đích)
+CORPUS = [
+    ("identical", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                  ImageObjectRegion("b", 100, 100, 200, 200, (0, 0, 255))),
+    ("paint", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+              ImageObjectRegion("b", 100, 100, 200, 200, (0, 255, 0))),
+    ("translate", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                  ImageObjectRegion("b", 200, 200, 300, 300, (0, 0, 255))),
+    ("scale", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+              ImageObjectRegion("b", 50, 50, 250, 250, (0, 0, 255))),
+    ("paint+scale", ImageObjectRegion("a", 400, 200, 500, 300, (0, 255, 0)),
+                    ImageObjectRegion("b", 400, 200, 500, 400, (255, 0, 255))),
+    ("translate x3", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                     ImageObjectRegion("b", 300, 400, 400, 500, (0, 0, 255))),
+    ("paint+translate x4", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                           ImageObjectRegion("b", 400, 500, 500, 600, (255, 255, 255))),
+    ("translate+scale", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                        ImageObjectRegion("b", 300, 300, 500, 500, (0, 0, 255))),
+    ("paint+translate+scale", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                              ImageObjectRegion("b", 300, 200, 400, 400, (255, 0, 255))),
+]
+
+
+def build_convertor(open_list="heapq", batched=False):
+    tlm = TransformationLibraryManager()
+    for op in create_default_object_operators():
+        tlm.TLMinsert(op)
+    cfs = CostFunctionServer(os.path.join(ROOT, "data", "cost_function.json"))
+    return ObjectConvertor(tlm, cfs, os.path.join(ROOT, "data", "transformations.json"), open_list=open_list,
+                          batched=batched)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(convertor, o1, o2, options, repeat):
+    best_time = float("inf")
+    for _ in range(repeat):
+        plan, stats = convertor.convert(o1, o2, return_stats=True, **options)
+        best_time = min(best_time, stats.total_time)
+
+    # Đo bộ nhớ ở một lần chạy riêng vì tracemalloc làm chậm đáng kể
+    tracemalloc.start()
+    convertor.convert(o1, o2, **options)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    solved = isinstance(plan, list)  # None hoặc BoundExceeded đều là chưa giải được
+    return {
+        "time_ms": best_time * 1000,
+        "expanded": stats.expanded,
+        "generated": stats.generated,
+        "peak_open": stats.peak_open,
+        "peak_memory_kb": peak / 1024,
+        "solved": solved,
+        "plan_length": len(plan) if solved else None,
+        "cost": convertor.plan_cost(o1, plan) if solved else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--algorithm", default="astar")
+    parser.add_argument("--open-list", default="heapq")
+    parser.add_argument("--max-steps", type=int, default=5000)
+    parser.add_argument("--batched", action="store_true", help="mở rộng nút theo nhóm bằng NumPy")
+    parser.add_argument("--output", help="ghi kết quả JSON vào file này")
+    parser.add_argument("--compare", help="file JSON của lần chạy trước để so sánh")
+    args = parser.parse_args()
+
+    options = {"algorithm": args.algorithm, "max_steps": args.max_steps}
+    convertor = build_convertor(args.open_list, args.batched)
+    convertor.heuristic_model  # dựng trước danh sách phép biến đổi và heuristic
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = {case["name"]: case for case in json.load(f)["cases"]}
+
+    print(f"{'case':<24}{'time':>12}{'expanded':>10}{'peak mem':>12}{'cost':>10}" + ("   vs before" if previous else ""))
+    cases = []
+    for name, o1, o2 in CORPUS:
+        result = {"name": name, **run_case(convertor, o1, o2, options, args.repeat)}
+        cases.append(result)
+        cost = "-" if result["cost"] is None else f"{result['cost']:.3f}"
+        row = (f"{name:<24}{result['time_ms']:>10.2f}ms{result['expanded']:>10}"
+               f"{result['peak_memory_kb']:>10.0f}KB{cost:>10}")
+        before = previous.get(name)
+        if before and before["time_ms"] > 0:
+            row += f"   x{result['time_ms'] / before['time_ms']:.2f} time, {before['expanded']} -> {result['expanded']} expanded"
+        print(row)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "options": {**options, "open_list": args.open_list, "batched": args.batched, "repeat": args.repeat},
+        "cases": cases,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Đã ghi kết quả vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""So sánh các open list của ObjectConvertor trên thư viện phép biến đổi đi kèm.
+
+Chạy từ thư mục gốc của dự án:
+    python benchmarks/bench_open_lists.py [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cost_function_server import CostFunctionServer
+from object_converter import ObjectConvertor
+from object_manager import ImageObjectRegion
+from open_list import OPEN_LISTS
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+
+CASES = [
+    ("paint", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+              ImageObjectRegion("b", 100, 100, 200, 200, (0, 255, 0))),
+    ("paint+scale", ImageObjectRegion("a", 400, 200, 500, 300, (0, 255, 0)),
+                    ImageObjectRegion("b", 400, 200, 500, 400, (255, 0, 255))),
+    ("translate", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                  ImageObjectRegion("b", 300, 400, 400, 500, (0, 0, 255))),
+    ("translate+scale", ImageObjectRegion("a", 100, 100, 200, 200, (0, 0, 255)),
+                        ImageObjectRegion("b", 300, 300, 500, 500, (0, 0, 255))),
+]
+
+
+def build_convertor(open_list):
+    tlm = TransformationLibraryManager()
+    for op in create_default_object_operators():
+        tlm.TLMinsert(op)
+    cfs = CostFunctionServer(os.path.join(ROOT, "data", "cost_function.json"))
+    return ObjectConvertor(tlm, cfs, os.path.join(ROOT, "data", "transformations.json"), open_list=open_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<18}" + "".join(f"{name:>12}" for name in OPEN_LISTS))
+    for case_name, o1, o2 in CASES:
+        row = f"{case_name:<18}"
+        for name in OPEN_LISTS:
+            convertor = build_convertor(name)
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                convertor.convert(o1, o2)
+                best = min(best, time.perf_counter() - start)
+            row += f"{best * 1000:>10.2f}ms"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
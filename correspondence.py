@@ -0,0 +1,136 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from object_manager import ImageObjectRegion, ObjectState
+from object_converter import ObjectConvertor
+from parallel_convertor import ConversionPool, ObjectConversion, convert_pair
+from feature_filter import object_bounds
+
+# Ghép object giữa hai ảnh sao cho tổng chi phí chuyển đổi nhỏ nhất.
+# Ma trận chi phí ban đầu là cận dưới (heuristic A*) của mọi cặp; bài toán gán
+# được giải trên ma trận đó, các cặp được chọn mà chưa chạy A* thì chạy A* và thay
+# cận dưới bằng chi phí thật, lặp lại đến khi mọi cặp được chọn đều là chi phí
+# thật. Khi đó không cách ghép nào khác rẻ hơn vì chi phí của nó không nhỏ hơn
+# tổng các cận dưới.
+
+
+def lower_bound_matrix(converter: ObjectConvertor, objects1: Sequence[ImageObjectRegion],
+                       objects2: Sequence[ImageObjectRegion]) -> np.ndarray:
+    """Ma trận N x M các cận dưới chi phí chuyển object i của ảnh 1 thành object j của ảnh 2"""
+    states1 = np.array([ObjectState.from_region(o) for o in objects1], dtype=np.int64).reshape(-1, 5)
+    states2 = np.array([ObjectState.from_region(o) for o in objects2], dtype=np.int64).reshape(-1, 5)
+    return object_bounds(converter.heuristic_model, states1[:, :4], states1[:, 4], states2[:, :4], states2[:, 4])
+
+
+def solve_assignment(cost) -> List[int]:
+    """Thuật toán Hungary (đường tăng ngắn nhất có thế vị), O(n^2 m) với n <= m.
+
+    Trả về cột được gán cho từng hàng. Ô vô cùng được thay bằng một số đủ lớn nên
+    chỉ bị chọn khi không còn cách gán nào khác.
+    """
+    cost = np.asarray(cost, dtype=float)
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("Số hàng không được lớn hơn số cột")
+    finite = np.isfinite(cost)
+    big = (np.abs(cost[finite]).sum() + 1.0) * (n + 1) if finite.any() else 1.0
+    cost = np.where(finite, cost, big)
+
+    # Chỉ số 1..n / 1..m, cột 0 là cột giả dùng khi bắt đầu mỗi hàng
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)  # hàng đang được gán cho cột j (0 = chưa gán)
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, math.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], math.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def match_objects(converter: ObjectConvertor, objects1: Sequence[ImageObjectRegion],
+                  objects2: Sequence[ImageObjectRegion], pool: Optional[ConversionPool] = None,
+                  cutoff=math.inf, **options) -> Optional[List[ObjectConversion]]:
+    """Ghép object của hai ảnh với tổng chi phí nhỏ nhất, chỉ chạy A* trên các cặp cần thiết.
+
+    Kết quả theo thứ tự object của ảnh 1, target_index là vị trí object tương ứng ở
+    ảnh 2. Nếu có pool, các cặp cần chạy A* trong mỗi vòng được chuyển đổi song song.
+    Trả về None (dừng sớm) khi đã chắc chắn tổng chi phí không nhỏ hơn cutoff; khi đó
+    mỗi cặp được tìm kiếm với max_cost là phần cutoff còn lại sau cận dưới của các cặp
+    khác, cặp vượt ngưỡng chỉ nâng cận dưới và được tìm kiếm đầy đủ nếu lại được chọn.
+    Cặp dừng vì max_expansions được coi là không chuyển được (chi phí inf).
+    """
+    if len(objects1) != len(objects2):
+        raise ValueError("Hai ảnh phải có cùng số lượng object")
+    bounds = lower_bound_matrix(converter, objects1, objects2)
+    exact = np.zeros(bounds.shape, dtype=bool)
+    bounded = np.zeros(bounds.shape, dtype=bool)  # đã tìm kiếm có ngưỡng và vượt ngưỡng
+    results: Dict[Tuple[int, int], ObjectConversion] = {}
+
+    while True:
+        assignment = solve_assignment(bounds)
+        total = sum(bounds[i, j] for i, j in enumerate(assignment))
+        if cutoff < math.inf and total >= cutoff:
+            return None
+        todo = [(i, j) for i, j in enumerate(assignment) if not exact[i, j]]
+        if not todo:
+            break
+        limits = [cutoff - (total - bounds[i, j]) if cutoff < math.inf and not bounded[i, j] else math.inf
+                  for i, j in todo]
+        conversions = _convert_pairs(converter, objects1, objects2, todo, limits, pool, options)
+        for (i, j), limit, conversion in zip(todo, limits, conversions):
+            conversion = conversion._replace(target_index=j)
+            # Cận dưới nhỏ hơn ngưỡng nghĩa là dừng vì max_expansions: tìm lại cũng không hơn,
+            # nên coi như không chuyển được giống khi hết max_steps
+            if conversion.lower_bound is not None and conversion.lower_bound >= limit:
+                bounds[i, j] = max(bounds[i, j], conversion.lower_bound)
+                bounded[i, j] = True
+                continue
+            results[i, j] = conversion
+            bounds[i, j] = math.inf if conversion.plan is None else conversion.cost
+            exact[i, j] = True
+
+    return [results[i, j] for i, j in enumerate(assignment)]
+
+
+def _convert_pairs(converter, objects1, objects2, pairs, limits, pool, options) -> List[ObjectConversion]:
+    options = [options if limit == math.inf else {**options, "max_cost": limit} for limit in limits]
+    if pool is None:
+        return [convert_pair(converter, i, objects1[i], objects2[j], opts) for (i, j), opts in zip(pairs, options)]
+    futures = [pool.submit(objects1[i], objects2[j], i, **opts) for (i, j), opts in zip(pairs, options)]
+    results = []
+    for (i, j), future in zip(pairs, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(ObjectConversion(i, objects1[i].obj_id, objects2[j].obj_id, None, None, str(e)))
+    return results
@@ -1,10 +1,41 @@
+import hashlib
 import json
+import keyword
 import math
 import os
 import numpy as np
 import math
 import re
 
+# Các tên hàm được phép dùng trong công thức (không phải biến)
+RESERVED_NAMES = {"diff", "sqrt", "cbrt", "fourthrt", "sum", "rgb_to_val", "abs"}
+
+
+class CompiledCostFunction:
+    """Hàm chi phí đã biên dịch sẵn: code object và danh sách biến cần thiết"""
+
+    __slots__ = ("name", "type", "formula", "code", "required_vars", "error")
+
+    def __init__(self, func: dict):
+        self.name = func["name"]
+        self.type = func["type"]
+        self.formula = func["formula"]
+        all_vars = re.findall(r"\b[a-zA-Z_][a-zA-Z0-9_]*\b", self.formula)
+        # Bỏ từ khóa (if, else, for, in, ...) của công thức có nhánh điều kiện hay biểu thức sinh
+        self.required_vars = frozenset(v for v in all_vars if v not in RESERVED_NAMES and not keyword.iskeyword(v))
+        # Lỗi cú pháp được giữ lại và báo khi gọi, giống như khi eval trực tiếp
+        try:
+            self.code = compile(self.formula, f"<cost:{self.name}>", "eval")
+            self.error = None
+        except SyntaxError as e:
+            self.code = None
+            self.error = e
+
+    def __reduce__(self):
+        # code object không pickle được: gửi lại công thức và biên dịch ở tiến trình nhận
+        return (CompiledCostFunction, ({"name": self.name, "type": self.type, "formula": self.formula},))
+
+
 class CostFunctionServer:
     def __init__(self, path="data/cost_function.json"):
         self.path = path
@@ -13,10 +44,70 @@ class CostFunctionServer:
             with open(self.path, "w") as f:
                 json.dump([], f)
 
+        self.helpers = {
+            "diff": self.diff,
+            "abs": abs,
+            "sqrt": math.sqrt,
+            "cbrt": self.cbrt,
+            "fourthrt": self.fourthrt,
+            "sum": sum,  # Hỗ trợ hàm sum cho toán tử ∑
+            "rgb_to_val": self.rgb_to_val,
+        }
+        # Phiên bản của các hàm trên mảng NumPy, dùng cho EvaluateBatch
+        self.array_helpers = {
+            "diff": self.diff_array,
+            "abs": np.abs,
+            "sqrt": np.sqrt,
+            "cbrt": self.cbrt,
+            "fourthrt": self.fourthrt,
+            "rgb_to_val": self.rgb_to_val_array,
+        }
+        # Bộ nhớ đệm thư viện: chỉ đọc lại khi mtime hoặc nội dung file thay đổi
+        self.version = 0
+        self._mtime = None
+        self._digest = None
+        self._functions = []
+        self._index = {}
+        self.reload()
+
+    def reload(self, force=False):
+        """Đọc lại file thư viện nếu mtime hoặc mã băm nội dung đã thay đổi"""
+        mtime = os.stat(self.path).st_mtime_ns
+        if not force and mtime == self._mtime:
+            return False
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        self._mtime = mtime
+        digest = hashlib.sha1(raw).hexdigest()
+        if not force and digest == self._digest:
+            return False
+        self._digest = digest
+        self._set_functions(json.loads(raw))
+        return True
+
+    def _set_functions(self, data):
+        index = {}
+        for func in data:
+            # Giữ hàm đầu tiên của mỗi kiểu, giống thứ tự duyệt trước đây
+            index.setdefault(func["type"], CompiledCostFunction(func))
+        self._functions = data
+        self._index = index
+        self.version += 1
+
+    def get_cost_functions(self):
+        """Danh sách các hàm chi phí hiện có trong thư viện"""
+        self.reload()
+        return list(self._functions)
+
+    def get_cost_function(self, type_: str):
+        """Hàm chi phí đã biên dịch theo kiểu phép biến đổi, hoặc None"""
+        self.reload()
+        return self._index.get(type_)
+
     def CostInsert(self, cost_func: dict):
         """Thêm hàm chi phí mới vào thư viện, nếu chưa có"""
-        with open(self.path, "r") as f:
-            data = json.load(f)
+        self.reload()
+        data = self._functions
 
         for existing_func in data:
             if existing_func["name"].lower() == cost_func["name"].lower():
@@ -28,10 +119,16 @@ class CostFunctionServer:
                     f"Hàm chi phí với kiểu '{cost_func['type']}' đã tồn tại."
                 )
 
-        data.append(cost_func)
+        data = data + [cost_func]
         with open(self.path, "w") as f:
             json.dump(data, f, indent=4)
 
+        # Cập nhật chỉ mục trong bộ nhớ, tránh đọc lại file vừa ghi
+        with open(self.path, "rb") as f:
+            self._digest = hashlib.sha1(f.read()).hexdigest()
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._set_functions(data)
+
     def diff(self, color1: str, color2: str) -> int:
         """Hàm diff: 0 nếu màu giống, 3 nếu khác"""
         return 0 if color1 == color2 else 3
@@ -66,38 +163,93 @@ class CostFunctionServer:
         # print(f"--- Giá trị: {0.299 * r + 0.587 * g + 0.114 * b} ---")
         return 0.299 * r + 0.587 * g + 0.114 * b
 
+    def diff_array(self, color1, color2):
+        """diff trên mảng màu (k, 3) hoặc một màu (r, g, b): 0 nếu giống, 3 nếu khác"""
+        same = np.all(np.asarray(color1) == np.asarray(color2), axis=-1)
+        return np.where(same, 0, 3)
+
+    @staticmethod
+    def rgb_to_val_array(color):
+        """rgb_to_val trên mảng màu (k, 3) hoặc một màu (r, g, b)"""
+        color = np.asarray(color, dtype=float)
+        if color.shape[-1:] != (3,):
+            raise ValueError(f"gia tri mau co kich thuoc {color.shape}, phai la 3 phan tu (r, g, b)")
+        return 0.299 * color[..., 0] + 0.587 * color[..., 1] + 0.114 * color[..., 2]
+
     def EvaluateCall(self, operator: dict):
         """Tính chi phí của một phép biến đổi"""
+        func = self.get_cost_function(operator["type"])
+        if func is None:
+            raise ValueError(f"khong tim thay cong thuc cho kieu {operator['type']}")
+        return self.evaluate_compiled(func, operator["params"])
+
+    def evaluate_compiled(self, func: CompiledCostFunction, params: dict):
+        """Tính chi phí với hàm đã biên dịch và bộ tham số cho trước"""
+        try:
+            if func.error is not None:
+                raise func.error
+            # Kiểm tra các biến cần thiết
+            missing_vars = func.required_vars.difference(params)
+            if missing_vars:
+                raise ValueError(f"thieu cac bien: {', '.join(missing_vars)}")
+
+            local_env = dict(params)
+            local_env.update(self.helpers)
+            return eval(func.code, {}, local_env)
+        except NameError as e:
+            raise RuntimeError(f"loi: bien hoac ham khong xac dinh: {e}")
+        except Exception as e:
+            raise RuntimeError(f"loi khi tinh toan cong thuc: {e}")
+
+    def EvaluateBatch(self, type_: str, params: dict) -> np.ndarray:
+        """Tính chi phí cho nhiều bộ tham số của cùng một kiểu phép biến đổi.
+
+        params ánh xạ tên biến -> cột giá trị (mảng hoặc list, phần tử thứ i thuộc bộ
+        tham số thứ i; màu là mảng (k, 3)); tuple, chuỗi và số được dùng chung cho mọi
+        bộ. Trả về mảng chi phí, nan ở vị trí không tính được.
+        """
+        func = self.get_cost_function(type_)
+        if func is None:
+            raise ValueError(f"khong tim thay cong thuc cho kieu {type_}")
+        return self.evaluate_batch(func, params)
 
-        with open(self.path, "r") as f:
-            cost_functions = json.load(f)
-
-        for func in cost_functions:
-            if func["type"] == operator["type"]:
-                try:
-                    local_env = dict(operator["params"])
-                    local_env["diff"] = self.diff
-                    local_env["abs"] = abs
-                    local_env["sqrt"] = math.sqrt
-                    local_env["cbrt"] = self.cbrt
-                    local_env["fourthrt"] = self.fourthrt
-                    local_env["sum"] = sum  # Hỗ trợ hàm sum cho toán tử ∑
-                    local_env["rgb_to_val"] = self.rgb_to_val
-
-                    # Kiểm tra các biến cần thiết
-                    all_vars = re.findall(
-                        r"\b[a-zA-Z_][a-zA-Z0-9_]*\b", func["formula"]
-                    )
-                    reserved = {"diff", "sqrt", "cbrt", "fourthrt", "sum", "rgb_to_val", "abs"}
-                    required_vars = set(v for v in all_vars if v not in reserved)
-                    missing_vars = required_vars - set(operator["params"].keys())
-                    if missing_vars:
-                        raise ValueError(f"thieu cac bien: {', '.join(missing_vars)}")
-
-                    cost = eval(func["formula"], {}, local_env)
-                    return cost
-                except NameError as e:
-                    raise RuntimeError(f"loi: bien hoac ham khong xac dinh: {e}")
-                except Exception as e:
-                    raise RuntimeError(f"loi khi tinh toan cong thuc: {e}")
-        raise ValueError(f"khong tim thay cong thuc cho kieu {operator['type']}")
+    def evaluate_batch(self, func: CompiledCostFunction, params: dict) -> np.ndarray:
+        """Như EvaluateBatch với hàm đã biên dịch"""
+        if func.error is not None:
+            raise RuntimeError(f"loi khi tinh toan cong thuc: {func.error}")
+        missing_vars = func.required_vars.difference(params)
+        if missing_vars:
+            raise ValueError(f"thieu cac bien: {', '.join(missing_vars)}")
+        columns = {name: np.asarray(value) for name, value in params.items() if isinstance(value, (np.ndarray, list))}
+        sizes = {len(value) for value in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError(f"cac cot tham so co do dai khac nhau: {sorted(sizes)}")
+        size = sizes.pop() if sizes else 1
+
+        # Tính cả cột một lần bằng NumPy; công thức có nhánh điều kiện, sum hay phép
+        # tính không hỗ trợ trên mảng thì tính từng bộ tham số như EvaluateCall
+        if "sum" not in func.code.co_names:
+            try:
+                with np.errstate(all="ignore"):
+                    local_env = {**params, **columns, **self.array_helpers}
+                    result = np.asarray(eval(func.code, {}, local_env), dtype=float)
+                if result.ndim == 0 or result.shape == (size,):
+                    result = np.array(np.broadcast_to(result, (size,)))
+                    # Chia cho 0 hay căn số âm: phép tính từng phần tử sẽ báo lỗi
+                    result[~np.isfinite(result)] = np.nan
+                    return result
+            except Exception:
+                pass
+
+        # Lấy lại giá trị gốc của cột list: np.asarray đổi cột lẫn kiểu thành chuỗi
+        rows = {name: [tuple(item) if isinstance(item, list) else item
+                       for item in (params[name] if isinstance(params[name], list) else value.tolist())]
+                for name, value in columns.items()}
+        result = np.empty(size)
+        for i in range(size):
+            try:
+                value = self.evaluate_compiled(func, {**params, **{name: row[i] for name, row in rows.items()}})
+                result[i] = value if math.isfinite(value) else math.nan
+            except Exception:
+                result[i] = math.nan
+        return result
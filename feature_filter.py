@@ -0,0 +1,242 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from object_manager import ImageDatabase, ImageMeta, ObjectState
+from object_converter import ObjectConvertor
+
+# Lọc ảnh ứng viên bằng cận dưới tính trên vector đặc trưng trước khi chạy A*.
+# Mỗi object là một dòng (tâm x, tâm y, rộng, cao) kèm màu đã đóng gói;
+# cận dưới chi phí giữa mọi object của ảnh truy vấn và mọi object trong cơ sở dữ
+# liệu được tính một lần bằng NumPy theo các tốc độ của CostHeuristic, rồi gộp
+# thành cận dưới cho từng ảnh.
+
+CX, CY, WIDTH, HEIGHT = range(4)
+# Số bước Newton khi tính cận dưới của hàm Lambert W
+LAMBERT_STEPS = 20
+
+
+class FeatureMatrix:
+    """Ma trận đặc trưng của mọi object trong db, tự đánh dấu cần dựng lại khi db thay đổi"""
+
+    def __init__(self, db: ImageDatabase):
+        self.db = db
+        self.names: List[str] = []
+        self.features = np.empty((0, 4))
+        self.colors = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.int64)  # x1, y1, x2, y2
+        self.offsets = np.zeros(1, dtype=np.int64)  # object của ảnh i: offsets[i]:offsets[i + 1]
+        self.builds = 0
+        self._dirty = True
+        db.add_listener(self.on_change)
+
+    def on_change(self, event: str, name: str, image: Optional[ImageMeta]):
+        self._dirty = True
+
+    def close(self):
+        self.db.remove_listener(self.on_change)
+
+    def refresh(self):
+        """Dựng lại ma trận nếu db đã thay đổi từ lần dựng trước"""
+        if not self._dirty:
+            return
+        names, boxes, colors, offsets = [], [], [], [0]
+        for name, image in self.db.images.items():
+            names.append(name)
+            for obj in image.objects:
+                state = ObjectState.from_region(obj)
+                boxes.append(state[:4])
+                colors.append(state.color)
+            offsets.append(len(boxes))
+        self.names = names
+        self.boxes = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+        self.colors = np.array(colors, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.features = self.vectors(self.boxes)
+        self.builds += 1
+        self._dirty = False
+
+    @staticmethod
+    def vectors(boxes: np.ndarray) -> np.ndarray:
+        """Vector đặc trưng (tâm x, tâm y, rộng, cao) của các object"""
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        features = np.empty((len(boxes), 4))
+        features[:, CX] = (boxes[:, 0] + boxes[:, 2]) / 2
+        features[:, CY] = (boxes[:, 1] + boxes[:, 3]) / 2
+        features[:, WIDTH] = boxes[:, 2] - boxes[:, 0]
+        features[:, HEIGHT] = boxes[:, 3] - boxes[:, 1]
+        return features
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Số object của từng ảnh theo thứ tự names"""
+        return np.diff(self.offsets)
+
+    def object_bounds(self, converter: ObjectConvertor, query: ImageMeta) -> np.ndarray:
+        """Ma trận (object truy vấn) x (mọi object trong db) các cận dưới chi phí chuyển đổi"""
+        self.refresh()
+        states = [ObjectState.from_region(o) for o in query.objects]
+        boxes = np.array([s[:4] for s in states], dtype=np.int64).reshape(-1, 4)
+        colors = np.array([s.color for s in states], dtype=np.int64)
+        return object_bounds(converter.heuristic_model, boxes, colors, self.boxes, self.colors)
+
+    def image_bounds(self, converter: ObjectConvertor, query: ImageMeta) -> Dict[str, float]:
+        """Cận dưới chi phí chuyển query thành từng ảnh cùng số object (trừ chính query)"""
+        bounds = self.object_bounds(converter, query)
+        n = len(query.objects)
+        same = np.flatnonzero(self.counts == n)
+        if n == 0:
+            image_bounds = np.zeros(len(same))
+        else:
+            # blocks[i, m, j]: object i của query với object j của ảnh thứ m
+            blocks = bounds[:, self.offsets[same][:, None] + np.arange(n)]
+            # Mỗi object chỉ được ghép một lần nên tổng các min theo hàng (và theo cột) là cận dưới
+            image_bounds = np.maximum(blocks.min(axis=2).sum(axis=0), blocks.min(axis=0).sum(axis=1))
+        return {self.names[i]: float(bound) for i, bound in zip(same, image_bounds) if self.names[i] != query.name}
+
+    def filter(self, converter: ObjectConvertor, query: ImageMeta,
+               threshold=math.inf) -> List[Tuple[float, str]]:
+        """Các ảnh cùng số object có cận dưới nhỏ hơn threshold, tăng dần theo cận dưới"""
+        return sorted((bound, name) for name, bound in self.image_bounds(converter, query).items()
+                      if bound < threshold)
+
+
+def object_bounds(model, boxes1: np.ndarray, colors1: np.ndarray, boxes2: np.ndarray,
+                  colors2: np.ndarray) -> np.ndarray:
+    """Bản NumPy của CostHeuristic.estimate giữa mọi cặp object (hộp x1, y1, x2, y2 và màu đã đóng gói)"""
+    geometry = geometry_bounds(model, boxes1, boxes2)
+    # Màu: tra bảng chi phí đổi màu của heuristic trên các màu khác nhau của hai phía
+    palette1, inverse1 = np.unique(np.asarray(colors1, dtype=np.int64), return_inverse=True)
+    palette2, inverse2 = np.unique(np.asarray(colors2, dtype=np.int64), return_inverse=True)
+    table = np.array([[model.color_cost(int(c), int(p)) for p in palette2] for c in palette1]).reshape(
+        len(palette1), len(palette2))
+    color = table[inverse1.reshape(-1)][:, inverse2.reshape(-1)]
+    if model.separable:
+        return color + geometry
+    return np.maximum(color, geometry)
+
+
+def geometry_bounds(model, boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """Bản NumPy của CostHeuristic.geometry_cost trên mọi cặp object"""
+    a = np.asarray(boxes1, dtype=float).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes2, dtype=float).reshape(-1, 4)[None, :, :]
+    low, size, goal_size = a[..., :2] - b[..., :2], a[..., 2:] - a[..., :2], b[..., 2:] - b[..., :2]
+    with np.errstate(all="ignore"):
+        resize = np.maximum(_size_cost(model, size[..., 0], goal_size[..., 0], 0),
+                            _size_cost(model, size[..., 1], goal_size[..., 1], 1))
+        terms = [_shift_terms(model, low[..., axis], size[..., axis], goal_size[..., axis], axis)
+                 for axis in (0, 1)]
+        return _position_bound(resize, terms, model.translate_rate, model.rounding_min_cost)
+
+
+def _size_cost(model, size: np.ndarray, goal_size: np.ndarray, axis) -> np.ndarray:
+    """Bản NumPy của CostHeuristic.size_cost"""
+    start, end = size + model.padding, goal_size + model.padding
+    ratio = np.log(np.where(start > 0, end / np.where(start > 0, start, 1.0), 1.0))
+    rate = np.where(ratio > 0, model.grow_rate[axis], model.shrink_rate[axis])
+    cost = np.where(rate > 0, np.abs(ratio) / np.where(rate > 0, rate, 1.0), np.inf)
+    cost = np.where(start > 0, cost, np.inf)
+    return np.where(size == goal_size, 0.0, cost)
+
+
+def _shift_terms(model, low: np.ndarray, size: np.ndarray, goal_size: np.ndarray, axis):
+    """Bản NumPy của CostHeuristic.shift_terms (goal_low = 0), trả về danh sách 7 mảng"""
+    zero = np.zeros(np.broadcast(low, size, goal_size).shape)
+    distance, net = zero - low, goal_size - size
+    classes = model.fixed_classes[axis]
+    if classes is None:
+        return [zero] * 7
+    if not classes:
+        return [np.abs(distance)] * 2 + [zero] * 5
+    (fixed1, rates1), *rest = classes
+    target = distance + fixed1 * net
+    if not rest:
+        return [np.abs(target)] * 2 + [zero] * 5
+    (fixed2, rates2), = rest
+    spread = fixed1 - fixed2
+    low_change = np.maximum(-math.inf if rates2[1] else 0.0, net - (math.inf if rates1[0] else 0.0))
+    high_change = np.minimum(math.inf if rates2[0] else 0.0, net - (-math.inf if rates1[1] else 0.0))
+    free = np.abs(target - spread * np.clip(target / spread, low_change, high_change))
+    grow = target / spread > 0
+    rate2 = np.where(grow, rates2[0], rates2[1])
+    rate1 = np.where(grow, rates1[1], rates1[0])
+    same = np.where(grow, net > 0, net < 0)
+    inverse1 = np.where(rate1 > 0, 1 / np.where(rate1 > 0, rate1, 1.0), 0.0)
+    k = 1 / rate2 + inverse1
+    beta = np.where(same, 1.0, -1.0) * np.abs(net) * inverse1
+    scale = np.abs(spread) / k
+    rest = np.abs(target)
+    reach = model.size_reach[axis]
+    # Các trường hợp đặc biệt theo đúng thứ tự kiểm tra trong shift_terms
+    cases = [low_change > high_change, (rate2 == math.inf) | (rate1 == math.inf), rate2 == 0,
+             ~same & (rate1 == 0),
+             np.full(zero.shape, reach is None and math.inf in (model.grow_rate[axis], model.shrink_rate[axis]))]
+    free, rest = (np.select(cases, [math.inf, free, free, rest, free], free),
+                  np.select(cases, [math.inf, free, rest, rest, free], rest))
+    scale = np.where(np.logical_or.reduce(cases), 0.0, scale)
+    start = np.maximum(size + model.padding, 1.0)
+    end = np.maximum(goal_size + model.padding, 1.0)
+    if reach is None:
+        return [free, rest, scale, beta, np.maximum(start, end), zero, zero]
+    sigma, p, q = reach
+    return [free, rest, scale, beta, np.maximum(start, end), start ** p * end ** q, zero + sigma]
+
+
+def _reach(term, c: np.ndarray) -> np.ndarray:
+    """Bản NumPy của heuristic._reach"""
+    largest, anchor, sigma = term[4:]
+    reach = c * np.maximum(largest, anchor * np.exp(np.minimum(sigma * c, 700.0)))
+    return np.where(c == math.inf, math.inf, reach)
+
+
+def _shift(term, c: np.ndarray) -> np.ndarray:
+    """Bản NumPy của heuristic._shift"""
+    free, rest, scale, beta = term[:4]
+    helped = rest - scale * np.maximum(_reach(term, c) + beta, 0.0)
+    return np.maximum(free, np.where(scale == 0, rest, helped))
+
+
+def _lambert_w_lower(z: np.ndarray) -> np.ndarray:
+    """Bản NumPy của heuristic._lambert_w_lower với số bước Newton cố định"""
+    z = np.maximum(z, 0.0)
+    w, log_z = z / (1 + z), np.log(np.maximum(z, 1e-300))
+    for _ in range(LAMBERT_STEPS):
+        safe = np.maximum(w, 1e-300)
+        w = w + np.maximum((log_z - w - np.log(safe)) / (1 + 1 / safe), 0.0)
+    return np.where(z > 0, w, 0.0)
+
+
+def _kink(term) -> np.ndarray:
+    """Bản NumPy của heuristic._kink"""
+    free, rest, scale, beta, largest, anchor, sigma = term
+    target = (rest - free) / np.where(scale > 0, scale, 1.0) - beta
+    positive = (sigma > 0) & (anchor > 0)
+    sigma_, anchor_ = np.where(positive, sigma, 1.0), np.where(positive, anchor, 1.0)
+    flat = ~positive | (_reach(term, np.log(largest / anchor_) / sigma_) >= target)
+    curved = _lambert_w_lower(sigma_ * target / anchor_) / sigma_
+    return np.where(target <= 0, 0.0, np.where(flat, target / largest, curved))
+
+
+def _position_bound(resize: np.ndarray, terms, translate_rate, rounding_min_cost) -> np.ndarray:
+    """Bản NumPy của heuristic._position_bound"""
+    infinite = (resize == math.inf) | (terms[0][0] == math.inf) | (terms[1][0] == math.inf)
+    if translate_rate == 0:
+        moved = (terms[0][0] > 0) | (terms[1][0] > 0)
+        return np.where(infinite | moved, math.inf, resize)
+    slope = 1 - 2 / (rounding_min_cost * translate_rate) if rounding_min_cost else -1.0
+    if slope <= 0:
+        return np.where(infinite, math.inf, resize)
+
+    def bound(c, upper):
+        return slope * c + (_shift(terms[0], upper) + _shift(terms[1], upper)) / translate_rate
+
+    best = bound(resize, resize)
+    for term in terms:
+        low = _kink(term)
+        upper = low * (1 + 1e-9) + 1e-12
+        upper = np.where(_shift(term, upper) > term[0], math.inf, upper)
+        candidate = (term[2] != 0) & (term[1] > term[0]) & (low > resize)
+        best = np.where(candidate, np.minimum(best, bound(low, upper)), best)
+    still = (terms[0][1] == 0) & (terms[1][1] == 0)
+    return np.where(infinite, math.inf, np.where(still, resize, np.maximum(resize, best)))
@@ -0,0 +1,403 @@
+import heapq
+import math
+from typing import Callable, Dict, List, Optional, Sequence
+
+from object_manager import ObjectState, pack_color
+from transformation_manager import InstantiatedOperator
+
+# Các trạng thái mẫu dùng để đo tác động của từng phép biến đổi.
+# Có một trạng thái kích thước lẻ để bắt được sai số làm tròn của phép co giãn.
+PROBE_STATES = [
+    ObjectState(1000, 1000, 1400, 1200, pack_color((10, 20, 30))),
+    ObjectState(3000, 2000, 3200, 2600, pack_color((200, 100, 50))),
+    ObjectState(2000, 4000, 2333, 4777, pack_color((0, 0, 0))),
+]
+
+
+# Số cận hình học được lưu lại trước khi xóa bộ nhớ đệm
+GEOMETRY_CACHE_SIZE = 1 << 16
+# shift_terms khi phép co giãn không giúp gì cho phép dịch chuyển
+NO_SHIFT = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+def _rate(progress, cost):
+    """Tiến độ trên một đơn vị chi phí"""
+    if progress == 0:
+        return 0.0
+    return math.inf if cost <= 0 else progress / cost
+
+
+class ColorTransitionTable:
+    """Bảng chi phí đổi màu rẻ nhất giữa các màu, tính bằng Dijkstra trên đồ thị phép tô màu.
+
+    Chuỗi tô màu (plan) chỉ thay cho tìm kiếm khi convert chạy với factored=True.
+    """
+
+    def __init__(self, paint_targets: Dict[int, List[InstantiatedOperator]],
+                 cost_fn: Callable[..., float], max_cached_areas=256,
+                 batch_cost_fn: Optional[Callable[..., Sequence[float]]] = None):
+        self.paint_targets = paint_targets
+        self.cost_fn = cost_fn
+        # batch_cost_fn(ops, trạng thái trước, trạng thái sau, area) -> chi phí (nan nếu lỗi),
+        # dùng để tính cạnh giữa mọi cặp màu đích trong một lần gọi
+        self.batch_cost_fn = batch_cost_fn
+        self.max_cached_areas = max_cached_areas
+        self._tables: Dict = {}  # diện tích -> {màu nguồn: (khoảng cách, đỉnh trước)}
+        self._edges: Dict = {}  # diện tích -> {(màu, màu đích): (chi phí, phép tô)}
+
+    def edge(self, color: int, target: int, area):
+        """(chi phí, phép tô) rẻ nhất để tô màu color thành target"""
+        best, best_op = math.inf, None
+        before = ObjectState(0, 0, 0, 0, color)
+        after = ObjectState(0, 0, 0, 0, target)
+        for op in self.paint_targets.get(target, []):
+            try:
+                cost = max(self.cost_fn(op, before, after, area=area), 0.0)
+            except Exception:
+                continue
+            if cost < best:
+                best, best_op = cost, op
+        return best, best_op
+
+    def _edge_matrix(self, area):
+        """Cạnh rẻ nhất giữa mọi cặp màu đích, tính chi phí cho cả bảng bằng batch_cost_fn"""
+        pairs = [(color, target, op) for color in self.paint_targets for target, ops in self.paint_targets.items()
+                 if target != color for op in ops]
+        costs = self.batch_cost_fn([op for _, _, op in pairs],
+                                   [ObjectState(0, 0, 0, 0, color) for color, _, _ in pairs],
+                                   [ObjectState(0, 0, 0, 0, target) for _, target, _ in pairs], area)
+        edges = {}
+        for (color, target, op), cost in zip(pairs, costs):
+            if math.isnan(cost):
+                continue
+            cost = max(cost, 0.0)
+            if cost < edges.get((color, target), (math.inf,))[0]:
+                edges[(color, target)] = (cost, op)
+        return edges
+
+    def _table(self, area):
+        table = self._tables.get(area)
+        if table is None:
+            if len(self._tables) >= self.max_cached_areas:
+                self._tables.clear()
+                self._edges.clear()
+            table = self._tables[area] = {}
+            if self.batch_cost_fn is not None:
+                self._edges[area] = self._edge_matrix(area)
+            for color in self.paint_targets:
+                table[color] = self._dijkstra(color, area)
+        return table
+
+    def _dijkstra(self, source: int, area):
+        distance = {source: 0.0}
+        previous = {}  # màu -> (màu trước, phép tô)
+        done = set()
+        heap = [(0.0, source)]
+        edges = self._edges.get(area)
+        while heap:
+            d, color = heapq.heappop(heap)
+            if color in done:
+                continue
+            done.add(color)
+            for target in self.paint_targets:
+                if target == color or target in done:
+                    continue
+                if edges is not None and color in self.paint_targets:
+                    cost, op = edges.get((color, target), (math.inf, None))
+                else:
+                    cost, op = self.edge(color, target, area)
+                if d + cost < distance.get(target, math.inf):
+                    distance[target] = d + cost
+                    previous[target] = (color, op)
+                    heapq.heappush(heap, (d + cost, target))
+        return distance, previous
+
+    def _search(self, color: int, area):
+        table = self._table(area)
+        result = table.get(color)
+        if result is None:
+            result = table[color] = self._dijkstra(color, area)
+        return result
+
+    def cost(self, color: int, goal_color: int, area=0) -> float:
+        """Chi phí rẻ nhất để đổi màu color thành goal_color (inf nếu không đổi được)"""
+        if color == goal_color:
+            return 0.0
+        return self._search(color, area)[0].get(goal_color, math.inf)
+
+    def plan(self, color: int, goal_color: int, area=0) -> Optional[List[InstantiatedOperator]]:
+        """Chuỗi phép tô màu rẻ nhất từ color tới goal_color, None nếu không đổi được"""
+        distance, previous = self._search(color, area)
+        if goal_color not in distance:
+            return None
+        ops = []
+        while goal_color != color:
+            goal_color, op = previous[goal_color]
+            ops.append(op)
+        ops.reverse()
+        return ops
+
+
+class CostHeuristic:
+    """Heuristic A* đo hệ số của thư viện phép biến đổi một lần, mỗi nút chỉ tính cận dạng đóng.
+
+    Giả định chi phí không giảm theo diện tích (phép tô màu được tính với diện tích 0).
+    """
+
+    def __init__(self, operators: List[InstantiatedOperator],
+                 cost_fn: Callable[..., float], batch_cost_fn: Optional[Callable[..., Sequence[float]]] = None):
+        self.cost_fn = cost_fn
+        self.paint_targets: Dict[int, List[InstantiatedOperator]] = {}  # màu đích -> phép tô
+        self.color_min_cost = math.inf  # phép đổi màu không có màu đích cố định
+        self.translate_rate = 0.0  # độ dịch (L1) / chi phí của phép giữ nguyên kích thước
+        # |ln(tỉ lệ kích thước)| / chi phí theo trục (rộng, cao), tách chiều phóng to và thu nhỏ
+        self.grow_rate = [0.0, 0.0]
+        self.shrink_rate = [0.0, 0.0]
+        # Theo từng trục: điểm cố định của phép co giãn -> [tốc độ phóng to, tốc độ thu nhỏ] như trên
+        self.fixed_points: List[Dict[float, List[float]]] = [{}, {}]
+        self.regular = True  # mọi phép co giãn đều giữ cố định một điểm trên mỗi trục
+        # Kích thước được đệm thêm padding để tỉ lệ sau khi làm tròn int() không vượt tỉ lệ của phép
+        self.padding = 0.0
+        # Chi phí nhỏ nhất của phép co giãn làm tròn tọa độ thấp (lệch dưới 1 điểm ảnh mỗi trục)
+        self.rounding_min_cost = math.inf
+        self.separable = True  # phép đổi màu và phép hình học không chồng lên nhau
+        self._color_cache: Dict = {}
+        self._geometry_cache: Dict = {}
+
+        for op in operators:
+            self._probe(op)
+        # Theo từng trục: các cặp (điểm cố định, tốc độ) của tối đa hai lớp, None nếu không áp dụng được
+        self.fixed_classes = [tuple(points.items()) if self.regular and len(points) <= 2 else None
+                         for points in self.fixed_points]
+        # Theo từng trục: (sigma, sigma / tốc độ phóng to, sigma / tốc độ thu nhỏ), kích thước lớn nhất
+        # đạt được khi đi từ start tới end với chi phí co giãn c là start^p * end^q * exp(sigma * c)
+        self.size_reach = [(1 / (1 / grow + 1 / shrink), 1 / (1 + grow / shrink), 1 / (1 + shrink / grow))
+                       if 0 < grow < math.inf and 0 < shrink < math.inf else None
+                       for grow, shrink in zip(self.grow_rate, self.shrink_rate)]
+        self.color_table = ColorTransitionTable(self.paint_targets, cost_fn, batch_cost_fn=batch_cost_fn)
+
+    def _probe(self, op: InstantiatedOperator):
+        try:
+            outputs = [op.apply_state(state) for state in PROBE_STATES]
+            cost = max(self.cost_fn(op, PROBE_STATES[0], outputs[0], area=0), 0.0)
+        except Exception:
+            return
+
+        color_changed = any(o.color != s.color for s, o in zip(PROBE_STATES, outputs))
+        geometry_changed = any(o[:4] != s[:4] for s, o in zip(PROBE_STATES, outputs))
+        if color_changed and geometry_changed:
+            self.separable = False
+        if color_changed:
+            targets = {o.color for o in outputs}
+            if len(targets) == 1:
+                self.paint_targets.setdefault(targets.pop(), []).append(op)
+            else:
+                self.color_min_cost = min(self.color_min_cost, cost)
+        if not geometry_changed:
+            return
+
+        for state, out in zip(PROBE_STATES, outputs):
+            axes = [(self._axis(state, axis), self._axis(out, axis)) for axis in (0, 1)]
+            if all(size == new_size for (_, size), (_, new_size) in axes):
+                shift = sum(abs(new_low - low) for (low, _), (new_low, _) in axes)
+                self.translate_rate = max(self.translate_rate, _rate(shift, cost))
+                continue
+            for axis, ((low, size), (new_low, new_size)) in enumerate(axes):
+                if new_size == size:
+                    self.regular = self.regular and new_low == low  # không dịch chuyển lẫn trong phép co giãn
+                    continue
+                ratio = math.log(new_size / size)
+                direction = 0 if ratio > 0 else 1
+                rates = self.grow_rate if ratio > 0 else self.shrink_rate
+                rates[axis] = max(rates[axis], _rate(abs(ratio), cost))
+                # |int(f * s) - f * s| < 1 nên (s' + k) / (s + k) nằm giữa 1 và f khi k >= 1 / |f - 1|
+                self.padding = max(self.padding, 1 / abs(new_size / size - 1))
+                fixed = round(-(new_low - low) / (new_size - size), 2) + 0.0  # bỏ -0.0
+                if abs(fixed * (new_size - size) + (new_low - low)) > 1:
+                    self.regular = False
+                if fixed != 0:
+                    self.rounding_min_cost = min(self.rounding_min_cost, cost)
+                fixed_rates = self.fixed_points[axis].setdefault(fixed, [0.0, 0.0])
+                fixed_rates[direction] = max(fixed_rates[direction], _rate(abs(ratio), cost))
+
+    @staticmethod
+    def _axis(state: ObjectState, axis):
+        """(tọa độ thấp, kích thước) của trạng thái theo trục x (0) hoặc y (1)"""
+        if axis == 0:
+            return state.x1, state.x2 - state.x1
+        return state.y1, state.y2 - state.y1
+
+    def color_cost(self, color: int, goal_color: int) -> float:
+        """Chi phí tối thiểu để đổi màu (đã đóng gói) sang màu đích"""
+        if color == goal_color:
+            return 0.0
+        key = (color, goal_color)
+        cached = self._color_cache.get(key)
+        if cached is None:
+            # Có thể đổi qua nhiều màu trung gian nên dùng bảng Dijkstra (tại diện tích 0)
+            cached = self._color_cache[key] = min(self.color_min_cost,
+                                                  self.color_table.cost(color, goal_color, area=0))
+        return cached
+
+    @property
+    def exact_colors(self) -> bool:
+        """Mọi phép đổi màu đều có màu đích cố định, nên bảng màu là chính xác"""
+        return self.color_min_cost == math.inf
+
+    def size_cost(self, size, goal_size, axis) -> float:
+        """Cận dưới chi phí co giãn kích thước size thành goal_size trên trục axis"""
+        if size == goal_size:
+            return 0.0
+        if size + self.padding <= 0:
+            return math.inf
+        ratio = math.log((goal_size + self.padding) / (size + self.padding))
+        rate = self.grow_rate[axis] if ratio > 0 else self.shrink_rate[axis]
+        return abs(ratio) / rate if rate else math.inf
+
+    def shift_terms(self, low, size, goal_low, goal_size, axis):
+        """(s, u, scale, beta, B, A, sigma): phép dịch chuyển phải dịch ít nhất s điểm ảnh trên trục
+        axis, và ít nhất u - scale * (c * max(B, A * exp(sigma * c)) + beta) khi phép co giãn tốn c"""
+        distance, net = goal_low - low, goal_size - size
+        classes = self.fixed_classes[axis]
+        if classes is None:
+            return NO_SHIFT
+        if not classes:
+            return (abs(distance), abs(distance)) + NO_SHIFT[2:]
+        # Mỗi lớp điểm cố định đổi kích thước change thì tọa độ thấp dịch -fixed * change
+        (fixed1, rates1), *rest = classes
+        target = distance + fixed1 * net
+        if not rest:
+            return (abs(target), abs(target)) + NO_SHIFT[2:]
+        # Lớp 2 đổi change, lớp 1 phần còn lại net - change, mỗi lớp theo chiều nó có
+        (fixed2, rates2), = rest
+        spread = fixed1 - fixed2
+        low_change = max(-math.inf if rates2[1] else 0.0, net - (math.inf if rates1[0] else 0.0))
+        high_change = min(math.inf if rates2[0] else 0.0, net - (-math.inf if rates1[1] else 0.0))
+        if low_change > high_change:
+            return (math.inf, math.inf) + NO_SHIFT[2:]
+        free = abs(target - spread * min(max(target / spread, low_change), high_change))
+        # Giảm độ dịch đi d cần lớp 2 đổi m = d / |spread| điểm ảnh theo chiều của target / spread
+        # và lớp 1 đổi net - change. Đổi p điểm ảnh tốn ít nhất p / (tốc độ * T), với T là kích
+        # thước lớn nhất, bị chặn bởi chi phí phóng to từ size rồi thu nhỏ về goal_size.
+        direction = 0 if target / spread > 0 else 1
+        rate2, rate1 = rates2[direction], rates1[1 - direction]
+        reach = self.size_reach[axis]
+        if rate2 == math.inf or rate1 == math.inf:
+            return (free, free) + NO_SHIFT[2:]
+        if rate2 == 0:
+            return (free, abs(target)) + NO_SHIFT[2:]
+        if net * (1 if direction == 0 else -1) > 0:
+            # Lớp 1 chỉ phải bù phần m vượt quá |net|
+            k = 1 / rate2 + (1 / rate1 if rate1 else 0.0)
+            beta = abs(net) / rate1 if rate1 else 0.0
+        elif rate1:
+            # Lớp 1 đổi |net| + m
+            k = 1 / rate2 + 1 / rate1
+            beta = -abs(net) / rate1
+        else:
+            return (abs(target), abs(target)) + NO_SHIFT[2:]
+        start = max(size + self.padding, 1.0)
+        end = max(goal_size + self.padding, 1.0)
+        if reach is None:
+            if math.inf in (self.grow_rate[axis], self.shrink_rate[axis]):
+                return (free, free) + NO_SHIFT[2:]
+            return free, abs(target), abs(spread) / k, beta, max(start, end), 0.0, 0.0
+        sigma, p, q = reach
+        return free, abs(target), abs(spread) / k, beta, max(start, end), start ** p * end ** q, sigma
+
+    def geometry_cost(self, state: ObjectState, goal: ObjectState) -> float:
+        """Cận dưới chi phí để đưa vị trí và kích thước về đích"""
+        # Cận chỉ phụ thuộc độ lệch vị trí và kích thước hai phía
+        low_x, low_y, w, h = state.x1 - goal.x1, state.y1 - goal.y1, state.x2 - state.x1, state.y2 - state.y1
+        goal_w, goal_h = goal.x2 - goal.x1, goal.y2 - goal.y1
+        key = (low_x, low_y, w, h, goal_w, goal_h)
+        cost = self._geometry_cache.get(key)
+        if cost is None:
+            if len(self._geometry_cache) >= GEOMETRY_CACHE_SIZE:
+                self._geometry_cache.clear()
+            resize = max(self.size_cost(w, goal_w, 0), self.size_cost(h, goal_h, 1))
+            terms = (self.shift_terms(low_x, w, 0, goal_w, 0), self.shift_terms(low_y, h, 0, goal_h, 1))
+            cost = self._geometry_cache[key] = _position_bound(resize, terms, self.translate_rate,
+                                                               self.rounding_min_cost)
+        return cost
+
+    def estimate(self, state: ObjectState, goal: ObjectState) -> float:
+        color_cost = self.color_cost(state.color, goal.color)
+        geometry_cost = self.geometry_cost(state, goal) if state[:4] != goal[:4] else 0.0
+        if self.separable:
+            return color_cost + geometry_cost
+        return max(color_cost, geometry_cost)
+
+
+def _reach(term, c):
+    """c * (kích thước lớn nhất đạt được với chi phí co giãn c) theo shift_terms"""
+    _, _, _, _, largest, anchor, sigma = term
+    if c == math.inf:
+        return math.inf
+    return c * max(largest, anchor * math.exp(min(sigma * c, 700.0)))
+
+
+def _shift(term, c):
+    """Độ dịch tối thiểu của phép dịch chuyển theo shift_terms khi chi phí co giãn là c"""
+    free, rest, scale, beta = term[:4]
+    if scale == 0:
+        return max(free, rest)
+    return max(free, rest - scale * max(_reach(term, c) + beta, 0.0))
+
+
+def _lambert_w_lower(z):
+    """Cận dưới của nghiệm w >= 0 của w * exp(w) = z"""
+    if z <= 0:
+        return 0.0
+    # w + ln w - ln z lõm, tăng nên Newton xuất phát từ bên trái nghiệm luôn ở bên trái nghiệm
+    w, log_z = z / (1 + z), math.log(z)
+    for _ in range(20):
+        step = (log_z - w - math.log(w)) / (1 + 1 / w)
+        if step <= 1e-12 * w:
+            break
+        w += step
+    return w
+
+
+def _kink(term):
+    """Cận dưới của chi phí co giãn c nhỏ nhất mà _shift(term, c) chạm s"""
+    free, rest, scale, beta, largest, anchor, sigma = term
+    target = (rest - free) / scale - beta
+    if target <= 0:
+        return 0.0
+    if sigma == 0 or anchor == 0 or _reach(term, math.log(largest / anchor) / sigma) >= target:
+        return target / largest
+    return _lambert_w_lower(sigma * target / anchor) / sigma
+
+
+def _position_bound(resize, terms, translate_rate, rounding_min_cost):
+    """Cận dưới chi phí hình học: phép co giãn chi phí c >= resize cộng phép dịch chuyển
+    (tổng _shift trên hai trục trừ độ lệch làm tròn 2 điểm ảnh mỗi phép co giãn)"""
+    if resize == math.inf or any(term[0] == math.inf for term in terms):
+        return math.inf
+    if all(term[1] == 0 for term in terms):
+        return resize
+    if translate_rate == 0:
+        return resize if all(term[0] == 0 for term in terms) else math.inf
+    slope = 1 - 2 / (rounding_min_cost * translate_rate) if rounding_min_cost else -1.0
+    if slope <= 0:
+        return resize
+
+    def bound(c, upper):
+        # Cận dưới của bound tại mọi điểm trong [c, upper]: _shift giảm dần theo c
+        return slope * c + sum(_shift(term, upper) for term in terms) / translate_rate
+
+    # Trên mỗi khoảng giữa các điểm gãy (chỗ _shift của một trục chạm s) bound lõm nên cực tiểu
+    # nằm ở đầu khoảng: c = resize hoặc một điểm gãy lớn hơn resize
+    best = bound(resize, resize)
+    for term in terms:
+        if term[2] == 0 or term[1] <= term[0]:
+            continue
+        low = _kink(term)
+        if low <= resize:
+            continue
+        upper = low * (1 + 1e-9) + 1e-12
+        if _shift(term, upper) > term[0]:
+            upper = math.inf
+        best = min(best, bound(low, upper))
+    return max(resize, best)
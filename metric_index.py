@@ -0,0 +1,309 @@
+import copy
+import heapq
+import math
+import random
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from object_manager import ImageDatabase, ImageMeta
+from object_converter import ObjectConvertor
+from retrieval import image_cost, image_lower_bound
+
+# Chỉ mục không gian metric (VP-tree) trên các ảnh của ImageDatabase.
+# Khoảng cách giữa hai ảnh là tổng chi phí chuyển đổi theo hai chiều: chi phí
+# tối ưu c thỏa c(A, C) <= c(A, B) + c(B, C) (ghép hai chuỗi biến đổi), nên
+# d(A, B) = c(A, B) + c(B, A) đối xứng và thỏa bất đẳng thức tam giác. Khi dựng
+# cây, bất đẳng thức này được kiểm tra trên mọi bộ ba (điểm neo cha, điểm neo,
+# ảnh) đã có sẵn khoảng cách; nếu bị vi phạm (tìm kiếm không tối ưu, bị giới hạn
+# số bước...) chỉ mục chuyển sang chỉ dùng cận dưới để lọc.
+
+EPSILON = 1e-9
+
+
+class VPNode:
+    """Nút VP-tree: nút lá chỉ có items, nút trong có điểm neo và hai cây con theo bán kính"""
+
+    __slots__ = ("items", "vantage", "radius", "inside", "outside", "inside_range", "outside_range")
+
+    def __init__(self, items: Optional[List[int]] = None):
+        self.items = items  # None với nút trong
+        self.vantage: Optional[int] = None
+        self.radius = 0.0
+        self.inside: Optional["VPNode"] = None  # khoảng cách tới điểm neo <= radius
+        self.outside: Optional["VPNode"] = None
+        # [nhỏ nhất, lớn nhất] khoảng cách từ điểm neo tới các phần tử của từng cây con
+        self.inside_range = [math.inf, -math.inf]
+        self.outside_range = [math.inf, -math.inf]
+
+
+class VPTree:
+    """Vantage-point tree với khoảng cách bất kỳ, hỗ trợ thêm/xóa dần và truy vấn k-NN, bán kính.
+
+    Phần tử bị xóa chỉ được đánh dấu (điểm neo vẫn dùng để định tuyến), cây được
+    dựng lại khi số phần tử bị xóa vượt quá số phần tử còn lại. metric=False nếu
+    khi dựng cây phát hiện khoảng cách vô cùng hoặc vi phạm bất đẳng thức tam giác.
+    """
+
+    def __init__(self, distance: Callable[[Any, Any], float], items: Iterable[Tuple[Hashable, Any]] = (),
+                 leaf_size=4, seed=0):
+        self.distance = distance
+        self.leaf_size = leaf_size
+        self.metric = True
+        self.evaluations = 0  # số lần tính khoảng cách
+        self._random = random.Random(seed)
+        self._entries: Dict[int, Tuple[Hashable, Any]] = {}  # mã -> (khóa, phần tử)
+        self._ids: Dict[Hashable, int] = {}  # khóa -> mã của phần tử còn hiệu lực
+        self._next_id = 0
+        for key, item in items:
+            self._add_entry(key, item)
+        self.root = self._build(list(self._entries))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def _add_entry(self, key, item) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (key, item)
+        self._ids[key] = entry_id
+        return entry_id
+
+    def _live(self, entry_id: int) -> bool:
+        return self._ids.get(self._entries[entry_id][0]) == entry_id
+
+    def _distance(self, a, b) -> float:
+        self.evaluations += 1
+        return self.distance(a, b)
+
+    def _build(self, ids: List[int], parent: Optional[Dict[int, float]] = None) -> VPNode:
+        if len(ids) <= self.leaf_size:
+            return VPNode(list(ids))
+        ids = list(ids)
+        vantage = ids.pop(self._random.randrange(len(ids)))
+        item = self._entries[vantage][1]
+        distances = {i: self._distance(item, self._entries[i][1]) for i in ids}
+        self._check(vantage, distances, parent)
+
+        node = VPNode()
+        node.vantage = vantage
+        node.radius = sorted(distances.values())[len(ids) // 2]
+        inside = [i for i in ids if distances[i] <= node.radius]
+        outside = [i for i in ids if distances[i] > node.radius]
+        for children, bounds in ((inside, node.inside_range), (outside, node.outside_range)):
+            for i in children:
+                bounds[0] = min(bounds[0], distances[i])
+                bounds[1] = max(bounds[1], distances[i])
+        node.inside = self._build(inside, distances)
+        node.outside = self._build(outside, distances) if outside else None
+        return node
+
+    def _check(self, vantage: int, distances: Dict[int, float], parent: Optional[Dict[int, float]]):
+        """Kiểm tra bất đẳng thức tam giác trên các khoảng cách vừa tính và khoảng cách tới điểm neo cha"""
+        if not self.metric:
+            return
+        if any(math.isinf(d) or math.isnan(d) for d in distances.values()):
+            self.metric = False
+            return
+        if parent is None:
+            return
+        to_vantage = parent[vantage]
+        for i, d in distances.items():
+            if d > parent[i] + to_vantage + EPSILON or abs(parent[i] - to_vantage) > d + EPSILON:
+                self.metric = False
+                return
+
+    def insert(self, key, item):
+        """Thêm phần tử (thay thế phần tử cùng khóa nếu có)"""
+        self.delete(key)
+        entry_id = self._add_entry(key, item)
+        node = self.root
+        while node.items is None:
+            d = self._distance(self._entries[node.vantage][1], item)
+            if math.isinf(d) or math.isnan(d):
+                self.metric = False
+            if d <= node.radius:
+                bounds, child = node.inside_range, "inside"
+            else:
+                bounds, child = node.outside_range, "outside"
+                if node.outside is None:
+                    node.outside = VPNode([])
+            bounds[0] = min(bounds[0], d)
+            bounds[1] = max(bounds[1], d)
+            node = getattr(node, child)
+        node.items.append(entry_id)
+        if len(node.items) > 2 * self.leaf_size:
+            # Bỏ các phần tử đã xóa (phần tử trong lá không là điểm neo nên xóa hẳn được)
+            for i in node.items:
+                if not self._live(i):
+                    del self._entries[i]
+            node.items = [i for i in node.items if i in self._entries]
+        if len(node.items) > 2 * self.leaf_size:
+            # Tách lá quá lớn thành cây con tại chỗ
+            rebuilt = self._build(node.items)
+            for name in VPNode.__slots__:
+                setattr(node, name, getattr(rebuilt, name))
+
+    def delete(self, key):
+        """Xóa phần tử theo khóa (không có thì bỏ qua)"""
+        if self._ids.pop(key, None) is None:
+            return
+        if len(self._entries) > 2 * len(self._ids) + self.leaf_size:
+            self.rebuild()
+
+    def rebuild(self):
+        """Dựng lại cây chỉ với các phần tử còn hiệu lực"""
+        entries = [self._entries[i] for i in self._entries if self._live(i)]
+        self._entries, self._ids, self._next_id = {}, {}, 0
+        self.metric = True
+        for key, item in entries:
+            self._add_entry(key, item)
+        self.root = self._build(list(self._entries))
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        return [self._entries[i] for i in self._ids.values()]
+
+    def knn(self, query, k: int, exclude=None) -> List[Tuple[Hashable, float]]:
+        """k phần tử gần query nhất (bỏ qua khóa exclude), tăng dần theo khoảng cách"""
+        best: List[Tuple[float, int, Hashable]] = []  # max-heap (-khoảng cách, mã, khóa)
+
+        def consider(entry_id: int, d: float):
+            key = self._entries[entry_id][0]
+            if key == exclude or not self._live(entry_id) or math.isinf(d):
+                return
+            heapq.heappush(best, (-d, -entry_id, key))
+            if len(best) > k:
+                heapq.heappop(best)
+
+        def cutoff():
+            return -best[0][0] if len(best) >= k else math.inf
+
+        if k > 0:
+            self._search(self.root, query, consider, cutoff)
+        return [(key, -d) for d, _, key in sorted(best, reverse=True)]
+
+    def within(self, query, radius: float, exclude=None) -> List[Tuple[Hashable, float]]:
+        """Mọi phần tử có khoảng cách tới query không quá radius, tăng dần theo khoảng cách"""
+        found = []
+
+        def consider(entry_id: int, d: float):
+            key = self._entries[entry_id][0]
+            if d <= radius and key != exclude and self._live(entry_id):
+                found.append((key, d))
+
+        self._search(self.root, query, consider, lambda: radius + EPSILON)
+        return sorted(found, key=lambda pair: pair[1])
+
+    def _search(self, node: Optional[VPNode], query, consider, cutoff):
+        if node is None:
+            return
+        if node.items is not None:
+            for entry_id in node.items:
+                if self._live(entry_id):
+                    consider(entry_id, self._distance(query, self._entries[entry_id][1]))
+            return
+        d = self._distance(query, self._entries[node.vantage][1])
+        consider(node.vantage, d)
+        children = [(node.inside, node.inside_range), (node.outside, node.outside_range)]
+        if d > node.radius:
+            children.reverse()
+        for child, (low, high) in children:
+            # Bất đẳng thức tam giác: mọi phần tử trong cây con cách query ít nhất bấy nhiêu
+            if child is not None and low <= high and max(low - d, d - high, 0.0) < cutoff():
+                self._search(child, query, consider, cutoff)
+
+
+class ImageIndex:
+    """Chỉ mục ảnh theo khoảng cách chuyển đổi hai chiều, tự cập nhật khi thêm/xóa ảnh trong db.
+
+    Mỗi số lượng object có một VP-tree riêng (ảnh khác số object không so sánh
+    được). Nếu cây không còn là metric, truy vấn duyệt các ảnh theo cận dưới
+    khoảng cách và chỉ tính khoảng cách thật khi cận dưới chưa loại được ảnh.
+    options được chuyển cho convert (mặc định A* tối ưu để khoảng cách là metric).
+    Cây giữ bản sao của ảnh: db.update_image báo sửa ảnh tại chỗ, trong khi các
+    khoảng cách đã lưu ở điểm neo phải ứng với ảnh lúc thêm vào.
+    """
+
+    def __init__(self, converter: ObjectConvertor, db: ImageDatabase, leaf_size=4, **options):
+        self.converter = converter
+        self.db = db
+        self.leaf_size = leaf_size
+        self.options = options
+        self.trees: Dict[int, VPTree] = {}
+        self._counts: Dict[str, int] = {}  # tên ảnh -> số object lúc thêm vào chỉ mục
+        groups: Dict[int, List[Tuple[str, ImageMeta]]] = {}
+        for name, image in db.images.items():
+            groups.setdefault(len(image.objects), []).append((name, copy.deepcopy(image)))
+            self._counts[name] = len(image.objects)
+        for count, items in groups.items():
+            self.trees[count] = VPTree(self.distance, items, leaf_size)
+        db.add_listener(self.on_change)
+
+    def distance(self, a: ImageMeta, b: ImageMeta) -> float:
+        return (image_cost(self.converter, a, b, **self.options)
+                + image_cost(self.converter, b, a, **self.options))
+
+    def lower_bound(self, a: ImageMeta, b: ImageMeta) -> float:
+        return image_lower_bound(self.converter, a, b) + image_lower_bound(self.converter, b, a)
+
+    @property
+    def evaluations(self) -> int:
+        """Tổng số lần tính khoảng cách thật (mỗi lần chạy A* theo hai chiều)"""
+        return sum(tree.evaluations for tree in self.trees.values())
+
+    def on_change(self, event: str, name: str, image: Optional[ImageMeta]):
+        count = self._counts.pop(name, None)
+        if count is not None:
+            self.trees[count].delete(name)
+        if event in ("add", "update"):
+            self.insert(name, image)
+
+    def insert(self, name: str, image: ImageMeta):
+        image = copy.deepcopy(image)
+        count = len(image.objects)
+        self._counts[name] = count
+        tree = self.trees.get(count)
+        if tree is None:
+            self.trees[count] = VPTree(self.distance, [(name, image)], self.leaf_size)
+        else:
+            tree.insert(name, image)
+
+    def close(self):
+        """Ngừng theo dõi thay đổi của db"""
+        self.db.remove_listener(self.on_change)
+
+    def knn(self, query: ImageMeta, k=5) -> List[Tuple[str, float]]:
+        """k ảnh gần query nhất (không tính chính nó), dạng (tên, khoảng cách)"""
+        tree = self.trees.get(len(query.objects))
+        if tree is None or k <= 0:
+            return []
+        if tree.metric:
+            return tree.knn(query, k, exclude=query.name)
+        return self._scan(tree, query, k=k)
+
+    def within(self, query: ImageMeta, radius: float) -> List[Tuple[str, float]]:
+        """Các ảnh cách query không quá radius (không tính chính nó), dạng (tên, khoảng cách)"""
+        tree = self.trees.get(len(query.objects))
+        if tree is None:
+            return []
+        if tree.metric:
+            return tree.within(query, radius, exclude=query.name)
+        return self._scan(tree, query, radius=radius)
+
+    def _scan(self, tree: VPTree, query: ImageMeta, k=None, radius=math.inf) -> List[Tuple[str, float]]:
+        """Nhánh và cận trên cận dưới khoảng cách, dùng khi khoảng cách không phải metric"""
+        candidates = sorted(((self.lower_bound(query, image), name, image) for name, image in tree.items()
+                             if name != query.name), key=lambda candidate: candidate[0])
+        found = []
+        for bound, name, image in candidates:
+            cutoff = radius
+            if k is not None and len(found) >= k:
+                cutoff = min(cutoff, found[k - 1][1])
+            if bound > cutoff:
+                break
+            d = tree._distance(query, image)
+            if d <= radius and not math.isinf(d):
+                found.append((name, d))
+                found.sort(key=lambda pair: pair[1])
+        return found[:k] if k is not None else found
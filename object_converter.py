@@ -1,91 +1,826 @@
 import json
+import math
 import os
-import copy
-from queue import PriorityQueue
-from typing import Optional, List
+import time
+from dataclasses import dataclass, field
+from typing import Dict, NamedTuple, Optional, List
 
-from transformation_manager import TransformationLibraryManager, InstantiatedOperator, create_default_object_operators
-from object_manager import ImageObjectRegion
+import numpy as np
+
+from transformation_manager import InstantiatedOperator, get_inverse, get_batch
+from object_manager import ImageObjectRegion, ObjectState
 from cost_function_server import CostFunctionServer
+from open_list import get_open_list_factory
+from heuristic import CostHeuristic, PROBE_STATES
+
+class SearchNode:
+    """Nút tìm kiếm: chỉ giữ nút cha và toán tử cuối, chuỗi biến đổi được dựng lại khi cần"""
+
+    __slots__ = ("state", "cost", "parent", "operator")
+
+    def __init__(self, state: ObjectState, cost=0.0, parent: Optional["SearchNode"] = None,
+                 operator: Optional[InstantiatedOperator] = None):
+        self.state = state
+        self.cost = cost
+        self.parent = parent
+        self.operator = operator
+
+    def path(self) -> List[InstantiatedOperator]:
+        plan = []
+        node = self
+        while node.parent is not None:
+            plan.append(node.operator)
+            node = node.parent
+        plan.reverse()
+        return plan
+
+# Các thuộc tính độc lập của trạng thái dùng khi tách bài toán theo thuộc tính
+STATE_ATTRIBUTES = ("x", "y", "width", "height", "color")
+
+# Biến trong công thức chi phí -> thuộc tính trạng thái mà biến đó đọc
+COST_VARIABLE_ATTRIBUTES = {
+    "area": frozenset({"width", "height"}),
+    "color1": frozenset({"color"}),
+    "color2": frozenset({"color"}),
+    "val1": frozenset({"color"}),
+    "val2": frozenset({"color"}),
+}
+
+
+def state_attributes(state: ObjectState):
+    return (state.x1, state.y1, state.x2 - state.x1, state.y2 - state.y1, state.color)
+
+
+def with_attributes(state: ObjectState, source: ObjectState, attributes) -> ObjectState:
+    """Trạng thái state với các thuộc tính trong attributes lấy từ source"""
+    x, y, width, height, color = (b if attr in attributes else a
+                                  for attr, a, b in zip(STATE_ATTRIBUTES, state_attributes(state),
+                                                        state_attributes(source)))
+    return ObjectState(x, y, x + width, y + height, color)
+
+
+class OperatorFactor:
+    """Nhóm phép biến đổi cùng thay đổi một tập thuộc tính, tách rời các nhóm khác"""
+
+    __slots__ = ("attributes", "operators", "reads")
+
+    def __init__(self, attributes: frozenset):
+        self.attributes = attributes
+        self.operators: List[InstantiatedOperator] = []
+        self.reads = frozenset()  # thuộc tính của nhóm khác mà hàm chi phí đọc
+
+
+class OperatorBatch:
+    """Các phép biến đổi cùng loại với tham số xếp thành cột để mở rộng một lần bằng NumPy"""
+
+    __slots__ = ("operator", "operators", "params", "kernel", "cost_function")
+
+    def __init__(self, operators: List[InstantiatedOperator]):
+        self.operator = operators[0].operator
+        self.operators = operators
+        self.kernel = get_batch(self.operator.name)
+        self.cost_function = operators[0].cost_function
+        try:
+            self.params = {name: np.array([op.params[name] for op in operators])
+                           for name in self.operator.parameters}
+        except (KeyError, ValueError):
+            self.kernel = None  # tham số không xếp được thành mảng, mở rộng từng phép một
+            self.params = {}
+
+
+# Trọng số của weighted A* trong tìm kiếm anytime, giảm dần về A* thường
+ANYTIME_WEIGHTS = (5.0, 3.0, 2.0, 1.5, 1.2, 1.0)
+
+
+@dataclass
+class SearchStats:
+    """Thống kê một lần tìm kiếm (thời gian tính bằng giây)"""
+    algorithm: str = "astar"
+    expanded: int = 0      # số nút được mở rộng
+    generated: int = 0     # số trạng thái con hợp lệ được sinh ra
+    duplicates: int = 0    # bị loại vì trùng trạng thái đã đóng hoặc đang mở với g không tốt hơn
+    pruned: int = 0        # bị cắt theo cận (h vô cùng, vượt ngưỡng f hoặc không tốt hơn lời giải đang có)
+    errors: int = 0        # lỗi khi áp dụng phép biến đổi hoặc tính chi phí
+    peak_open: int = 0
+    peak_closed: int = 0
+    successor_time: float = 0.0
+    cost_time: float = 0.0
+    heuristic_time: float = 0.0
+    total_time: float = 0.0
+    f_bound: float = 0.0   # cận f cuối cùng: cận dưới của chi phí tối ưu đã chứng minh khi dừng
+    solved: bool = False
+    verbose: bool = field(default=False, repr=False, compare=False)
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
+
+class ConversionResult(NamedTuple):
+    """Kết quả tìm kiếm anytime: lời giải tốt nhất và cận dưới đã chứng minh của chi phí tối ưu"""
+    plan: Optional[List[InstantiatedOperator]]
+    cost: float
+    lower_bound: float
+    stats: Optional[SearchStats] = None
+
+    @property
+    def optimal(self) -> bool:
+        return self.plan is not None and self.cost <= self.lower_bound
+
+    @property
+    def suboptimality(self) -> float:
+        """Tỉ lệ chi phí / cận dưới (1.0 là tối ưu)"""
+        if self.cost == self.lower_bound:
+            return 1.0
+        return math.inf if self.lower_bound <= 0 else self.cost / self.lower_bound
+
+
+class BoundExceeded(NamedTuple):
+    """Kết quả convert khi dừng theo ngưỡng: chi phí tối ưu không nhỏ hơn lower_bound.
+
+    reason "max_cost": đã chứng minh mọi lời giải có chi phí >= max_cost (lower_bound >= max_cost);
+    "max_expansions": hết số nút được mở rộng, lower_bound là cận dưới đã chứng minh tới lúc đó;
+    "deadline": tìm kiếm anytime hết deadline (hoặc max_steps) trước khi tìm được lời giải.
+    """
+    lower_bound: float
+    reason: str = "max_cost"
+
 
 class ObjectConvertor:
-    def __init__(self, tlm, cost_function_server, transformations_file):
+    def __init__(self, tlm, cost_function_server, transformations_file, open_list="heapq", batched=False):
         self.tlm = tlm
         self.cost_function_server = cost_function_server
+        self.transformations_file = transformations_file
         self.transformations_data = self.load_transformations(transformations_file)
+        self._transformations_mtime = os.stat(transformations_file).st_mtime_ns
+        # Cấu trúc open list: "heapq", "bucket", "pairing" hoặc một lớp tương thích
+        self.open_list_factory = get_open_list_factory(open_list)
+        # batched=True sinh trạng thái con và chi phí theo từng nhóm phép biến đổi bằng NumPy. Chỉ nên
+        # bật khi mỗi phép biến đổi có khoảng 20 bộ tham số trở lên: với thư viện đi kèm (tối đa 5 bộ
+        # mỗi phép) mở rộng một nút chậm hơn khoảng 3 lần, với 50 bộ thì nhanh hơn khoảng 3 lần.
+        self.batched = batched
+        self._batches = {}  # id(danh sách phép biến đổi) -> (danh sách, các OperatorBatch)
+        self._catalogue: List[InstantiatedOperator] = []
+        self._catalogue_key = None
+        self.catalogue_stats = SearchStats(algorithm="instantiate")
+        self._heuristic_model = None
 
-    def convert(self, o1: ImageObjectRegion, o2: ImageObjectRegion, max_steps=1000, max_coord=10000) -> Optional[List[InstantiatedOperator]]:
+    def convert(self, o1: ImageObjectRegion, o2: ImageObjectRegion, max_steps=1000, max_coord=10000,
+                algorithm="astar", factored=False, deadline=None, bound=1.0,
+                max_cost=math.inf, max_expansions=math.inf, return_stats=False, verbose=False):
+        """Tìm chuỗi biến đổi chi phí nhỏ nhất từ o1 sang o2, None nếu không tìm được.
+
+        algorithm: "astar", "bidirectional", "anytime" (dùng deadline tính bằng giây
+        và hệ số bound, xem convert_anytime) hoặc "ida" (bộ nhớ tỉ lệ với độ sâu lời giải;
+        bound > 1 cho phép lời giải đắt hơn tối ưu tối đa bound lần để giảm số vòng lặp).
+        max_cost: cắt mọi nút có f >= max_cost, trả về BoundExceeded thay vì None khi đã chứng
+        minh không có lời giải rẻ hơn; max_expansions: dừng với BoundExceeded sau số nút mở rộng này.
+        factored=True giải riêng từng nhóm thuộc tính độc lập; chỉ khi đó nhóm phép tô màu được lấy
+        thẳng từ bảng chuyển màu, tìm kiếm chung chỉ dùng bảng này làm heuristic cho phần màu.
+        return_stats=True trả về (chuỗi biến đổi, SearchStats); verbose=True in tiến trình tìm kiếm.
+        """
+        stats = SearchStats(algorithm=algorithm, verbose=verbose)
+        started = time.perf_counter()
+        plan = self._convert(o1, o2, max_steps, max_coord, algorithm, factored, deadline, bound,
+                             max_cost, max_expansions, stats)
+        stats.total_time = time.perf_counter() - started
+        stats.solved = isinstance(plan, list)
+        return (plan, stats) if return_stats else plan
+
+    def _convert(self, o1, o2, max_steps, max_coord, algorithm, factored, deadline, bound,
+                 max_cost, max_expansions, stats):
         # Kiểm tra nếu object 1 và object 2 giống nhau (không xét tên)
         if self.objects_equal(o1, o2):
-            print("Giống nhau")
+            stats.log("Giống nhau")
+            return [] if max_cost > 0 else BoundExceeded(0.0)
+
+        # Tìm kiếm trên trạng thái bất biến, chỉ dùng ImageObjectRegion ở biên API
+        start = ObjectState.from_region(o1)
+        goal = ObjectState.from_region(o2)
+
+        searches = {
+            "astar": self._astar_search,
+            "bidirectional": self._bidirectional_search,
+            "anytime": lambda *args, **limits: self._anytime_plan(*args, deadline=deadline, bound=bound, **limits),
+            "ida": lambda *args, **limits: self._ida_search(*args, bound=bound, **limits),
+        }
+        if algorithm not in searches:
+            raise ValueError(f"Không hỗ trợ thuật toán '{algorithm}', chọn một trong: {', '.join(searches)}")
+        search = searches[algorithm]
+        operators = self.operator_catalogue
+
+        if factored:
+            # Các bài toán con không dùng ngưỡng; lời giải ghép chỉ được nhận khi rẻ hơn max_cost
+            plan = self._factored_search(start, goal, operators, search, max_steps, max_coord, stats)
+            if plan is not None and (max_cost == math.inf or self.replay(start, plan, max_coord)[1] < max_cost):
+                return plan
+            stats.log("Không tách được theo thuộc tính, chuyển sang tìm kiếm chung")
+        return search(start, goal, operators, max_steps, max_coord, stats,
+                      max_cost=max_cost, max_expansions=max_expansions)
+
+    def convert_anytime(self, o1: ImageObjectRegion, o2: ImageObjectRegion, deadline=0.2, bound=1.0,
+                        max_steps=math.inf, max_coord=10000, max_cost=math.inf, verbose=False) -> "ConversionResult":
+        """Tìm kiếm anytime: trả về lời giải tốt nhất tìm được trước deadline (giây) cùng cận dưới đã chứng minh.
+
+        Dừng sớm khi chi phí lời giải không vượt quá bound lần cận dưới (bound=1.0: chỉ
+        dừng sớm khi đã chứng minh tối ưu); deadline=None là không giới hạn thời gian.
+        Chỉ tìm lời giải rẻ hơn max_cost; không có lời giải và cận dưới >= max_cost nghĩa là đã
+        chứng minh không có lời giải nào rẻ hơn.
+        """
+        stats = SearchStats(algorithm="anytime", verbose=verbose)
+        started = time.perf_counter()
+        if self.objects_equal(o1, o2):
+            result = ConversionResult([], 0.0, 0.0, stats)
+        else:
+            result = self._anytime_search(ObjectState.from_region(o1), ObjectState.from_region(o2),
+                                          self.operator_catalogue, max_steps, max_coord, stats, deadline, bound,
+                                          max_cost=max_cost)
+        stats.total_time = time.perf_counter() - started
+        stats.solved = result.plan is not None
+        return result
+
+    def _estimator(self, model: CostHeuristic, stats: "SearchStats"):
+        """Hàm heuristic có đo thời gian vào stats"""
+        def estimate(state: ObjectState, goal: ObjectState) -> float:
+            started = time.perf_counter()
+            h = model.estimate(state, goal)
+            stats.heuristic_time += time.perf_counter() - started
+            return h
+        return estimate
+
+    def _anytime_plan(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                      max_steps, max_coord, stats: "SearchStats", deadline=None, bound=1.0,
+                      max_cost=math.inf, max_expansions=math.inf):
+        """_anytime_search theo cách trả về của convert: chuỗi biến đổi, BoundExceeded hoặc None"""
+        result = self._anytime_search(start, goal, operators, min(max_steps, max_expansions), max_coord, stats,
+                                      deadline, bound, max_cost=max_cost)
+        if result.plan is not None:
+            return result.plan
+        if max_cost <= result.lower_bound < math.inf:
+            return BoundExceeded(result.lower_bound)
+        if stats.expanded >= max_expansions:
+            return BoundExceeded(result.lower_bound, "max_expansions")
+        if result.lower_bound < math.inf:
+            # Chưa duyệt hết không gian tìm kiếm: hết giờ chứ không phải không có lời giải
+            return BoundExceeded(result.lower_bound, "deadline")
+        return None
+
+    def _anytime_search(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                        max_steps, max_coord, stats: "SearchStats", deadline=None, bound=1.0,
+                        weights=ANYTIME_WEIGHTS, max_cost=math.inf) -> "ConversionResult":
+        """Weighted A* khởi động lại với trọng số giảm dần (RWA*).
+
+        Mỗi vòng tìm lại từ đầu với f = g + w * h, cho phép mở lại trạng thái khi g tốt
+        hơn và cắt mọi nút có g + h không nhỏ hơn lời giải đang có. Lời giải của vòng
+        trọng số w không đắt hơn w lần tối ưu nên chi phí / w là một cận dưới; vòng
+        w = 1 còn nâng cận dưới theo f của các nút lấy ra. Một vòng duyệt hết open list
+        chứng minh lời giải đang có là tối ưu. max_cost được dùng như một lời giải có sẵn
+        để cắt nút, nên chỉ lời giải rẻ hơn max_cost được trả về.
+        """
+        stop_at = None if deadline is None else time.perf_counter() + deadline
+        model = self.heuristic_model
+        estimate = self._estimator(model, stats)
+        h_start = estimate(start, goal)
+        stats.f_bound = h_start
+        if h_start == math.inf:
+            return ConversionResult(None, math.inf, math.inf, stats)
+
+        best_plan, best_cost, lower_bound = None, math.inf, h_start
+        cut = False  # có nút bị cắt vì không rẻ hơn max_cost
+        for weight in weights:
+            if best_cost <= bound * lower_bound or lower_bound >= max_cost:
+                break
+            open_list = self.open_list_factory()
+            open_list.push(weight * h_start, SearchNode(start))
+            exhausted = True
+            while open_list:
+                if stats.expanded >= max_steps or (stop_at is not None and time.perf_counter() >= stop_at):
+                    exhausted = False
+                    break
+                f_score, node = open_list.pop()
+                h = (f_score - node.cost) / weight
+                if node.cost + h >= min(best_cost, max_cost):
+                    stats.pruned += 1
+                    cut = cut or node.cost + h < best_cost
+                    continue  # không thể tốt hơn lời giải đang có (hoặc max_cost)
+                if weight == 1.0:
+                    lower_bound = max(lower_bound, f_score)
+                if node.state == goal:
+                    best_plan, best_cost = node.path(), node.cost
+                    lower_bound = max(lower_bound, best_cost / weight)
+                    exhausted = False
+                    break
+                stats.expanded += 1
+                for new_state, cost, instantiated in self.successors(node.state, operators, max_coord, stats):
+                    new_cost = node.cost + cost
+                    new_h = estimate(new_state, goal)
+                    if new_cost + new_h >= min(best_cost, max_cost):
+                        stats.pruned += 1
+                        cut = cut or new_cost + new_h < best_cost
+                    elif not open_list.push(new_cost + weight * new_h, SearchNode(new_state, new_cost, node, instantiated)):
+                        stats.duplicates += 1
+                stats.peak_open = max(stats.peak_open, len(open_list))
+            if exhausted:
+                # Mọi nút rẻ hơn min(lời giải đang có, max_cost) đã được xét
+                lower_bound = best_cost if best_plan is not None or not cut else max(lower_bound, max_cost)
+                break
+            stats.log(f"Weight {weight}: cost {best_cost}, lower bound {lower_bound}, steps {stats.expanded}")
+            if stats.expanded >= max_steps or (stop_at is not None and time.perf_counter() >= stop_at):
+                break
+
+        stats.f_bound = min(lower_bound, best_cost)
+        return ConversionResult(best_plan, best_cost, stats.f_bound, stats)
+
+    def _ida_search(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                    max_steps, max_coord, stats: "SearchStats", bound=1.0, max_cost=math.inf, max_expansions=math.inf):
+        """IDA*: tìm kiếm sâu dần theo ngưỡng f, bộ nhớ tỉ lệ với độ sâu lời giải.
+
+        Không có tập visited hay open list: chỉ giữ đường đi hiện tại (để tránh chu trình)
+        và danh sách con của mỗi nút trên đường đi. Ngưỡng vòng sau là f nhỏ nhất bị
+        cắt ở vòng trước nên lời giải đầu tiên tìm được là tối ưu (với bound = 1).
+        """
+        model = self.heuristic_model
+        estimate = self._estimator(model, stats)
+
+        def children(state, g):
+            result = []
+            for new_state, cost, instantiated in self.successors(state, operators, max_coord, stats):
+                h = estimate(new_state, goal)
+                if h < math.inf:
+                    result.append((g + cost + h, g + cost, new_state, instantiated))
+                else:
+                    stats.pruned += 1
+            result.sort(key=lambda child: child[0])
+            return iter(result)
+
+        threshold = estimate(start, goal)
+        stats.f_bound = threshold
+        if max_cost <= threshold < math.inf:
+            return BoundExceeded(threshold)
+        while threshold < math.inf:
+            next_threshold = math.inf
+            path = [start]
+            on_path = {start}
+            plan: List[InstantiatedOperator] = []
+            stats.expanded += 1
+            stack = [children(start, 0.0)]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    # Hết con của nút cuối đường đi: quay lui
+                    stack.pop()
+                    on_path.discard(path.pop())
+                    if plan:
+                        plan.pop()
+                    continue
+                f_score, g, state, instantiated = child
+                if f_score > threshold or f_score >= max_cost:
+                    stats.pruned += 1
+                    next_threshold = min(next_threshold, f_score)
+                    continue
+                if state in on_path:
+                    stats.duplicates += 1
+                    continue
+                if state == goal:
+                    stats.log(f"Found solution after {stats.expanded} steps")
+                    return plan + [instantiated]
+                if stats.expanded >= max_steps:
+                    stats.log(f"Stopped after {stats.expanded} steps")
+                    return None
+                if stats.expanded >= max_expansions:
+                    return BoundExceeded(stats.f_bound, "max_expansions")
+                stats.expanded += 1
+                path.append(state)
+                on_path.add(state)
+                plan.append(instantiated)
+                stack.append(children(state, g))
+                stats.peak_closed = max(stats.peak_closed, len(path))
+            stats.log(f"Threshold {threshold}, steps {stats.expanded}")
+            # Không còn lời giải nào có f nhỏ hơn next_threshold; tăng ngưỡng ít nhất bound lần
+            # để giảm số vòng, lời giải không đắt hơn bound lần tối ưu
+            stats.f_bound = next_threshold
+            if max_cost <= next_threshold < math.inf:
+                return BoundExceeded(next_threshold)
+            threshold = max(next_threshold, threshold * bound)
+        stats.log(f"Stopped after {stats.expanded} steps")
+        return None
+
+    def successors(self, state: ObjectState, operators: List[InstantiatedOperator], max_coord,
+                   stats: Optional["SearchStats"] = None):
+        """Các (trạng thái mới, chi phí, phép biến đổi) hợp lệ từ state"""
+        stats = stats if stats is not None else SearchStats()
+        if self.batched:
+            for batch in self.operator_batches(operators):
+                yield from self.batch_successors(state, batch, max_coord, stats)
+        else:
+            yield from self._successors(state, operators, max_coord, stats)
+
+    def _successors(self, state: ObjectState, operators: List[InstantiatedOperator], max_coord,
+                    stats: "SearchStats"):
+        for instantiated in operators:
+            try:
+                started = time.perf_counter()
+                new_state = instantiated.apply_state(state)
+                applied = time.perf_counter()
+                stats.successor_time += applied - started
+                # Giới hạn tọa độ để tránh trạng thái không hợp lý
+                if not self.within_bounds(new_state, max_coord):
+                    continue
+                cost = self.evaluate_cost(instantiated, state, new_state)
+                stats.cost_time += time.perf_counter() - applied
+            except Exception as e:
+                stats.errors += 1
+                stats.log(f"Error processing {instantiated.operator.name} with params {instantiated.params}: {e}")
+                continue
+            stats.generated += 1
+            yield new_state, cost, instantiated
+
+    def operator_batches(self, operators: List[InstantiatedOperator]) -> List[OperatorBatch]:
+        """Nhóm các phép biến đổi theo loại, giữ lại cho các lần mở rộng sau với cùng danh sách"""
+        cached = self._batches.get(id(operators))
+        if cached is not None and cached[0] is operators:
+            return cached[1]
+        groups = {}
+        for instantiated in operators:
+            groups.setdefault(id(instantiated.operator), []).append(instantiated)
+        batches = [OperatorBatch(group) for group in groups.values()]
+        if len(self._batches) >= 64:
+            self._batches.clear()
+        self._batches[id(operators)] = (operators, batches)
+        return batches
+
+    def batch_successors(self, state: ObjectState, batch: OperatorBatch, max_coord, stats: "SearchStats"):
+        """Như successors nhưng áp dụng cả nhóm phép biến đổi bằng vài phép tính trên mảng"""
+        if batch.kernel is None:
+            yield from self._successors(state, batch.operators, max_coord, stats)
+            return
+        started = time.perf_counter()
+        try:
+            children = batch.kernel(batch.params, state)
+        except Exception as e:
+            stats.log(f"Batch {batch.operator.name} lỗi, chuyển sang từng phép một: {e}")
+            batch.kernel = None
+            yield from self._successors(state, batch.operators, max_coord, stats)
+            return
+        # Giới hạn tọa độ để tránh trạng thái không hợp lý
+        inside = ((children[:, 0] >= 0) & (children[:, 1] >= 0)
+                  & (children[:, 2] <= max_coord) & (children[:, 3] <= max_coord))
+        indices = np.flatnonzero(inside)
+        children = children[indices]
+        new_states = [ObjectState(*row) for row in children.tolist()]
+        applied = time.perf_counter()
+        stats.successor_time += applied - started
+
+        costs = self.batch_costs(batch, indices, state, children, stats)
+        stats.cost_time += time.perf_counter() - applied
+        for index, new_state, cost in zip(indices.tolist(), new_states, costs):
+            if cost is None:
+                continue
+            stats.generated += 1
+            yield new_state, cost, batch.operators[index]
+
+    def batch_costs(self, batch: OperatorBatch, indices: np.ndarray, current: ObjectState,
+                    children: np.ndarray, stats: "SearchStats") -> list:
+        """Chi phí của các trạng thái con (None ở vị trí tính lỗi)"""
+        if not len(indices):
             return []
+        packed = children[:, 4]
+        columns = self.cost_columns({name: values[indices] for name, values in batch.params.items()}, current.rgb,
+                                    np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=1),
+                                    current.area)
+        try:
+            if batch.cost_function is not None:
+                costs = self.cost_function_server.evaluate_batch(batch.cost_function, columns)
+            else:
+                costs = self.cost_function_server.EvaluateBatch(batch.operator.name, columns)
+        except Exception as e:
+            costs = np.full(len(indices), np.nan)
+            stats.log(f"Error processing {batch.operator.name}: {e}")
+        failed = np.isnan(costs)
+        if failed.any():
+            stats.errors += int(failed.sum())
+            stats.log(f"Error processing {batch.operator.name} with params "
+                      f"{[batch.operators[i].params for i in indices[failed].tolist()]}")
+        return [None if cost != cost else cost for cost in costs.tolist()]
 
-        visited = set()
-        pq = PriorityQueue()
-        counter = 0
-        pq.put((0 + self.heuristic(o1, o2), 0, counter, [], o1))  # (f_score, cost_so_far, counter, path, current)
-        counter += 1
+    def predecessors(self, state: ObjectState, inverses, colors, max_coord, stats: "SearchStats"):
+        """Các (trạng thái trước, chi phí, phép biến đổi) biến thành state, qua các hàm nghịch đảo"""
+        for instantiated, inverse in inverses:
+            if inverse is None:
+                continue
+            try:
+                started = time.perf_counter()
+                # Ứng viên phải thật sự biến thành state qua phép biến đổi
+                candidates = [pred for pred in inverse(instantiated.params, state, colors)
+                              if self.within_bounds(pred, max_coord) and instantiated.apply_state(pred) == state]
+                applied = time.perf_counter()
+                stats.successor_time += applied - started
+                costs = [self.evaluate_cost(instantiated, pred, state) for pred in candidates]
+                stats.cost_time += time.perf_counter() - applied
+            except Exception as e:
+                stats.errors += 1
+                stats.log(f"Error processing {instantiated.operator.name} with params {instantiated.params}: {e}")
+                continue
+            stats.generated += len(candidates)
+            for pred, cost in zip(candidates, costs):
+                yield pred, cost, instantiated
+
+    def _astar_search(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                      max_steps, max_coord, stats: "SearchStats", max_cost=math.inf, max_expansions=math.inf):
+        model = self.heuristic_model
+        estimate = self._estimator(model, stats)
+        # Trạng thái đã mở rộng -> chi phí lúc mở rộng; được mở lại khi tìm thấy đường rẻ hơn
+        # vì heuristic chỉ chấp nhận được (chưa chắc nhất quán)
+        visited: Dict[ObjectState, float] = {}
+        open_list = self.open_list_factory()
+        h_start = estimate(start, goal)
+        if max_cost <= h_start < math.inf:
+            stats.f_bound = h_start
+            return BoundExceeded(h_start)
+        if h_start < math.inf:
+            open_list.push(0 + h_start, SearchNode(start))
         step_count = 0
+        cut_bound = math.inf  # f nhỏ nhất bị cắt vì không nhỏ hơn max_cost
 
-        while not pq.empty() and step_count < max_steps:
+        while open_list and step_count < max_steps:
             step_count += 1
-            f_score, cost_so_far, _, path, current = pq.get()
+            f_score, node = open_list.pop()
+            current = node.state
+            cost_so_far = node.cost
+            stats.f_bound = f_score
 
-            if self.objects_equal(current, o2):
-                print(f"Found solution after {step_count} steps")
-                return path
+            if current == goal:
+                stats.log(f"Found solution after {step_count} steps")
+                return node.path()
 
-            current_hash = self.hash_object(current)
-            if current_hash in visited:
+            if visited.get(current, math.inf) <= cost_so_far:
+                stats.duplicates += 1
                 continue
-            visited.add(current_hash)
-
-            for operator in self.tlm.operators.values():
-                for params in self.generate_params(operator):
-                    try:
-                        instantiated = self.tlm.TLMsearch(operator.name, params)
-                        if instantiated is None:
-                            continue
-
-                        new_obj = copy.deepcopy(current)
-                        new_obj = instantiated.apply(new_obj)
-
-                        # Giới hạn tọa độ để tránh trạng thái không hợp lý
-                        if (new_obj.x1 < 0 or new_obj.y1 < 0 or 
-                            new_obj.x2 > max_coord or new_obj.y2 > max_coord):
-                            continue
-
-                        operator_data = {
-                            "type": instantiated.operator.name,
-                            "params": {
-                                **instantiated.params,
-                                "color1": getattr(current, "color", (0, 0, 0)),
-                                "color2": getattr(new_obj, "color", (0, 0, 0)),
-                                "val1": getattr(current, "color", (0, 0, 0)),
-                                "val2": getattr(new_obj, "color", (0, 0, 0)),
-                                "dx": instantiated.params.get("dx", 0),
-                                "dy": instantiated.params.get("dy", 0),
-                                "scale": instantiated.params.get("scale", 1.0),
-                                "sx": instantiated.params.get("scale_x", 1.0),
-                                "sy": instantiated.params.get("scale_y", 1.0),
-                                "angle": instantiated.params.get("angle", 0),
-                                "a": instantiated.params.get("a", 0),
-                                "b": instantiated.params.get("b", 0),
-                                "area": (current.x2 - current.x1) * (current.y2 - current.y1),
-                            }
-                        }
-                        cost = self.cost_function_server.EvaluateCall(operator_data)
-                        new_cost = cost_so_far + cost
-                        f_score = new_cost + self.heuristic(new_obj, o2)
-
-                        pq.put((f_score, new_cost, counter, path + [instantiated], new_obj))
-                        counter += 1
-                    except Exception as e:
-                        print(f"Error processing {operator.name} with params {params}: {e}")
-                        continue
-            print(f"Step {step_count}, queue size: {pq.qsize()}, visited: {len(visited)}")
-        print(f"Stopped after {step_count} steps")
+            if stats.expanded >= max_expansions:
+                stats.log(f"Stopped after {stats.expanded} expansions")
+                return BoundExceeded(min(f_score, cut_bound), "max_expansions")
+            visited[current] = cost_so_far
+            stats.expanded += 1
+
+            for new_obj, cost, instantiated in self.successors(current, operators, max_coord, stats):
+                new_cost = cost_so_far + cost
+                if visited.get(new_obj, math.inf) <= new_cost:
+                    stats.duplicates += 1
+                    continue
+                f_score = new_cost + estimate(new_obj, goal)
+                if f_score == math.inf:
+                    stats.pruned += 1
+                elif f_score >= max_cost:
+                    stats.pruned += 1
+                    cut_bound = min(cut_bound, f_score)
+                elif not open_list.push(f_score, SearchNode(new_obj, new_cost, node, instantiated)):
+                    stats.duplicates += 1
+            stats.peak_open = max(stats.peak_open, len(open_list))
+            stats.peak_closed = len(visited)
+            stats.log(f"Step {step_count}, queue size: {len(open_list)}, visited: {len(visited)}")
+        if not open_list and cut_bound < math.inf:
+            # Đã xét hết các nút rẻ hơn max_cost mà không tới đích
+            stats.f_bound = cut_bound
+            return BoundExceeded(cut_bound)
+        stats.log(f"Stopped after {step_count} steps")
         return None
+
+    def _bidirectional_search(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                              max_steps, max_coord, stats: "SearchStats", max_cost=math.inf, max_expansions=math.inf):
+        """A* hai chiều: tiến từ start, lùi từ goal qua các hàm nghịch đảo, gặp nhau ở giữa.
+
+        Nhánh tiến giữ tập visited như A* thường; nhánh lùi cho phép mở lại trạng thái
+        khi tìm được g tốt hơn nên chỉ cần heuristic chấp nhận được. Mỗi bước mở rộng
+        nhánh có open list nhỏ hơn và dừng khi f nhỏ nhất của một nhánh không nhỏ hơn
+        chi phí gặp nhau tốt nhất.
+        """
+        model = self.heuristic_model
+        estimate = self._estimator(model, stats)
+        inverses = [(op, get_inverse(op.operator.name)) for op in operators]
+        # Nhánh lùi chỉ dùng được điều kiện dừng khi mọi phép biến đổi đều có nghịch đảo
+        backward_exact = all(inverse is not None for _, inverse in inverses)
+        # Màu trên đường đi từ start chỉ có thể là màu ban đầu hoặc màu đích của phép tô
+        colors = set(model.paint_targets) | {start.color}
+
+        forward_open = self.open_list_factory()
+        backward_open = self.open_list_factory()
+        forward_best = {}   # trạng thái -> nút tiến có g tốt nhất đã biết
+        backward_best = {}  # trạng thái -> nút lùi có g (chi phí tới goal) tốt nhất đã biết
+        visited = set()
+
+        h_start = estimate(start, goal)
+        stats.f_bound = h_start
+        if h_start == math.inf:
+            return None
+        if h_start >= max_cost:
+            return BoundExceeded(h_start)
+        forward_best[start] = SearchNode(start)
+        backward_best[goal] = SearchNode(goal)
+        forward_open.push(h_start, forward_best[start])
+        backward_open.push(h_start, backward_best[goal])
+
+        best_cost = math.inf
+        meeting = None  # (nút tiến, nút lùi) của đường đi tốt nhất
+        step_count = 0
+        cut_bound = math.inf  # f nhỏ nhất bị cắt vì không nhỏ hơn max_cost
+        stopped = False  # dừng vì f nhỏ nhất của một nhánh không nhỏ hơn min(best_cost, max_cost)
+
+        while forward_open and backward_open and step_count < max_steps:
+            if stats.expanded >= max_expansions:
+                return BoundExceeded(stats.f_bound, "max_expansions")
+            step_count += 1
+            # Lời giải đang có hoặc max_cost: đường đi không rẻ hơn không cần xét
+            limit = min(best_cost, max_cost)
+            forward = len(forward_open) <= len(backward_open)
+            if forward:
+                f_score, node = forward_open.pop()
+                stats.f_bound = max(stats.f_bound, min(f_score, limit))
+                if f_score >= limit:
+                    cut_bound, stopped = min(cut_bound, f_score), True
+                    break
+                current = node.state
+                if current in visited:
+                    stats.duplicates += 1
+                    continue
+                visited.add(current)
+                successors = self.successors(current, operators, max_coord, stats)
+            else:
+                f_score, node = backward_open.pop()
+                if backward_exact:
+                    stats.f_bound = max(stats.f_bound, min(f_score, limit))
+                    if f_score >= limit:
+                        cut_bound, stopped = min(cut_bound, f_score), True
+                        break
+                successors = self.predecessors(node.state, inverses, colors, max_coord, stats)
+            stats.expanded += 1
+
+            this_best, other_best = (forward_best, backward_best) if forward else (backward_best, forward_best)
+            this_open = forward_open if forward else backward_open
+            for new_obj, cost, instantiated in successors:
+                new_cost = node.cost + cost
+                if forward:
+                    if new_obj in visited:
+                        stats.duplicates += 1
+                        continue
+                    h = estimate(new_obj, goal)
+                else:
+                    h = estimate(start, new_obj)
+                if new_cost + h == math.inf:
+                    stats.pruned += 1
+                    continue
+                if new_cost + h >= max_cost:
+                    stats.pruned += 1
+                    cut_bound = min(cut_bound, new_cost + h)
+                    continue
+                child = SearchNode(new_obj, new_cost, node, instantiated)
+                if not this_open.push(new_cost + h, child):
+                    stats.duplicates += 1
+                    continue
+                this_best[new_obj] = child
+                other = other_best.get(new_obj)
+                if other is not None and new_cost + other.cost < min(best_cost, max_cost):
+                    best_cost = new_cost + other.cost
+                    meeting = (child, other) if forward else (other, child)
+            stats.peak_open = max(stats.peak_open, len(forward_open) + len(backward_open))
+            stats.peak_closed = len(visited)
+            stats.log(f"Step {step_count}, queue size: {len(forward_open)}/{len(backward_open)}, best: {best_cost}")
+
+        if meeting is None:
+            stats.log(f"Stopped after {step_count} steps")
+            # Dừng vì f >= max_cost, hoặc hết nút ở một nhánh đầy đủ sau khi đã cắt theo max_cost
+            exhausted = not forward_open or (backward_exact and not backward_open)
+            if cut_bound < math.inf and (stopped or exhausted):
+                stats.f_bound = max(stats.f_bound, cut_bound)
+                return BoundExceeded(stats.f_bound)
+            return None
+        stats.log(f"Found solution after {step_count} steps")
+        forward_node, backward_node = meeting
+        plan = forward_node.path()
+        # Nút lùi lưu phép biến đổi đi từ trạng thái của nó tới trạng thái nút cha
+        while backward_node.parent is not None:
+            plan.append(backward_node.operator)
+            backward_node = backward_node.parent
+        return plan
+
+    def _factored_search(self, start: ObjectState, goal: ObjectState, operators: List[InstantiatedOperator],
+                         search, max_steps, max_coord, stats: "SearchStats") -> Optional[List[InstantiatedOperator]]:
+        """Giải riêng từng nhóm thuộc tính độc lập rồi ghép các chuỗi con, None nếu không tách được.
+
+        Nhóm đã khớp với đích bị bỏ qua. Nhóm có hàm chi phí đọc thuộc tính của nhóm
+        khác (ví dụ chi phí tô màu phụ thuộc diện tích) được giải sau và chèn vào vị
+        trí rẻ nhất của chuỗi đã có, nên khi đó kết quả không chắc tối ưu như tìm kiếm chung.
+        """
+        factors = self.factor_operators(operators)
+        if factors is None:
+            return None
+        differing = {attr for attr, a, b in zip(STATE_ATTRIBUTES, state_attributes(start), state_attributes(goal))
+                     if a != b}
+        active = [factor for factor in factors if factor.attributes & differing]
+        model = self.heuristic_model
+        color_ops = {id(op) for ops in model.paint_targets.values() for op in ops}
+
+        def by_table(factor):
+            # Nhóm chỉ gồm phép tô màu có màu đích cố định: tra bảng chuyển màu thay vì tìm kiếm
+            return (factor.attributes == {"color"} and model.exact_colors
+                    and all(id(op) in color_ops for op in factor.operators))
+
+        if not active or not differing <= set().union(*(factor.attributes for factor in active)):
+            return None
+        if len(active) == 1 and not by_table(active[0]):
+            return None  # không tách được gì, tìm kiếm chung cũng như vậy
+
+        active_attributes = set().union(*(factor.attributes for factor in active))
+        # Nhóm không đọc thuộc tính của nhóm khác được giải trước
+        active.sort(key=lambda factor: bool(factor.reads & active_attributes))
+        plan, states = [], [start]
+        for factor in active:
+            positions = range(len(states)) if factor.reads & active_attributes else [len(states) - 1]
+            best = None
+            for i in positions:
+                context = states[i]
+                sub_goal = with_attributes(context, goal, factor.attributes)
+                if by_table(factor):
+                    sub_plan = model.color_table.plan(context.color, goal.color, area=context.area)
+                else:
+                    sub_plan = search(context, sub_goal, factor.operators, max_steps, max_coord, stats)
+                if sub_plan is None:
+                    continue
+                merged = plan[:i] + sub_plan + plan[i:]
+                replayed = self.replay(start, merged, max_coord)
+                if replayed is not None and (best is None or replayed[1] < best[2]):
+                    best = (merged, replayed[0], replayed[1])
+            if best is None:
+                return None
+            plan, states, _ = best
+
+        return plan if states[-1] == goal else None
+
+    def factor_operators(self, operators: List[InstantiatedOperator]) -> Optional[List["OperatorFactor"]]:
+        """Gom phép biến đổi thành các nhóm theo thuộc tính chúng thay đổi (union-find), None nếu không đo được"""
+        parent = {attr: attr for attr in STATE_ATTRIBUTES}
+
+        def find(attr):
+            while parent[attr] != attr:
+                parent[attr] = parent[parent[attr]]
+                attr = parent[attr]
+            return attr
+
+        footprints = []
+        for op in operators:
+            try:
+                outputs = [op.apply_state(state) for state in PROBE_STATES]
+            except Exception:
+                return None
+            written = {attr for state, out in zip(PROBE_STATES, outputs)
+                       for attr, a, b in zip(STATE_ATTRIBUTES, state_attributes(state), state_attributes(out))
+                       if a != b}
+            if not written:
+                continue  # phép biến đổi không làm thay đổi gì
+            first, *rest = sorted(written)
+            for attr in rest:
+                parent[find(attr)] = find(first)
+            footprints.append((op, first))
+
+        factors = {}
+        for op, attr in footprints:
+            root = find(attr)
+            factor = factors.get(root)
+            if factor is None:
+                factor = factors[root] = OperatorFactor(frozenset(a for a in STATE_ATTRIBUTES if find(a) == root))
+            factor.operators.append(op)
+            cost_function = self.cost_function_server.get_cost_function(op.operator.name)
+            if cost_function is not None:
+                for var in cost_function.required_vars:
+                    factor.reads |= COST_VARIABLE_ATTRIBUTES.get(var, frozenset())
+        for factor in factors.values():
+            factor.reads -= factor.attributes
+        return list(factors.values())
+
+    def replay(self, start: ObjectState, plan: List[InstantiatedOperator], max_coord=10000):
+        """Áp dụng chuỗi biến đổi lên start, trả về (các trạng thái, tổng chi phí) hoặc None nếu không hợp lệ"""
+        states = [start]
+        total = 0.0
+        try:
+            for instantiated in plan:
+                new_state = instantiated.apply_state(states[-1])
+                if not self.within_bounds(new_state, max_coord):
+                    return None
+                total += self.evaluate_cost(instantiated, states[-1], new_state)
+                states.append(new_state)
+        except Exception:
+            return None
+        return states, total
+
+    def plan_cost(self, o1: ImageObjectRegion, plan: List[InstantiatedOperator]) -> float:
+        """Tổng chi phí khi áp dụng chuỗi biến đổi plan lên object o1"""
+        replayed = self.replay(ObjectState.from_region(o1), plan, max_coord=math.inf)
+        if replayed is None:
+            raise ValueError("Chuỗi biến đổi không áp dụng được lên object")
+        return replayed[1]
+
+    @staticmethod
+    def within_bounds(state: ObjectState, max_coord) -> bool:
+        return state.x1 >= 0 and state.y1 >= 0 and state.x2 <= max_coord and state.y2 <= max_coord
     
     def hash_object(self, obj):
         return (obj.x1, obj.y1, obj.x2, obj.y2, obj.color)
@@ -93,18 +828,126 @@ class ObjectConvertor:
     def objects_equal(self, o1, o2):
         return self.hash_object(o1) == self.hash_object(o2)
     
-    def heuristic(self, current: ImageObjectRegion, goal: ImageObjectRegion) -> float:
-        current_width = current.x2 - current.x1
-        current_height = current.y2 - current.y1
-        goal_width = goal.x2 - goal.x1
-        goal_height = goal.y2 - goal.y1
-        scale_x_cost = abs(current_width - goal_width) / max(current_width, 1)
-        scale_y_cost = abs(current_height - goal_height) / max(current_height, 1)
-        size_cost = scale_x_cost + scale_y_cost
-        color_cost = 3.0 if current.color != goal.color else 0.0
-        # Thêm chi phí vị trí
-        position_cost = (abs(current.x1 - goal.x1) + abs(current.y1 - goal.y1)) / 100
-        return size_cost + color_cost + position_cost
+    def operator_data(self, instantiated: InstantiatedOperator, current: ObjectState,
+                      new_state: ObjectState, area=None) -> dict:
+        """Dữ liệu phép biến đổi đã khởi tạo để gửi cho CostFunctionServer"""
+        return {
+            "type": instantiated.operator.name,
+            "params": self.cost_columns(instantiated.params, current.rgb, new_state.rgb,
+                                        current.area if area is None else area),
+        }
+
+    @staticmethod
+    def cost_columns(params: dict, color1, color2, area) -> dict:
+        """Như operator_data()["params"] nhưng mỗi giá trị có thể là một cột cho nhiều phép biến đổi"""
+        return {
+            **params,
+            "color1": color1,
+            "color2": color2,
+            "val1": color1,
+            "val2": color2,
+            "dx": params.get("dx", 0),
+            "dy": params.get("dy", 0),
+            "scale": params.get("scale", 1.0),
+            "sx": params.get("scale_x", 1.0),
+            "sy": params.get("scale_y", 1.0),
+            "angle": params.get("angle", 0),
+            "a": params.get("a", 0),
+            "b": params.get("b", 0),
+            "area": area,
+        }
+
+    def evaluate_costs(self, operators: List[InstantiatedOperator], currents: List[ObjectState],
+                       new_states: List[ObjectState], area=None) -> np.ndarray:
+        """Chi phí của operators[i] biến currents[i] thành new_states[i], tính theo từng loại
+        phép biến đổi bằng CostFunctionServer.evaluate_batch; nan ở vị trí tính lỗi"""
+        result = np.full(len(operators), np.nan)
+        groups = {}
+        for i, instantiated in enumerate(operators):
+            groups.setdefault(id(instantiated.operator), []).append(i)
+        for indices in groups.values():
+            group = [operators[i] for i in indices]
+            names = set().union(*(op.params for op in group))
+            try:
+                params = {name: np.array([op.params[name] for op in group]) for name in names}
+                columns = self.cost_columns(params, np.array([currents[i].rgb for i in indices]),
+                                            np.array([new_states[i].rgb for i in indices]),
+                                            np.array([currents[i].area for i in indices]) if area is None else area)
+                func = group[0].cost_function
+                if func is not None:
+                    result[indices] = self.cost_function_server.evaluate_batch(func, columns)
+                else:
+                    result[indices] = self.cost_function_server.EvaluateBatch(group[0].operator.name, columns)
+            except Exception:
+                continue
+        return result
+
+    def evaluate_cost(self, instantiated: InstantiatedOperator, current: ObjectState,
+                      new_state: ObjectState, area=None) -> float:
+        data = self.operator_data(instantiated, current, new_state, area)
+        if instantiated.cost_function is not None:
+            return self.cost_function_server.evaluate_compiled(instantiated.cost_function, data["params"])
+        return self.cost_function_server.EvaluateCall(data)
+
+    def instantiate_operators(self, stats: Optional["SearchStats"] = None) -> List[InstantiatedOperator]:
+        """Khởi tạo mọi phép biến đổi trong thư viện với các bộ tham số từ file JSON.
+
+        Bộ tham số trùng nhau chỉ giữ một lần, bộ tham số sai kiểu bị bỏ qua (đếm vào
+        stats.errors, in ra khi stats.verbose), và mỗi phép biến đổi được gắn sẵn hàm chi
+        phí đã biên dịch theo kiểu của nó.
+        """
+        stats = stats if stats is not None else SearchStats()
+        result = []
+        seen = set()
+        for operator in self.tlm.operators.values():
+            cost_function = self.cost_function_server.get_cost_function(operator.name)
+            for params in self.generate_params(operator):
+                key = (operator.name, repr(sorted(params.items())))
+                if key in seen:
+                    continue
+                seen.add(key)
+                try:
+                    instantiated = self.tlm.TLMsearch(operator.name, params)
+                except Exception as e:
+                    stats.errors += 1
+                    stats.log(f"Bỏ qua {operator.name} với tham số {params}: {e}")
+                    continue
+                if instantiated is not None:
+                    instantiated.cost_function = cost_function
+                    result.append(instantiated)
+        return result
+
+    @property
+    def operator_catalogue(self) -> List[InstantiatedOperator]:
+        """Danh sách phép biến đổi đã khởi tạo sẵn, dựng lại khi thư viện, file JSON hoặc hàm chi phí thay đổi"""
+        self.cost_function_server.reload()
+        try:
+            mtime = os.stat(self.transformations_file).st_mtime_ns
+        except OSError:
+            mtime = self._transformations_mtime
+        if mtime != self._transformations_mtime:
+            self.transformations_data = self.load_transformations(self.transformations_file)
+            self._transformations_mtime = mtime
+        key = (self.cost_function_server.version, mtime,
+               tuple((name, id(op)) for name, op in self.tlm.operators.items()))
+        if key != self._catalogue_key:
+            # Số bộ tham số bị bỏ qua của lần dựng gần nhất nằm ở catalogue_stats.errors
+            self.catalogue_stats = SearchStats(algorithm="instantiate")
+            self._catalogue = self.instantiate_operators(self.catalogue_stats)
+            self._catalogue_key = key
+            self._heuristic_model = None
+        return self._catalogue
+
+    @property
+    def heuristic_model(self) -> CostHeuristic:
+        """Heuristic dựng từ danh sách phép biến đổi hiện tại, dựng lại cùng danh sách đó"""
+        operators = self.operator_catalogue
+        if self._heuristic_model is None:
+            self._heuristic_model = CostHeuristic(operators, self.evaluate_cost, self.evaluate_costs)
+        return self._heuristic_model
+
+    def heuristic(self, current: ObjectState, goal: ObjectState) -> float:
+        return self.heuristic_model.estimate(current, goal)
 
     def load_transformations(self, filepath):
         if not os.path.exists(filepath):
@@ -116,35 +959,11 @@ class ObjectConvertor:
         name = operator.name
         for entry in self.transformations_data:
             if entry["name"] == name:
-                # Tự động chuyển list -> tuple nếu cần (ví dụ color)
-                params = entry["parameters"]
+                # Tự động chuyển list -> tuple nếu cần (ví dụ color), trên bản sao của dữ liệu JSON
+                params = dict(entry["parameters"])
                 for key, value in params.items():
                     expected_type = operator.parameters.get(key)
                     if expected_type == tuple or (hasattr(expected_type, "__origin__") and expected_type.__origin__ == tuple):
                         if isinstance(value, list):
                             params[key] = tuple(value)
                 yield params
-
-
-
-# --- CHẠY DEMO ---
-# tlm = TransformationLibraryManager()
-# for op in create_default_object_operators():
-#     tlm.TLMinsert(op)
-
-# o1 = ImageObjectRegion("hihi", 400, 200, 500, 300, (0, 255, 0))
-# o2 = ImageObjectRegion("hi", 400, 200, 500, 400, (255, 0, 255))
-
-# cfs = CostFunctionServer()
-
-
-# converter = ObjectConvertor(tlm, cfs, transformations_file="data/transformations.json")
-
-# result = converter.convert(o1, o2)
-
-# # In ra các bước biến đổi
-# if result:
-#     for step in result:
-#         print(f"{step.operator.name} {step.params}")
-# else:
-#     print("Không tìm được chuỗi biến đổi phù hợp.")
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Tuple, List, Dict
+from typing import Callable, Tuple, List, Dict, NamedTuple, Optional
+import numbers
+import operator
 import pickle
 import os
 
@@ -12,6 +14,49 @@ class ImageObjectRegion:
     y2: int
     color: Tuple[int, int, int]
 
+def _color_component(c) -> int:
+    """Thành phần màu dạng int: nhận số nguyên NumPy và số thực có giá trị nguyên"""
+    try:
+        return operator.index(c)
+    except TypeError:
+        if isinstance(c, numbers.Real) and float(c).is_integer():
+            return int(c)
+        raise ValueError(f"thanh phan mau {c!r} khong phai so nguyen")
+
+def pack_color(color) -> int:
+    """Đóng gói màu (r, g, b) thành một số nguyên 24 bit"""
+    r, g, b = (_color_component(c) for c in color)
+    if not all(0 <= c <= 255 for c in (r, g, b)):
+        raise ValueError(f"gia tri mau: {color}, moi thanh phan phai la so nguyen 0-255")
+    return (r << 16) | (g << 8) | b
+
+def unpack_color(value: int) -> Tuple[int, int, int]:
+    """Giải nén số nguyên 24 bit thành màu (r, g, b)"""
+    return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+
+class ObjectState(NamedTuple):
+    """Trạng thái gọn và bất biến của object dùng trong tìm kiếm (màu đã đóng gói)"""
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    color: int
+
+    @classmethod
+    def from_region(cls, obj: ImageObjectRegion) -> "ObjectState":
+        return cls(obj.x1, obj.y1, obj.x2, obj.y2, pack_color(obj.color))
+
+    def to_region(self, obj_id: str = "") -> ImageObjectRegion:
+        return ImageObjectRegion(obj_id, self.x1, self.y1, self.x2, self.y2, unpack_color(self.color))
+
+    @property
+    def rgb(self) -> Tuple[int, int, int]:
+        return unpack_color(self.color)
+
+    @property
+    def area(self):
+        return (self.x2 - self.x1) * (self.y2 - self.y1)
+
 @dataclass
 class ImageMeta:
     name: str
@@ -25,9 +70,23 @@ class ImageMeta:
 class ImageDatabase:
     def __init__(self):
         self.images: Dict[str, ImageMeta] = {}
+        self._listeners: List[Callable[[str, str, Optional[ImageMeta]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, str, Optional[ImageMeta]], None]):
+        """Đăng ký hàm listener(sự kiện, tên ảnh, ảnh) được gọi khi thêm ("add"), sửa ("update") hoặc xóa ("delete") ảnh"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str, name: str, image: Optional[ImageMeta]):
+        for listener in list(self._listeners):
+            listener(event, name, image)
 
     def add_image(self, image: ImageMeta):
         self.images[image.name] = image
+        self._notify("add", image.name, image)
 
     def get_image(self, name: str) -> ImageMeta:
         return self.images[name]
@@ -35,9 +94,25 @@ class ImageDatabase:
     def list_images(self):
         return list(self.images.keys())
 
+    def update_image(self, name: str):
+        """Báo cho listener ("update") sau khi object của ảnh được sửa trực tiếp"""
+        if name in self.images:
+            self._notify("update", name, self.images[name])
+
     def delete_image(self, name: str):
         if name in self.images:
             del self.images[name]
+            self._notify("delete", name, None)
+
+    def __getstate__(self):
+        # Listener thường là phương thức của tab hay chỉ mục, không lưu vào file
+        state = self.__dict__.copy()
+        state.pop("_listeners", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._listeners = []
 
 # --- Lưu và tải ---
 def save_database(db: ImageDatabase, filename="image_database.pkl"):
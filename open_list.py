@@ -0,0 +1,209 @@
+import heapq
+import math
+from typing import Dict, Optional
+
+# Các cấu trúc danh sách mở (open list) cho ObjectConvertor.
+# Mỗi cấu trúc có cùng giao diện:
+#   push(f, node) -> bool   thêm nút, trả về False nếu bị loại vì trùng trạng thái với g không tốt hơn
+#   pop() -> (f, node)      lấy nút có f nhỏ nhất
+#   len(open_list)          số trạng thái đang mở
+# Các nút là SearchNode (có thuộc tính state và cost).
+
+
+class HeapOpenList:
+    """Heap nhị phân (heapq) với bảng g tốt nhất để loại bỏ trùng lặp kiểu lazy"""
+
+    def __init__(self):
+        self._heap = []
+        self._best_g: Dict = {}
+        self._open: Dict = {}  # trạng thái -> g của mục đang mở
+        self._counter = 0
+
+    def push(self, f, node) -> bool:
+        state = node.state
+        if self._best_g.get(state, math.inf) <= node.cost:
+            return False
+        self._best_g[state] = node.cost
+        self._open[state] = node.cost
+        # Khi f bằng nhau ưu tiên nút có g lớn hơn (gần đích hơn)
+        heapq.heappush(self._heap, (f, -node.cost, self._counter, node))
+        self._counter += 1
+        return True
+
+    def pop(self):
+        while self._heap:
+            f, neg_g, _, node = heapq.heappop(self._heap)
+            # Bỏ qua mục cũ đã bị thay bằng mục có g tốt hơn
+            if self._open.get(node.state) == -neg_g:
+                del self._open[node.state]
+                return f, node
+        raise IndexError("pop from empty open list")
+
+    def __len__(self):
+        return len(self._open)
+
+
+class BucketOpenList:
+    """Hàng đợi theo thùng (bucket queue) trên f đã lượng tử hóa thành số nguyên.
+
+    Khóa thùng là f làm tròn xuống theo bước 1 / resolution; trong mỗi thùng các nút
+    được xếp theo f chính xác (heap nhỏ) nên thứ tự lấy ra giống HeapOpenList.
+    """
+
+    def __init__(self, resolution=1000):
+        self.resolution = resolution
+        self._buckets: Dict[int, list] = {}
+        self._keys = []  # heap các khóa thùng đang có phần tử
+        self._best_g: Dict = {}
+        self._open: Dict = {}
+        self._counter = 0
+
+    def push(self, f, node) -> bool:
+        state = node.state
+        if self._best_g.get(state, math.inf) <= node.cost:
+            return False
+        self._best_g[state] = node.cost
+        self._open[state] = node.cost
+        key = math.floor(f * self.resolution)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = []
+            heapq.heappush(self._keys, key)
+        heapq.heappush(bucket, (f, -node.cost, self._counter, node))
+        self._counter += 1
+        return True
+
+    def pop(self):
+        while self._keys:
+            key = self._keys[0]
+            bucket = self._buckets[key]
+            while bucket:
+                f, neg_g, _, node = heapq.heappop(bucket)
+                if self._open.get(node.state) == -neg_g:
+                    del self._open[node.state]
+                    if not bucket:
+                        heapq.heappop(self._keys)
+                        del self._buckets[key]
+                    return f, node
+            heapq.heappop(self._keys)
+            del self._buckets[key]
+        raise IndexError("pop from empty open list")
+
+    def __len__(self):
+        return len(self._open)
+
+
+class _PairingNode:
+    __slots__ = ("key", "item", "child", "sibling", "prev")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.child = None
+        self.sibling = None
+        self.prev = None  # nút cha nếu là con đầu tiên, ngược lại là anh em bên trái
+
+
+class PairingHeapOpenList:
+    """Pairing heap có decrease-key: mỗi trạng thái chỉ có một mục trong heap"""
+
+    def __init__(self):
+        self._root: Optional[_PairingNode] = None
+        self._handles: Dict = {}  # trạng thái -> _PairingNode đang mở
+        self._best_g: Dict = {}
+        self._counter = 0
+
+    def push(self, f, node) -> bool:
+        state = node.state
+        if self._best_g.get(state, math.inf) <= node.cost:
+            return False
+        self._best_g[state] = node.cost
+        key = (f, -node.cost, self._counter)
+        self._counter += 1
+
+        handle = self._handles.get(state)
+        if handle is not None:
+            # Cùng trạng thái (cùng h) với g nhỏ hơn nên f không tăng
+            handle.item = (f, node)
+            if key < handle.key:
+                self._decrease_key(handle, key)
+            return True
+
+        handle = _PairingNode(key, (f, node))
+        self._handles[state] = handle
+        self._root = handle if self._root is None else self._meld(self._root, handle)
+        return True
+
+    def pop(self):
+        root = self._root
+        if root is None:
+            raise IndexError("pop from empty open list")
+        f, node = root.item
+        del self._handles[node.state]
+        self._root = self._merge_pairs(root.child)
+        return f, node
+
+    def __len__(self):
+        return len(self._handles)
+
+    @staticmethod
+    def _meld(a: _PairingNode, b: _PairingNode) -> _PairingNode:
+        if b.key < a.key:
+            a, b = b, a
+        b.prev = a
+        b.sibling = a.child
+        if a.child is not None:
+            a.child.prev = b
+        a.child = b
+        return a
+
+    def _decrease_key(self, handle: _PairingNode, key):
+        handle.key = key
+        if handle is self._root:
+            return
+        # Cắt cây con khỏi vị trí hiện tại rồi gộp lại với gốc
+        if handle.prev.child is handle:
+            handle.prev.child = handle.sibling
+        else:
+            handle.prev.sibling = handle.sibling
+        if handle.sibling is not None:
+            handle.sibling.prev = handle.prev
+        handle.prev = None
+        handle.sibling = None
+        self._root = self._meld(self._root, handle)
+
+    def _merge_pairs(self, first: Optional[_PairingNode]) -> Optional[_PairingNode]:
+        if first is None:
+            return None
+        trees = []
+        node = first
+        while node is not None:
+            nxt = node.sibling
+            node.prev = None
+            node.sibling = None
+            trees.append(node)
+            node = nxt
+        # Lượt 1: ghép từng cặp từ trái sang phải
+        paired = [self._meld(trees[i], trees[i + 1]) if i + 1 < len(trees) else trees[i]
+                  for i in range(0, len(trees), 2)]
+        # Lượt 2: gộp từ phải sang trái
+        root = paired[-1]
+        for tree in reversed(paired[:-1]):
+            root = self._meld(tree, root)
+        return root
+
+
+OPEN_LISTS = {
+    "heapq": HeapOpenList,
+    "bucket": BucketOpenList,
+    "pairing": PairingHeapOpenList,
+}
+
+
+def get_open_list_factory(open_list):
+    """Trả về lớp/hàm tạo open list từ tên đăng ký hoặc từ chính đối tượng gọi được"""
+    if callable(open_list):
+        return open_list
+    if open_list not in OPEN_LISTS:
+        raise ValueError(f"Không hỗ trợ open list '{open_list}', chọn một trong: {', '.join(OPEN_LISTS)}")
+    return OPEN_LISTS[open_list]
@@ -0,0 +1,203 @@
+import math
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from object_manager import ImageMeta, ImageObjectRegion, ObjectState
+from cost_function_server import CostFunctionServer
+from transformation_manager import InstantiatedOperator, TransformationLibraryManager, TransformationOperator
+from object_converter import BoundExceeded, ObjectConvertor
+
+# Chuyển đổi từng cặp object của hai ảnh song song trên nhiều tiến trình.
+# Mỗi worker dựng sẵn một ObjectConvertor (thư viện phép biến đổi, hàm chi phí,
+# danh sách phép biến đổi đã khởi tạo) một lần khi khởi động và dùng lại cho
+# mọi yêu cầu; các file JSON được nạp lại tự động khi thay đổi.
+
+_worker_converter: Optional[ObjectConvertor] = None
+
+
+class ObjectConversion(NamedTuple):
+    """Kết quả chuyển đổi một cặp object"""
+    index: int
+    source_id: str
+    target_id: str
+    plan: Optional[List[InstantiatedOperator]]  # None nếu không tìm được
+    cost: Optional[float]
+    error: Optional[str] = None
+    target_index: Optional[int] = None  # vị trí object đích trong ảnh 2 (None nếu ghép theo thứ tự)
+    lower_bound: Optional[float] = None  # cận dưới đã chứng minh khi convert trả về BoundExceeded
+
+
+def _init_worker(operators: List[TransformationOperator], cost_function_file: str,
+                 transformations_file: str, open_list):
+    global _worker_converter
+    tlm = TransformationLibraryManager()
+    for op in operators:
+        tlm.TLMinsert(op)
+    _worker_converter = ObjectConvertor(tlm, CostFunctionServer(cost_function_file), transformations_file, open_list)
+    # Dựng trước danh sách phép biến đổi và heuristic để yêu cầu đầu tiên không phải chờ
+    _worker_converter.heuristic_model
+
+
+def _warm_up():
+    return _worker_converter is not None
+
+
+def convert_pair(converter: ObjectConvertor, index: int, o1: ImageObjectRegion, o2: ImageObjectRegion,
+                 options: dict) -> ObjectConversion:
+    """Chuyển đổi một cặp object bằng converter cho trước"""
+    plan = converter.convert(o1, o2, **options)
+    if isinstance(plan, BoundExceeded):
+        return ObjectConversion(index, o1.obj_id, o2.obj_id, None, None, lower_bound=plan.lower_bound)
+    cost = None if plan is None else converter.plan_cost(o1, plan)
+    return ObjectConversion(index, o1.obj_id, o2.obj_id, plan, cost)
+
+
+def _convert_in_worker(index: int, o1: ImageObjectRegion, o2: ImageObjectRegion, options: dict) -> ObjectConversion:
+    return convert_pair(_worker_converter, index, o1, o2, options)
+
+
+def object_pairs(img1: ImageMeta, img2: ImageMeta):
+    """Ghép object của hai ảnh theo thứ tự"""
+    if len(img1.objects) != len(img2.objects):
+        raise ValueError("Hai ảnh phải có cùng số lượng object")
+    return list(zip(img1.objects, img2.objects))
+
+
+def _optimal(options: dict) -> bool:
+    """Thuật toán với options trả về lời giải tối ưu (nên mọi đoạn cuối của lời giải cũng tối ưu)"""
+    algorithm = options.get("algorithm", "astar")
+    if options.get("factored", False):
+        return False
+    return algorithm in ("astar", "bidirectional") or (algorithm == "ida" and options.get("bound", 1.0) == 1.0)
+
+
+def convert_many(converter: ObjectConvertor, pairs: Iterable[Tuple[ImageObjectRegion, ImageObjectRegion]],
+                 pool: Optional["ConversionPool"] = None, ordered=True, **options) -> Iterator[ObjectConversion]:
+    """Chuyển đổi nhiều cặp object (o1, o2), options được chuyển cho convert.
+
+    Mọi cặp dùng chung danh sách phép biến đổi, hàm chi phí và heuristic của
+    converter. Các cặp giống hệt nhau (không xét tên) chỉ tìm kiếm một lần. Với
+    thuật toán tối ưu, mỗi trạng thái trên lời giải đã tìm được ghi vào bảng chuyển
+    vị cùng phần còn lại của lời giải, nên cặp có object đầu là một trạng thái đó và
+    cùng object đích được trả lời không cần tìm kiếm. Có pool thì các cặp được
+    chuyển đổi song song, mỗi lúc tối đa hai lần số worker để bảng chuyển vị kịp
+    dùng cho các cặp sau. Kết quả theo thứ tự đầu vào (ordered=True) hoặc theo thứ
+    tự hoàn thành.
+    """
+    pairs = list(pairs)
+    groups: Dict[Tuple[ObjectState, ObjectState], List[int]] = {}
+    for i, (o1, o2) in enumerate(pairs):
+        groups.setdefault((ObjectState.from_region(o1), ObjectState.from_region(o2)), []).append(i)
+    transpositions: Dict[Tuple[ObjectState, ObjectState], list] = {}
+    record = _optimal(options)
+    ready: Dict[int, ObjectConversion] = {}
+    next_index = 0
+
+    def finish(key, conversion: ObjectConversion):
+        if record and conversion.plan:
+            start, goal = key
+            replayed = converter.replay(start, conversion.plan, max_coord=math.inf)
+            if replayed is not None:
+                for k, state in enumerate(replayed[0][1:-1], start=1):
+                    transpositions.setdefault((state, goal), conversion.plan[k:])
+        results = []
+        for i in groups[key]:
+            o1, o2 = pairs[i]
+            results.append(conversion._replace(index=i, source_id=o1.obj_id, target_id=o2.obj_id))
+        return results
+
+    def lookup(key) -> Optional[ObjectConversion]:
+        plan = transpositions.get(key)
+        if plan is None:
+            return None
+        o1, _ = pairs[groups[key][0]]
+        return ObjectConversion(0, "", "", plan, converter.plan_cost(o1, plan))
+
+    def emit(results):
+        nonlocal next_index
+        if not ordered:
+            yield from results
+            return
+        for result in results:
+            ready[result.index] = result
+        while next_index in ready:
+            yield ready.pop(next_index)
+            next_index += 1
+
+    if pool is None:
+        for key, indices in groups.items():
+            o1, o2 = pairs[indices[0]]
+            conversion = lookup(key)
+            if conversion is None:
+                try:
+                    conversion = convert_pair(converter, 0, o1, o2, options)
+                except Exception as e:
+                    conversion = ObjectConversion(0, "", "", None, None, str(e))
+            yield from emit(finish(key, conversion))
+        return
+
+    todo = deque(groups)
+    running: Dict[Future, Tuple[ObjectState, ObjectState]] = {}
+    while todo or running:
+        while todo and len(running) < 2 * pool.max_workers:
+            key = todo.popleft()
+            conversion = lookup(key)
+            if conversion is not None:
+                yield from emit(finish(key, conversion))
+                continue
+            o1, o2 = pairs[groups[key][0]]
+            running[pool.submit(o1, o2, **options)] = key
+        if not running:
+            continue
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = running.pop(future)
+            try:
+                conversion = future.result()
+            except Exception as e:
+                conversion = ObjectConversion(0, "", "", None, None, str(e))
+            yield from emit(finish(key, conversion))
+
+
+class ConversionPool:
+    """Pool tiến trình với các worker giữ sẵn ObjectConvertor"""
+
+    def __init__(self, tlm: TransformationLibraryManager, cost_function_file="data/cost_function.json",
+                 transformations_file="data/transformations.json", max_workers=None, open_list="heapq"):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(list(tlm.operators.values()), cost_function_file, transformations_file, open_list),
+        )
+
+    def warm_up(self):
+        """Khởi động trước mọi worker (ProcessPoolExecutor chỉ tạo worker khi có việc)"""
+        for future in [self.executor.submit(_warm_up) for _ in range(self.max_workers)]:
+            future.result()
+
+    def submit(self, o1: ImageObjectRegion, o2: ImageObjectRegion, index=0, **options) -> Future:
+        """Gửi một cặp object, Future trả về ObjectConversion; options được chuyển cho convert"""
+        return self.executor.submit(_convert_in_worker, index, o1, o2, options)
+
+    def convert_images(self, img1: ImageMeta, img2: ImageMeta, **options) -> Iterator[ObjectConversion]:
+        """Chuyển đổi mọi cặp object của hai ảnh, trả về kết quả theo thứ tự hoàn thành"""
+        pairs = object_pairs(img1, img2)
+        futures = {self.submit(o1, o2, i, **options): (i, o1, o2) for i, (o1, o2) in enumerate(pairs)}
+        for future in as_completed(futures):
+            i, o1, o2 = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                yield ObjectConversion(i, o1.obj_id, o2.obj_id, None, None, str(e))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
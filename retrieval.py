@@ -0,0 +1,112 @@
+import heapq
+import math
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional
+
+from object_manager import ImageDatabase, ImageMeta
+from object_converter import ObjectConvertor
+from parallel_convertor import ConversionPool, ObjectConversion
+from correspondence import lower_bound_matrix, match_objects, solve_assignment
+from feature_filter import FeatureMatrix
+
+# Tìm k ảnh trong cơ sở dữ liệu có chi phí chuyển đổi từ ảnh truy vấn nhỏ nhất.
+# Chi phí chuyển ảnh là tổng chi phí chuyển từng object theo cách ghép object rẻ
+# nhất (correspondence.match_objects); ảnh khác số object không so sánh được.
+# Nhánh và cận: các ảnh được xếp theo cận dưới tính trên ma trận đặc trưng
+# (feature_filter), rồi lần lượt kiểm tra cận dưới chặt hơn của bài toán gán trên
+# ma trận cận dưới từng cặp object; A* chỉ chạy khi cận dưới còn nhỏ hơn chi phí
+# thứ k tốt nhất hiện tại (và max_cost), và việc ghép một ảnh dừng sớm khi cận
+# dưới của nó vượt ngưỡng đó. Chi phí chỉ chính xác với thuật toán tối ưu (mặc định A*);
+# ảnh có cặp object dừng tìm kiếm trước khi biết chi phí (hết deadline/max_expansions)
+# được xếp riêng vào RetrievalStats.unknown thay vì bị coi là không chuyển được.
+
+
+class RetrievalResult(NamedTuple):
+    """Một ảnh trong kết quả tìm kiếm"""
+    name: str
+    cost: float
+    conversions: List[ObjectConversion]  # theo thứ tự object của ảnh truy vấn
+
+
+@dataclass
+class RetrievalStats:
+    """Số ảnh ở từng bước của một lần tìm kiếm"""
+    candidates: int = 0  # ảnh cùng số object với ảnh truy vấn
+    filtered: int = 0  # ảnh bị loại nhờ cận dưới trên vector đặc trưng
+    searched: int = 0  # ảnh đã tính đủ chi phí bằng A*
+    pruned: int = 0  # ảnh bị loại nhờ cận dưới của bài toán gán (trước hoặc trong khi ghép object)
+    unknown: List[str] = field(default_factory=list)  # ảnh chưa biết chi phí vì tìm kiếm dừng sớm
+
+
+def conversions_cost(conversions: List[ObjectConversion]) -> float:
+    """Tổng chi phí các cặp object: inf nếu có cặp không chuyển được, nan nếu có cặp dừng trước khi biết chi phí"""
+    if any(c.plan is None and c.lower_bound is not None for c in conversions):
+        return math.nan
+    return math.fsum(math.inf if c.plan is None else c.cost for c in conversions)
+
+
+def image_lower_bound(converter: ObjectConvertor, query: ImageMeta, image: ImageMeta) -> float:
+    """Cận dưới chi phí chuyển ảnh query thành image (inf nếu khác số object)"""
+    if len(query.objects) != len(image.objects):
+        return math.inf
+    if not query.objects:
+        return 0.0
+    bounds = lower_bound_matrix(converter, query.objects, image.objects)
+    return float(sum(bounds[i, j] for i, j in enumerate(solve_assignment(bounds))))
+
+
+def image_cost(converter: ObjectConvertor, source: ImageMeta, target: ImageMeta,
+               pool: Optional[ConversionPool] = None, **options) -> float:
+    """Chi phí chuyển ảnh source thành target theo cách ghép object rẻ nhất (như conversions_cost)"""
+    if len(source.objects) != len(target.objects):
+        return math.inf
+    return conversions_cost(match_objects(converter, source.objects, target.objects, pool, **options))
+
+
+def top_k(converter: ObjectConvertor, db: ImageDatabase, query: ImageMeta, k=5,
+          pool: Optional[ConversionPool] = None, return_stats=False,
+          features: Optional[FeatureMatrix] = None, max_cost=math.inf, **options):
+    """k ảnh (khác ảnh truy vấn) có chi phí chuyển đổi từ query nhỏ nhất (và nhỏ hơn max_cost), tăng dần theo chi phí.
+
+    features là FeatureMatrix dựng sẵn trên db (None thì dựng tạm cho lần gọi này).
+    options được chuyển cho convert; return_stats=True trả về (kết quả, RetrievalStats).
+    """
+    stats = RetrievalStats()
+    if k <= 0:
+        return ([], stats) if return_stats else []
+    matrix = FeatureMatrix(db) if features is None else features
+    try:
+        candidates = sorted(matrix.image_bounds(converter, query).items(), key=lambda item: item[1])
+    finally:
+        if features is None:
+            matrix.close()
+    stats.candidates = len(candidates)
+
+    best = []  # max-heap (-chi phí, thứ tự, RetrievalResult) của k ảnh tốt nhất
+    for order, (name, bound) in enumerate(candidates):
+        cutoff = min(max_cost, -best[0][0] if len(best) >= k else math.inf)
+        if bound >= cutoff or math.isinf(bound):
+            # Các ảnh còn lại có cận dưới không nhỏ hơn
+            stats.filtered += len(candidates) - order
+            break
+        image = db.images[name]
+        if image_lower_bound(converter, query, image) >= cutoff:
+            stats.pruned += 1
+            continue
+        conversions = match_objects(converter, query.objects, image.objects, pool, cutoff=cutoff, **options)
+        if conversions is None:
+            stats.pruned += 1
+            continue
+        cost = conversions_cost(conversions)
+        if math.isnan(cost):
+            stats.unknown.append(name)
+            continue
+        stats.searched += 1
+        if cost >= cutoff or math.isinf(cost):
+            continue
+        heapq.heappush(best, (-cost, -order, RetrievalResult(name, cost, conversions)))
+        if len(best) > k:
+            heapq.heappop(best)
+
+    results = [result for _, _, result in sorted(best, key=lambda item: (-item[0], -item[1]))]
+    return (results, stats) if return_stats else results
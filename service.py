@@ -0,0 +1,568 @@
+"""Dịch vụ HTTP/JSON cục bộ cho chuyển đổi object, chuyển đổi ảnh, tính chi phí và tìm ảnh tương tự.
+
+Giữ sẵn thư viện phép biến đổi, hàm chi phí và ImageDatabase trong bộ nhớ; tìm
+kiếm A* chạy trên ConversionPool (các tiến trình worker giữ sẵn ObjectConvertor).
+Các yêu cầu /convert và /cost đến gần nhau được gom thành một lô: /convert đi qua
+convert_many (cặp trùng nhau chỉ tìm một lần, dùng lại đoạn cuối lời giải), /cost
+dùng EvaluateBatch. Mỗi yêu cầu có hạn chót ("timeout", giây); khi số yêu cầu
+đang xử lý đạt --max-pending, yêu cầu mới bị từ chối ngay với mã 503.
+
+Chạy từ thư mục gốc của dự án:
+    python service.py [--port 8765] [--workers 4] [--db image_database.pkl]
+
+Các endpoint (JSON):
+    POST /convert         {"source": object, "target": object, "options": {...}}
+    POST /convert_images  {"source": ảnh, "target": ảnh, "options": {...}}
+    POST /cost            {"type": "translate", "params": {"dx": 10, "dy": 0}}
+    POST /retrieve        {"query": ảnh, "k": 5, "max_cost": 10, "options": {...}}
+    GET  /metrics, GET /health
+object là {"id", "x1", "y1", "x2", "y2", "color": [r, g, b]}; ảnh là tên ảnh trong
+cơ sở dữ liệu hoặc {"name", "width", "height", "objects": [object, ...]}.
+"""
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from object_manager import ImageMeta, ImageObjectRegion, load_or_create_database
+from cost_function_server import CostFunctionServer
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+from object_converter import ObjectConvertor
+from parallel_convertor import ConversionPool, ObjectConversion, convert_many
+from correspondence import match_objects
+from retrieval import top_k
+from feature_filter import FeatureMatrix
+
+# Tùy chọn được chuyển cho convert
+CONVERT_OPTIONS = {"algorithm", "max_steps", "max_coord", "factored", "deadline", "bound", "max_cost", "max_expansions"}
+ALGORITHMS = ("astar", "bidirectional", "anytime", "ida")
+# Tùy chọn số -> giá trị nhỏ nhất cho phép
+NUMERIC_OPTIONS = {"max_steps": 0, "max_coord": 0, "deadline": 0, "bound": 1, "max_cost": 0, "max_expansions": 0}
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+               504: "Gateway Timeout"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class EndpointMetrics:
+    """Số yêu cầu, lỗi, độ trễ (1000 yêu cầu gần nhất) và thông lượng trong 60 giây gần nhất của một endpoint"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=1000)
+        self.recent = deque()  # thời điểm hoàn thành các yêu cầu trong 60 giây gần nhất
+
+    def record(self, latency: float, status: int):
+        self.requests += 1
+        if status == 504:
+            self.timeouts += 1
+        elif status == 503:
+            self.rejected += 1
+        elif status >= 400:
+            self.errors += 1
+        self.latencies.append(latency)
+        self.recent.append(time.monotonic())
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        while self.recent and self.recent[0] < now - 60:
+            self.recent.popleft()
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "throughput_per_s": len(self.recent) / max(min(60.0, now - self.started), 1e-9),
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+
+class MicroBatcher:
+    """Gom các yêu cầu đến gần nhau (trong window giây, tối đa max_size) thành một lần gọi handler.
+
+    handler(items, resolve) là coroutine; resolve(i, kết quả hoặc Exception) trả kết quả
+    cho yêu cầu thứ i ngay khi có, yêu cầu chưa được trả khi handler kết thúc nhận lỗi.
+    """
+
+    def __init__(self, handler: Callable, window=0.002, max_size=32):
+        self.handler = handler
+        self.window = window
+        self.max_size = max_size
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self.batches = 0
+        self.items = 0
+        self._timer = None
+
+    def submit(self, item) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.batches += 1
+            self.items += len(batch)
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        futures = [future for _, future in batch]
+
+        def resolve(i, result):
+            if futures[i].done():
+                return
+            if isinstance(result, BaseException):
+                futures[i].set_exception(result)
+            else:
+                futures[i].set_result(result)
+
+        try:
+            await self.handler([item for item, _ in batch], resolve)
+            error = RuntimeError("khong co ket qua cho yeu cau")
+        except Exception as e:
+            error = e
+        for i in range(len(futures)):
+            resolve(i, error)
+
+    def snapshot(self) -> dict:
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0}
+
+
+# --- Chuyển đổi JSON ---
+
+def parse_object(data, default_id="") -> ImageObjectRegion:
+    try:
+        color = tuple(int(c) for c in data["color"])
+        if len(color) != 3:
+            raise ValueError("color phai co 3 thanh phan")
+        return ImageObjectRegion(str(data.get("id", default_id)), int(data["x1"]), int(data["y1"]),
+                                 int(data["x2"]), int(data["y2"]), color)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPError(400, f"object khong hop le: {e}")
+
+
+def parse_options(data: dict) -> dict:
+    options = data.get("options", {})
+    if not isinstance(options, dict):
+        raise HTTPError(400, "options phai la mot object JSON")
+    unknown = set(options) - CONVERT_OPTIONS
+    if unknown:
+        raise HTTPError(400, f"tuy chon khong ho tro: {', '.join(sorted(unknown))}")
+    if "algorithm" in options and options["algorithm"] not in ALGORITHMS:
+        raise HTTPError(400, f"algorithm phai la mot trong: {', '.join(ALGORITHMS)}")
+    if "factored" in options and not isinstance(options["factored"], bool):
+        raise HTTPError(400, "factored phai la true hoac false")
+    for name, minimum in NUMERIC_OPTIONS.items():
+        value = options.get(name)
+        if value is None and (name == "deadline" or name not in options):
+            continue  # deadline null: không giới hạn thời gian
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value) or value < minimum:
+            raise HTTPError(400, f"{name} phai la so khong nho hon {minimum}")
+    return options
+
+
+def plan_json(plan) -> Optional[list]:
+    if plan is None:
+        return None
+    return [{"operator": step.operator.name, "params": step.params} for step in plan]
+
+
+def conversion_json(conversion: ObjectConversion) -> dict:
+    if conversion.plan is not None:
+        status = "solved"
+    elif conversion.lower_bound is not None:
+        status = "bound_exceeded"
+    else:
+        status = "error" if conversion.error else "not_found"
+    return {
+        "status": status,
+        "source_id": conversion.source_id,
+        "target_id": conversion.target_id,
+        "target_index": conversion.target_index,
+        "plan": plan_json(conversion.plan),
+        "cost": conversion.cost,
+        "lower_bound": conversion.lower_bound,
+        "error": conversion.error,
+    }
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"khong chuyen duoc {type(value).__name__} sang JSON")
+
+
+def _finite(value):
+    """Bản sao của value với inf/nan thay bằng None (JSON chuẩn không có inf/nan)"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        value = value.tolist()
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+class ConversionService:
+    def __init__(self, db_file="image_database.pkl", cost_function_file="data/cost_function.json",
+                 transformations_file="data/transformations.json", workers=None, max_pending=64,
+                 timeout=30.0, batch_window=0.002, max_batch=32, max_body=1 << 20):
+        self.db = load_or_create_database(db_file)
+        tlm = TransformationLibraryManager()
+        for op in create_default_object_operators():
+            tlm.TLMinsert(op)
+        self.cfs = CostFunctionServer(cost_function_file)
+        # Mỗi luồng có ObjectConvertor riêng: danh mục phép biến đổi, heuristic và các bộ nhớ đệm
+        # của chúng được dựng lười, không an toàn khi nhiều luồng dùng chung
+        self._converter_args = (tlm, self.cfs, transformations_file)
+        self._local = threading.local()
+        self.converter.heuristic_model  # báo lỗi thư viện phép biến đổi ngay khi khởi động
+        self.pool = ConversionPool(tlm, cost_function_file, transformations_file, max_workers=workers)
+        # Luồng điều phối các việc chờ pool (convert_many, match_objects, top_k) để không chặn vòng sự kiện
+        self.threads = ThreadPoolExecutor(max_workers=max(4, self.pool.max_workers))
+        self.features = FeatureMatrix(self.db)
+        self.features.refresh()
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_body = max_body
+        self.pending = 0
+        self.started = time.monotonic()
+        self.metrics: Dict[str, EndpointMetrics] = {}
+        self.convert_batcher = MicroBatcher(self._convert_batch, batch_window, max_batch)
+        self.cost_batcher = MicroBatcher(self._cost_batch, batch_window, max_batch)
+        self.routes = {
+            ("POST", "/convert"): self.handle_convert,
+            ("POST", "/convert_images"): self.handle_convert_images,
+            ("POST", "/cost"): self.handle_cost,
+            ("POST", "/retrieve"): self.handle_retrieve,
+            ("GET", "/metrics"): self.handle_metrics,
+            ("GET", "/health"): self.handle_health,
+        }
+
+    @property
+    def converter(self) -> ObjectConvertor:
+        """ObjectConvertor của luồng đang chạy"""
+        converter = getattr(self._local, "converter", None)
+        if converter is None:
+            converter = self._local.converter = ObjectConvertor(*self._converter_args)
+        return converter
+
+    def close(self):
+        self.features.close()
+        self.threads.shutdown(wait=False)
+        self.pool.shutdown(wait=False)
+
+    # --- Hàng đợi và hạn chót ---
+
+    def _release(self, future):
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()  # đã hết hạn chót nên không ai đọc kết quả
+
+    def _timeout(self, data: dict) -> float:
+        """Hạn chót của yêu cầu (data["timeout"], không quá timeout của dịch vụ), kiểm tra trước khi nhận việc"""
+        timeout = data.get("timeout", self.timeout)
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or math.isnan(timeout) or timeout < 0:
+            raise HTTPError(400, "timeout phai la so giay khong am")
+        return min(float(timeout), self.timeout)
+
+    async def _wait(self, timeout: float, work: asyncio.Future):
+        """Chờ work tới hạn chót timeout (giây), hết hạn thì trả 504"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(work), timeout)
+        except asyncio.TimeoutError:
+            # Công việc vẫn chạy tới khi xong: giữ chỗ trong hàng đợi để backpressure phản ánh tải thật
+            self.pending += 1
+            work.add_done_callback(self._release)
+            raise HTTPError(504, f"qua han {timeout} giay")
+
+    def _in_thread(self, fn, *args, **kwargs) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self.threads, lambda: fn(*args, **kwargs))
+
+    def get_image(self, data) -> ImageMeta:
+        if isinstance(data, str):
+            if data not in self.db.images:
+                raise HTTPError(404, f"khong co anh '{data}'")
+            return self.db.images[data]
+        if not isinstance(data, dict):
+            raise HTTPError(400, "anh phai la ten anh hoac object JSON")
+        objects = [parse_object(o, f"object{i}") for i, o in enumerate(data.get("objects", []))]
+        try:
+            return ImageMeta(str(data.get("name", "")), int(data.get("width", 0)), int(data.get("height", 0)), objects)
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"anh khong hop le: {e}")
+
+    # --- Xử lý theo lô ---
+
+    async def _convert_batch(self, items, resolve):
+        """Mỗi nhóm yêu cầu cùng options là một lần convert_many trên pool"""
+        loop = asyncio.get_running_loop()
+        groups: Dict[str, List[int]] = {}
+        for i, (_, _, options) in enumerate(items):
+            groups.setdefault(json.dumps(options, sort_keys=True), []).append(i)
+
+        def run(indices):
+            pairs = [items[i][:2] for i in indices]
+            options = items[indices[0]][2]
+            for conversion in convert_many(self.converter, pairs, self.pool, ordered=False, **options):
+                loop.call_soon_threadsafe(resolve, indices[conversion.index], conversion)
+
+        await asyncio.gather(*(loop.run_in_executor(self.threads, run, indices) for indices in groups.values()))
+
+    async def _cost_batch(self, items, resolve):
+        """Các yêu cầu cùng kiểu phép biến đổi và cùng tên tham số được tính bằng một lần EvaluateBatch"""
+        groups: Dict[Tuple[str, Tuple[str, ...]], List[int]] = {}
+        for i, (type_, params) in enumerate(items):
+            groups.setdefault((type_, tuple(sorted(params))), []).append(i)
+
+        def run():
+            for (type_, names), indices in groups.items():
+                try:
+                    columns = {name: [items[i][1][name] for i in indices] for name in names}
+                    costs = self.cfs.EvaluateBatch(type_, columns)
+                except Exception:
+                    costs = [math.nan] * len(indices)
+                for i, cost in zip(indices, costs):
+                    if math.isnan(cost):
+                        # Tính lại riêng yêu cầu lỗi để trả về đúng thông báo lỗi
+                        try:
+                            cost = self.cfs.EvaluateCall({"type": type_, "params": items[i][1]})
+                        except Exception as e:
+                            cost = HTTPError(400, str(e))
+                    yield i, cost
+
+        for i, result in await self._in_thread(lambda: list(run())):
+            resolve(i, result if isinstance(result, HTTPError) else float(result))
+
+    # --- Endpoint ---
+
+    async def handle_convert(self, data: dict) -> dict:
+        o1 = parse_object(data.get("source"), "source")
+        o2 = parse_object(data.get("target"), "target")
+        options, timeout = parse_options(data), self._timeout(data)
+        conversion = await self._wait(timeout, self.convert_batcher.submit((o1, o2, options)))
+        return conversion_json(conversion)
+
+    async def handle_convert_images(self, data: dict) -> dict:
+        source, target = self.get_image(data.get("source")), self.get_image(data.get("target"))
+        if len(source.objects) != len(target.objects):
+            raise HTTPError(400, "Hai anh phai co cung so luong object")
+        options, timeout = parse_options(data), self._timeout(data)
+        conversions = await self._wait(timeout, self._in_thread(
+            lambda: match_objects(self.converter, source.objects, target.objects, self.pool, **options)))
+        cost = math.fsum(math.inf if c.plan is None else c.cost for c in conversions)
+        return {"cost": cost if cost < math.inf else None,
+                "conversions": [conversion_json(c) for c in conversions]}
+
+    async def handle_cost(self, data: dict) -> dict:
+        type_, params = data.get("type"), data.get("params", {})
+        if not isinstance(type_, str) or not isinstance(params, dict):
+            raise HTTPError(400, "can 'type' (chuoi) va 'params' (object JSON)")
+        if self.cfs.get_cost_function(type_) is None:
+            raise HTTPError(404, f"khong tim thay cong thuc cho kieu {type_}")
+        timeout = self._timeout(data)
+        return {"cost": await self._wait(timeout, self.cost_batcher.submit((type_, params)))}
+
+    async def handle_retrieve(self, data: dict) -> dict:
+        query = self.get_image(data.get("query"))
+        try:
+            k = int(data.get("k", 5))
+            max_cost = float(data.get("max_cost", math.inf))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "k phai la so nguyen, max_cost phai la so")
+        options, timeout = parse_options(data), self._timeout(data)
+        results, stats = await self._wait(timeout, self._in_thread(
+            lambda: top_k(self.converter, self.db, query, k, self.pool, return_stats=True, features=self.features,
+                          max_cost=max_cost, **options)))
+        return {
+            "results": [{"name": r.name, "cost": r.cost, "conversions": [conversion_json(c) for c in r.conversions]}
+                        for r in results],
+            "stats": vars(stats),
+        }
+
+    async def handle_metrics(self, data: dict) -> dict:
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "workers": self.pool.max_workers,
+            "endpoints": {path: metrics.snapshot() for path, metrics in self.metrics.items()},
+            "batches": {"convert": self.convert_batcher.snapshot(), "cost": self.cost_batcher.snapshot()},
+        }
+
+    async def handle_health(self, data: dict) -> dict:
+        return {"status": "ok", "images": len(self.db.images)}
+
+    # --- HTTP ---
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, dict, Dict[str, str]]:
+        route = self.routes.get((method, path))
+        if route is None:
+            if any(path == route_path for _, route_path in self.routes):
+                return 405, {"error": f"khong ho tro {method} {path}"}, {}
+            return 404, {"error": f"khong co endpoint {path}"}, {}
+        metrics = self.metrics.setdefault(path, EndpointMetrics())
+        started = time.perf_counter()
+        limited = method == "POST"
+        if limited and self.pending >= self.max_pending:
+            metrics.record(time.perf_counter() - started, 503)
+            return 503, {"error": "dich vu dang qua tai, thu lai sau"}, {"Retry-After": "1"}
+
+        if limited:
+            self.pending += 1
+        headers: Dict[str, str] = {}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(400, "noi dung yeu cau phai la object JSON")
+            status, payload = 200, await route(data)
+        except HTTPError as e:
+            status, payload, headers = e.status, {"error": e.message}, e.headers
+        except json.JSONDecodeError as e:
+            status, payload = 400, {"error": f"JSON khong hop le: {e}"}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            if limited:
+                self.pending -= 1
+        metrics.record(time.perf_counter() - started, status)
+        return status, payload, headers
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(phương thức, đường dẫn, header, nội dung) của yêu cầu tiếp theo, None khi hết kết nối"""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "dong yeu cau khong hop le")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Content-Length khong hop le")
+        if length > self.max_body:
+            raise HTTPError(413, f"noi dung qua {self.max_body} byte")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: dict, headers: Dict[str, str],
+                        keep_alive: bool):
+        body = json.dumps(_finite(payload), default=_json_default, allow_nan=False).encode("utf-8")
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 "Content-Type: application/json; charset=utf-8",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    # Không đọc được yêu cầu thì không biết ranh giới yêu cầu sau: trả lỗi rồi đóng kết nối
+                    self._write_response(writer, e.status, {"error": e.message}, e.headers, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload, extra = await self.dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Dang phuc vu tai {addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="image_database.pkl")
+    parser.add_argument("--cost-functions", default="data/cost_function.json")
+    parser.add_argument("--transformations", default="data/transformations.json")
+    parser.add_argument("--workers", type=int, default=None, help="số tiến trình worker (mặc định: số CPU)")
+    parser.add_argument("--max-pending", type=int, default=64, help="số yêu cầu xử lý đồng thời tối đa")
+    parser.add_argument("--timeout", type=float, default=30.0, help="hạn chót mặc định và tối đa (giây)")
+    parser.add_argument("--batch-window-ms", type=float, default=2.0, help="thời gian gom yêu cầu thành lô")
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+
+    service = ConversionService(args.db, args.cost_functions, args.transformations, args.workers,
+                                args.max_pending, args.timeout, args.batch_window_ms / 1000, args.max_batch)
+    service.pool.warm_up()
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
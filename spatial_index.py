@@ -0,0 +1,294 @@
+import heapq
+import itertools
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from object_manager import ImageDatabase, ImageMeta
+
+# R-tree trên hộp bao của object để trả lời "object nào (của ảnh nào) giao/nằm
+# trong một vùng" và "object gần một điểm nhất" mà không duyệt mọi object.
+# Dựng ban đầu bằng STR (Sort-Tile-Recursive): sắp các hộp theo tâm x, chia
+# thành các dải rồi sắp từng dải theo tâm y và gom đủ max_entries mỗi nút.
+# Thêm và xóa theo Guttman (tách nút bậc hai, xóa nút thiếu rồi chèn lại).
+
+Box = Tuple[float, float, float, float]  # x1, y1, x2, y2 (x1 <= x2, y1 <= y2)
+
+
+def _union(a: Box, b: Box) -> Box:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _area(box: Box) -> float:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    """Hai hộp có điểm chung (tính cả cạnh)"""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _contains(outer: Box, inner: Box) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[2] <= outer[2] and inner[3] <= outer[3]
+
+
+def _distance(x, y, box: Box) -> float:
+    """Khoảng cách Euclid từ điểm (x, y) tới hộp (0 nếu điểm nằm trong hộp)"""
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+def _bounds(boxes: Iterable[Box]) -> Optional[Box]:
+    result = None
+    for box in boxes:
+        result = box if result is None else _union(result, box)
+    return result
+
+
+class RNode:
+    """Nút R-tree: lá chứa các (hộp, khóa), nút trong chứa các nút con"""
+
+    __slots__ = ("leaf", "entries", "box")
+
+    def __init__(self, leaf: bool, entries: list):
+        self.leaf = leaf
+        self.entries = entries
+        self.box: Optional[Box] = None
+        self.update_box()
+
+    def boxes(self) -> Iterable[Box]:
+        return (entry[0] for entry in self.entries) if self.leaf else (child.box for child in self.entries)
+
+    def update_box(self):
+        self.box = _bounds(self.boxes())
+
+
+class RTree:
+    """R-tree trên các cặp (hộp, khóa); khóa phải hashable và so sánh được bằng =="""
+
+    def __init__(self, entries: Iterable[Tuple[Box, Hashable]] = (), max_entries=16):
+        if max_entries < 4:
+            raise ValueError("max_entries phai >= 4")
+        self.max_entries = max_entries
+        self.min_entries = max(2, max_entries * 2 // 5)
+        self.size = 0
+        self.root = RNode(True, [])
+        self.bulk_load(entries)
+
+    def __len__(self):
+        return self.size
+
+    def bulk_load(self, entries: Iterable[Tuple[Box, Hashable]]):
+        """Dựng lại toàn bộ cây bằng STR từ các (hộp, khóa)"""
+        entries = [(tuple(box), key) for box, key in entries]
+        self.size = len(entries)
+        if not entries:
+            self.root = RNode(True, [])
+            return
+        nodes = self._pack(entries, leaf=True)
+        while len(nodes) > 1:
+            nodes = self._pack(nodes, leaf=False)
+        self.root = nodes[0]
+
+    def _pack(self, items: list, leaf: bool) -> List[RNode]:
+        def box_of(item):
+            return item[0] if leaf else item.box
+
+        m = self.max_entries
+        pages = math.ceil(len(items) / m)
+        slice_size = math.ceil(math.sqrt(pages)) * m
+        items = sorted(items, key=lambda item: box_of(item)[0] + box_of(item)[2])
+        nodes = []
+        for start in range(0, len(items), slice_size):
+            strip = sorted(items[start:start + slice_size], key=lambda item: box_of(item)[1] + box_of(item)[3])
+            nodes.extend(RNode(leaf, strip[i:i + m]) for i in range(0, len(strip), m))
+        return nodes
+
+    # --- Cập nhật ---
+
+    def insert(self, box: Box, key: Hashable):
+        entry = (tuple(box), key)
+        sibling = self._insert(self.root, entry)
+        if sibling is not None:
+            self.root = RNode(False, [self.root, sibling])
+        self.size += 1
+
+    def _insert(self, node: RNode, entry) -> Optional[RNode]:
+        box = entry[0]
+        if node.leaf:
+            node.entries.append(entry)
+        else:
+            # Nút con cần mở rộng ít diện tích nhất (hòa thì chọn nút nhỏ hơn)
+            child = min(node.entries, key=lambda c: (_area(_union(c.box, box)) - _area(c.box), _area(c.box)))
+            sibling = self._insert(child, entry)
+            if sibling is not None:
+                node.entries.append(sibling)
+        node.box = box if node.box is None else _union(node.box, box)
+        if len(node.entries) > self.max_entries:
+            return self._split(node)
+        return None
+
+    def _split(self, node: RNode) -> RNode:
+        """Tách nút bậc hai (Guttman); node giữ một nhóm, trả về nút mới chứa nhóm còn lại"""
+        entries = node.entries
+        boxes = list(node.boxes())
+        # Hai hạt giống lãng phí diện tích nhiều nhất khi gộp
+        _, first, second = max((_area(_union(boxes[i], boxes[j])) - _area(boxes[i]) - _area(boxes[j]), i, j)
+                               for i, j in itertools.combinations(range(len(boxes)), 2))
+        groups = [[first], [second]]
+        covers = [boxes[first], boxes[second]]
+        remaining = [i for i in range(len(entries)) if i not in (first, second)]
+        while remaining:
+            # Nhóm thiếu phải nhận hết phần còn lại để đủ min_entries
+            for g in (0, 1):
+                if len(groups[g]) + len(remaining) <= self.min_entries:
+                    groups[g].extend(remaining)
+                    covers[g] = _bounds([covers[g]] + [boxes[i] for i in remaining])
+                    remaining = []
+                    break
+            if not remaining:
+                break
+            growth = [(_area(_union(covers[0], boxes[i])) - _area(covers[0]),
+                       _area(_union(covers[1], boxes[i])) - _area(covers[1]), i) for i in remaining]
+            grow0, grow1, pick = max(growth, key=lambda g: abs(g[0] - g[1]))
+            remaining.remove(pick)
+            g = 0 if (grow0, _area(covers[0]), len(groups[0])) <= (grow1, _area(covers[1]), len(groups[1])) else 1
+            groups[g].append(pick)
+            covers[g] = _union(covers[g], boxes[pick])
+        node.entries = [entries[i] for i in groups[0]]
+        node.box = covers[0]
+        return RNode(node.leaf, [entries[i] for i in groups[1]])
+
+    def delete(self, box: Box, key: Hashable) -> bool:
+        """Xóa cặp (hộp, khóa); trả về False nếu không có trong cây"""
+        orphans: list = []
+        if not self._delete(self.root, tuple(box), key, orphans):
+            return False
+        self.size -= 1
+        if not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0]
+        elif not self.root.leaf and not self.root.entries:
+            self.root = RNode(True, [])
+        # Chèn lại các phần tử của những nút bị bỏ vì quá ít phần tử
+        for entry in orphans:
+            sibling = self._insert(self.root, entry)
+            if sibling is not None:
+                self.root = RNode(False, [self.root, sibling])
+        return True
+
+    def _delete(self, node: RNode, box: Box, key, orphans: list) -> bool:
+        if node.leaf:
+            for i, (entry_box, entry_key) in enumerate(node.entries):
+                if entry_key == key and entry_box == box:
+                    del node.entries[i]
+                    node.update_box()
+                    return True
+            return False
+        for child in node.entries:
+            if child.box is None or not _contains(child.box, box) or not self._delete(child, box, key, orphans):
+                continue
+            if len(child.entries) < self.min_entries:
+                node.entries.remove(child)
+                orphans.extend(self._leaf_entries(child))
+            node.update_box()
+            return True
+        return False
+
+    @staticmethod
+    def _leaf_entries(node: RNode) -> List[Tuple[Box, Hashable]]:
+        if node.leaf:
+            return list(node.entries)
+        return [entry for child in node.entries for entry in RTree._leaf_entries(child)]
+
+    # --- Truy vấn ---
+
+    def _collect(self, node_test, entry_test) -> List[Tuple[Box, Hashable]]:
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.box is None or not node_test(node.box):
+                continue
+            if node.leaf:
+                found.extend(entry for entry in node.entries if entry_test(entry[0]))
+            else:
+                stack.extend(node.entries)
+        return found
+
+    def intersecting(self, window: Box) -> List[Tuple[Box, Hashable]]:
+        """Các phần tử có hộp giao với window"""
+        return self._collect(lambda box: _intersects(box, window), lambda box: _intersects(box, window))
+
+    def within(self, window: Box) -> List[Tuple[Box, Hashable]]:
+        """Các phần tử có hộp nằm trọn trong window"""
+        return self._collect(lambda box: _intersects(box, window), lambda box: _contains(window, box))
+
+    def containing(self, region: Box) -> List[Tuple[Box, Hashable]]:
+        """Các phần tử có hộp chứa trọn region (một điểm là hộp x1 = x2, y1 = y2)"""
+        return self._collect(lambda box: _contains(box, region), lambda box: _contains(box, region))
+
+    def nearest(self, x, y, k=1) -> List[Tuple[float, Box, Hashable]]:
+        """k phần tử có hộp gần điểm (x, y) nhất, tăng dần theo khoảng cách"""
+        if k <= 0 or self.root.box is None:
+            return []
+        counter = itertools.count()
+        heap = [(_distance(x, y, self.root.box), next(counter), self.root, None)]
+        found = []
+        while heap and len(found) < k:
+            distance, _, node, entry = heapq.heappop(heap)
+            if entry is not None:
+                found.append((distance, entry[0], entry[1]))
+            elif node.leaf:
+                for child_entry in node.entries:
+                    heapq.heappush(heap, (_distance(x, y, child_entry[0]), next(counter), None, child_entry))
+            else:
+                for child in node.entries:
+                    heapq.heappush(heap, (_distance(x, y, child.box), next(counter), child, None))
+        return found
+
+
+class ObjectSpatialIndex:
+    """R-tree trên hộp bao của mọi object trong db, khóa là (tên ảnh, vị trí object); tự cập nhật theo sự kiện của db"""
+
+    def __init__(self, db: ImageDatabase, max_entries=16):
+        self.db = db
+        self._image_entries: Dict[str, List[Tuple[Box, Tuple[str, int]]]] = {
+            name: self._entries(name, image) for name, image in db.images.items()}
+        self.tree = RTree((entry for entries in self._image_entries.values() for entry in entries), max_entries)
+        db.add_listener(self.on_change)
+
+    @staticmethod
+    def _entries(name: str, image: ImageMeta) -> List[Tuple[Box, Tuple[str, int]]]:
+        return [((min(o.x1, o.x2), min(o.y1, o.y2), max(o.x1, o.x2), max(o.y1, o.y2)), (name, index))
+                for index, o in enumerate(image.objects)]
+
+    def on_change(self, event: str, name: str, image: Optional[ImageMeta]):
+        for box, key in self._image_entries.pop(name, ()):
+            self.tree.delete(box, key)
+        if event in ("add", "update"):
+            entries = self._entries(name, image)
+            self._image_entries[name] = entries
+            for box, key in entries:
+                self.tree.insert(box, key)
+
+    def close(self):
+        self.db.remove_listener(self.on_change)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def intersecting(self, x1, y1, x2, y2) -> List[Tuple[str, int]]:
+        """(tên ảnh, vị trí object) của các object giao với vùng cho trước"""
+        return sorted(key for _, key in self.tree.intersecting((x1, y1, x2, y2)))
+
+    def within(self, x1, y1, x2, y2) -> List[Tuple[str, int]]:
+        """(tên ảnh, vị trí object) của các object nằm trọn trong vùng cho trước"""
+        return sorted(key for _, key in self.tree.within((x1, y1, x2, y2)))
+
+    def containing(self, x, y) -> List[Tuple[str, int]]:
+        """(tên ảnh, vị trí object) của các object chứa điểm (x, y)"""
+        return sorted(key for _, key in self.tree.containing((x, y, x, y)))
+
+    def nearest(self, x, y, k=1) -> List[Tuple[str, int, float]]:
+        """k object gần điểm (x, y) nhất: (tên ảnh, vị trí object, khoảng cách)"""
+        return [(key[0], key[1], distance) for distance, _, key in self.tree.nearest(x, y, k)]
@@ -1,8 +1,11 @@
 from tkinter import ttk, messagebox, Toplevel, StringVar, Entry
 from tkinter.ttk import Combobox
 import tkinter as tk
-import json
+import math
 import re
+
+import numpy as np
+
 from cost_function_server import CostFunctionServer
 
 class TabCFS:
@@ -68,13 +71,11 @@ class TabCFS:
     def refresh_cost_functions(self):
         self.listbox.delete(0, tk.END)
         try:
-            with open(self.server.path, "r") as f:
-                data = json.load(f)
-                for func in data:
-                    display_text = self.display_formula(func["formula"])
-                    self.listbox.insert(
-                        tk.END, f"{func['name']} ({func['type']}): {display_text}"
-                    )
+            for func in self.server.get_cost_functions():
+                display_text = self.display_formula(func["formula"])
+                self.listbox.insert(
+                    tk.END, f"{func['name']} ({func['type']}): {display_text}"
+                )
         except Exception as e:
             print("Lỗi khi đọc file JSON:", e)
             messagebox.showerror("Lỗi", f"Lỗi khi đọc file JSON: {e}", parent=self.parent)
@@ -148,8 +149,7 @@ class TabCFS:
         ttk.Button(frame, text="Xác Nhận", command=submit).pack(pady=20)
 
     def evaluate_cost(self):
-        with open(self.server.path, "r") as f:
-            cost_functions = json.load(f)
+        cost_functions = self.server.get_cost_functions()
 
         if not cost_functions:
             messagebox.showinfo("Thông báo", "Chưa có hàm chi phí nào.", parent=self.parent)
@@ -174,6 +174,8 @@ class TabCFS:
         param_frame = ttk.Frame(frame)
         param_frame.pack(fill="both", pady=10)
         param_entries = {}
+        ttk.Label(frame, text="Nhập đầu:cuối:bước hoặc 1, 2, 3 để tính với nhiều giá trị",
+                  font=("Arial", 9)).pack()
 
         def on_name_selected(event=None):
             for widget in param_frame.winfo_children():
@@ -209,19 +211,68 @@ class TabCFS:
                 return
 
             params = {}
+            sweeps = {}
             for var, entry_var in param_entries.items():
                 value = entry_var.get()
+                try:
+                    sweep = self.parse_sweep(value)
+                except ValueError as e:
+                    messagebox.showerror("Lỗi", f"{var}: {e}", parent=window)
+                    return
+                if sweep is not None:
+                    sweeps[var] = sweep
+                    continue
                 try:
                     value = float(value) if '.' in value else int(value)
                 except:
                     value = value
                 params[var] = value
 
-            operator = {"type": func["type"], "params": params}
             try:
-                cost = self.server.EvaluateCall(operator)
-                messagebox.showinfo("Kết quả", f"Chi phí tính được: {cost}", parent=window)
+                if sweeps:
+                    # Mọi tổ hợp giá trị của các biến quét, tính một lần trên cả mảng
+                    grids = np.meshgrid(*sweeps.values(), indexing="ij")
+                    columns = {var: grid.ravel() for var, grid in zip(sweeps, grids)}
+                    costs = self.server.EvaluateBatch(func["type"], {**params, **columns})
+                    self.show_sweep(window, columns, costs)
+                else:
+                    operator = {"type": func["type"], "params": params}
+                    cost = self.server.EvaluateCall(operator)
+                    messagebox.showinfo("Kết quả", f"Chi phí tính được: {cost}", parent=window)
             except Exception as e:
                 messagebox.showerror("Lỗi", str(e), parent=window)
 
-        ttk.Button(frame, text="Tính", command=submit).pack(pady=20)
\ No newline at end of file
+        ttk.Button(frame, text="Tính", command=submit).pack(pady=20)
+
+    def parse_sweep(self, value):
+        """Mảng giá trị từ "đầu:cuối:bước" (gồm cả cuối) hoặc "1, 2, 3"; None nếu chỉ là một giá trị"""
+        value = value.strip()
+        if value.startswith("("):
+            return None  # bộ màu (r, g, b)
+        if ":" in value:
+            parts = [float(p) for p in value.split(":")]
+            if len(parts) != 3 or parts[2] <= 0:
+                raise ValueError("cần dạng đầu:cuối:bước với bước > 0")
+            start, stop, step = parts
+            values = start + step * np.arange(int(math.floor((stop - start) / step + 1e-9)) + 1)
+        elif "," in value:
+            values = np.array([float(p) for p in value.split(",")])
+        else:
+            return None
+        if np.all(values == np.round(values)) and not any("." in p for p in re.split("[:,]", value)):
+            values = values.astype(int)
+        return values
+
+    def show_sweep(self, parent, columns, costs):
+        window = Toplevel(parent)
+        window.title("Kết quả quét tham số")
+        window.geometry("500x400")
+        scrollbar = ttk.Scrollbar(window)
+        scrollbar.pack(side="right", fill="y")
+        listbox = tk.Listbox(window, font=("Courier", 10), yscrollcommand=scrollbar.set)
+        listbox.pack(fill="both", expand=True)
+        scrollbar.config(command=listbox.yview)
+        listbox.insert(tk.END, "  ".join(f"{var:>10}" for var in columns) + f"  {'chi phí':>12}")
+        for i, cost in enumerate(costs.tolist()):
+            row = "  ".join(f"{columns[var][i]:>10}" for var in columns)
+            listbox.insert(tk.END, f"{row}  {'lỗi' if math.isnan(cost) else f'{cost:.6g}':>12}")
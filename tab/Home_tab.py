@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageDraw, ImageTk
-from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion, save_database
+from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion, pack_color, save_database, unpack_color
 import ast
 
 class TabHome:
@@ -165,7 +165,8 @@ class TabHome:
             try:
                 img_meta.objects = []
                 for e in entries:
-                    color = ast.literal_eval(e["color"].get())
+                    # Chuẩn hóa (ví dụ 255.0 -> 255) và báo lỗi màu sai ngay khi lưu
+                    color = unpack_color(pack_color(ast.literal_eval(e["color"].get())))
                     obj = ImageObjectRegion(
                         obj_id=e["id"].get(),
                         x1=int(e["x1"].get()),
@@ -175,6 +176,7 @@ class TabHome:
                         color=color
                     )
                     img_meta.add_object(obj)
+                self.db.update_image(img_meta.name)
                 save_database(self.db, self.db_file)
                 self.display_selected_image()
                 window.destroy()
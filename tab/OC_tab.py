@@ -1,10 +1,17 @@
-import copy
+import math
 import tkinter as tk
 from tkinter import ttk, messagebox
 from object_manager import ImageDatabase
 from object_converter import ObjectConvertor
 from cost_function_server import CostFunctionServer
 from transformation_manager import TransformationLibraryManager, create_default_object_operators
+from parallel_convertor import ConversionPool, convert_many, object_pairs
+from correspondence import match_objects
+from concurrent.futures import ThreadPoolExecutor
+
+# Mặc định A* cho lời giải tối ưu; anytime (tùy chọn) trả lời trong khoảng 200 ms với lời giải tốt nhất tìm được
+CONVERT_OPTIONS = {"algorithm": "astar"}
+ANYTIME_OPTIONS = {"algorithm": "anytime", "deadline": 0.2}
 
 class TabOC:
     def __init__(self, parent, db: ImageDatabase):
@@ -13,6 +20,12 @@ class TabOC:
         self.tlm = TransformationLibraryManager()
         for op in create_default_object_operators():
             self.tlm.TLMinsert(op)
+        # Converter và pool tiến trình được tạo một lần và dùng lại cho mọi lần chạy
+        self.converter = None
+        self.pool = None
+        self.background = None  # luồng nền chạy ghép object để không chặn giao diện
+        self.pending = {}  # Future -> chỉ số object đang chuyển đổi
+        self.results = {}
         self.setup_ui()
 
     def setup_ui(self):
@@ -34,6 +47,14 @@ class TabOC:
         self.result_text = tk.Text(frame, height=20, width=60, font=("Helvetica", 9), bg="#ecf0f1")
         self.result_text.pack(pady=10)
 
+        self.match_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Ghép object theo tổng chi phí nhỏ nhất (không theo thứ tự)",
+                       variable=self.match_var, font=("Helvetica", 9), bg="#f0f4f8").pack()
+
+        self.anytime_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Tìm kiếm anytime (nhanh, dừng sau 200 ms, có thể chưa tối ưu)",
+                       variable=self.anytime_var, font=("Helvetica", 9), bg="#f0f4f8").pack()
+
         self.image1_box.bind("<<ComboboxSelected>>", self.update_image2_options)
         ttk.Button(frame, text="Chạy Convertor", command=self.run_convertor).pack(pady=10)
 
@@ -67,51 +88,112 @@ class TabOC:
             messagebox.showerror("Lỗi", "Ảnh không có object để chuyển đổi")
             return
 
-        converter = ObjectConvertor(self.tlm, CostFunctionServer(), transformations_file="data/transformations.json")
+        if self.pending:
+            messagebox.showinfo("Thông báo", "Đang chuyển đổi, vui lòng chờ")
+            return
+
+        if self.match_var.get():
+            self.run_matching(img1, img2)
+            return
+
+        pairs = object_pairs(img1, img2)
+        self.results = {}
+        try:
+            pool = self.get_pool()
+        except Exception:
+            pool = None  # Không tạo được tiến trình con: chuyển đổi tuần tự trên converter dùng chung
+        future = self.get_background().submit(self.collect_results, self.get_converter(), pairs, pool,
+                                              self.convert_options())
+        self.pending = {future: None}
+        self.show_results(pairs)
+        self.parent.after(50, self.poll_results, pairs, future)
+
+    def convert_options(self) -> dict:
+        return ANYTIME_OPTIONS if self.anytime_var.get() else CONVERT_OPTIONS
+
+    def collect_results(self, converter, pairs, pool, options):
+        """Chạy trên luồng nền: nhận kết quả của từng object ngay khi xong"""
+        for result in convert_many(converter, pairs, pool, ordered=False, **options):
+            self.results[result.index] = result
+
+    def run_matching(self, img1, img2):
+        """Ghép object hai ảnh theo tổng chi phí nhỏ nhất trên luồng nền"""
+        try:
+            pool = self.get_pool()
+        except Exception:
+            pool = None
+        future = self.get_background().submit(match_objects, self.get_converter(), img1.objects, img2.objects, pool,
+                                          **self.convert_options())
+        self.pending = {future: None}
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, "Đang ghép object...")
+        self.parent.after(50, self.poll_matching, future, img1, img2)
+
+    def poll_matching(self, future, img1, img2):
+        if not future.done():
+            self.parent.after(50, self.poll_matching, future, img1, img2)
+            return
+        self.pending = {}
+        try:
+            conversions = future.result()
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không ghép được object: {e}")
+            return
+        pairs = [(img1.objects[r.index], img2.objects[r.target_index]) for r in conversions]
+        self.results = dict(enumerate(conversions))
+        self.show_results(pairs)
+
+    def get_converter(self) -> ObjectConvertor:
+        if self.converter is None:
+            self.converter = ObjectConvertor(self.tlm, CostFunctionServer(), transformations_file="data/transformations.json")
+        return self.converter
+
+    def get_background(self) -> ThreadPoolExecutor:
+        if self.background is None:
+            self.background = ThreadPoolExecutor(max_workers=1)
+        return self.background
+
+    def get_pool(self) -> ConversionPool:
+        if self.pool is None:
+            self.pool = ConversionPool(self.tlm)
+        return self.pool
+
+    def poll_results(self, pairs, future):
+        """Hiển thị các kết quả đã xong mà không chặn luồng giao diện"""
+        if future.done():
+            self.pending = {}
+            if future.exception() is not None:
+                messagebox.showerror("Lỗi", f"Không chuyển đổi được: {future.exception()}")
+        self.show_results(pairs)
+        if self.pending:
+            self.parent.after(50, self.poll_results, pairs, future)
+
+    def show_results(self, pairs):
         objects_info = []
         total_image_cost = 0.0
 
-        for i in range(len(img1.objects)):
-            obj1 = img1.objects[i]
-            obj2 = img2.objects[i]
-            result = converter.convert(obj1, obj2)
+        for i, (obj1, obj2) in enumerate(pairs):
+            header = f"Object {i+1} ({obj1.obj_id} -> {obj2.obj_id}):"
+            result = self.results.get(i)
             if result is None:
-                objects_info.append(f"Object {i+1} ({obj1.obj_id} -> {obj2.obj_id}):\n  Không tìm được chuỗi biến đổi phù hợp.")
-            elif result == []:
-                objects_info.append(f"Object {i+1} ({obj1.obj_id} -> {obj2.obj_id}):\n  Không cần biến đổi.\n  Tổng chi phí: 0.0")
+                objects_info.append(f"{header}\n  Đang chuyển đổi...")
+            elif result.error is not None:
+                objects_info.append(f"{header}\n  Lỗi: {result.error}")
+            elif result.plan is None and result.lower_bound is not None and result.lower_bound < math.inf:
+                objects_info.append(f"{header}\n  Hết thời gian tìm kiếm, chưa có lời giải "
+                                    f"(chi phí tối ưu >= {result.lower_bound:.2f}).")
+            elif result.plan is None:
+                objects_info.append(f"{header}\n  Không tìm được chuỗi biến đổi phù hợp.")
+            elif result.plan == []:
+                objects_info.append(f"{header}\n  Không cần biến đổi.\n  Tổng chi phí: 0.0")
             else:
-                steps = []
-                total_cost = 0.0
-                current_obj = copy.deepcopy(obj1)
-                for step in result:
-                    operator_data = {
-                        "type": step.operator.name,
-                        "params": {
-                            **step.params,
-                            "color1": getattr(current_obj, "color", (0, 0, 0)),
-                            "color2": getattr(step.apply(copy.deepcopy(current_obj)), "color", (0, 0, 0)),
-                            "val1": getattr(current_obj, "color", (0, 0, 0)),
-                            "val2": getattr(step.apply(copy.deepcopy(current_obj)), "color", (0, 0, 0)),
-                            "dx": step.params.get("dx", 0),
-                            "dy": step.params.get("dy", 0),
-                            "scale": step.params.get("scale", 1.0),
-                            "sx": step.params.get("scale_x", 1.0),
-                            "sy": step.params.get("scale_y", 1.0),
-                            "angle": step.params.get("angle", 0),
-                            "a": step.params.get("a", 0),
-                            "b": step.params.get("b", 0),
-                            "area": (current_obj.x2 - current_obj.x1) * (current_obj.y2 - current_obj.y1),
-                        }
-                    }
-                    cost = converter.cost_function_server.EvaluateCall(operator_data)
-                    total_cost += cost
-                    steps.append(f"  {step.operator.name} {step.params}")
-                    current_obj = step.apply(current_obj)
-                total_image_cost += total_cost
-                steps_str = "\n".join(steps)
-                objects_info.append(f"Object {i+1} ({obj1.obj_id} -> {obj2.obj_id}):\n{steps_str}\n  Tổng chi phí: {total_cost:.2f}")
+                total_image_cost += result.cost
+                steps_str = "\n".join(f"  {step.operator.name} {step.params}" for step in result.plan)
+                objects_info.append(f"{header}\n{steps_str}\n  Tổng chi phí: {result.cost:.2f}")
 
         objects_info.append(f"\nTổng chi phí của tất cả các object: {total_image_cost:.2f}")
+        if self.pending:
+            objects_info.append(f"Còn {len(pairs) - len(self.results)} object đang chuyển đổi...")
 
         self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, "\n".join(objects_info))
\ No newline at end of file
+        self.result_text.insert(tk.END, "\n".join(objects_info))
@@ -0,0 +1,111 @@
+import math
+import tkinter as tk
+from tkinter import ttk, messagebox
+from concurrent.futures import ThreadPoolExecutor
+from object_manager import ImageDatabase
+from object_converter import ObjectConvertor
+from cost_function_server import CostFunctionServer
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+from retrieval import top_k
+from feature_filter import FeatureMatrix
+
+# A* tối ưu để chi phí xếp hạng là chính xác; cặp object vượt max_expansions được báo là chưa xác định
+RETRIEVAL_OPTIONS = {"algorithm": "astar", "max_steps": math.inf, "max_expansions": 20000}
+
+class TabRetrieval:
+    def __init__(self, parent, db: ImageDatabase):
+        self.parent = parent
+        self.db = db
+        self.tlm = TransformationLibraryManager()
+        for op in create_default_object_operators():
+            self.tlm.TLMinsert(op)
+        self.converter = None
+        self.features = FeatureMatrix(db)  # tự dựng lại khi ảnh trong db thay đổi
+        self.background = None  # luồng nền chạy tìm kiếm để không chặn giao diện
+        self.pending = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        frame = tk.Frame(self.parent, bg="#f0f4f8")
+        frame.pack(padx=20, pady=20, fill="both", expand=True)
+
+        tk.Label(frame, text="Chọn ảnh truy vấn:", font=("Helvetica", 10), bg="#f0f4f8").pack()
+        self.query_var = tk.StringVar()
+        self.query_box = ttk.Combobox(frame, textvariable=self.query_var, width=25,
+                                      postcommand=lambda: self.query_box.configure(values=self.db.list_images()))
+        self.query_box.pack(pady=5)
+
+        tk.Label(frame, text="Số ảnh cần tìm (k):", font=("Helvetica", 10), bg="#f0f4f8").pack()
+        self.k_var = tk.IntVar(value=5)
+        ttk.Spinbox(frame, from_=1, to=100, textvariable=self.k_var, width=8).pack(pady=5)
+
+        tk.Label(frame, text="Chi phí tối đa (để trống nếu không giới hạn):", font=("Helvetica", 10),
+                 bg="#f0f4f8").pack()
+        self.max_cost_entry = ttk.Entry(frame, width=10)
+        self.max_cost_entry.pack(pady=5)
+
+        ttk.Button(frame, text="Tìm ảnh tương tự", command=self.run_retrieval).pack(pady=10)
+
+        self.result_text = tk.Text(frame, height=20, width=60, font=("Helvetica", 9), bg="#ecf0f1")
+        self.result_text.pack(pady=10)
+
+    def get_converter(self) -> ObjectConvertor:
+        if self.converter is None:
+            self.converter = ObjectConvertor(self.tlm, CostFunctionServer(), transformations_file="data/transformations.json")
+        return self.converter
+
+    def run_retrieval(self):
+        name = self.query_var.get()
+        if not name:
+            messagebox.showerror("Lỗi", "Phải chọn ảnh truy vấn")
+            return
+        if self.pending is not None:
+            messagebox.showinfo("Thông báo", "Đang tìm kiếm, vui lòng chờ")
+            return
+        try:
+            k = int(self.k_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Lỗi", "k phải là số nguyên dương")
+            return
+        try:
+            max_cost = float(self.max_cost_entry.get().strip() or "inf")
+        except ValueError:
+            messagebox.showerror("Lỗi", "Chi phí tối đa phải là số")
+            return
+
+        if self.background is None:
+            self.background = ThreadPoolExecutor(max_workers=1)
+        query = self.db.get_image(name)
+        self.pending = self.background.submit(top_k, self.get_converter(), self.db, query, k,
+                                              return_stats=True, features=self.features, max_cost=max_cost,
+                                              **RETRIEVAL_OPTIONS)
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, "Đang tìm kiếm...")
+        self.parent.after(50, self.poll_retrieval, query)
+
+    def poll_retrieval(self, query):
+        if not self.pending.done():
+            self.parent.after(50, self.poll_retrieval, query)
+            return
+        future, self.pending = self.pending, None
+        try:
+            results, stats = future.result()
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không tìm kiếm được: {e}")
+            return
+
+        lines = [f"Ảnh truy vấn: {query.name} ({len(query.objects)} object)",
+                 f"Ứng viên: {stats.candidates}, loại nhờ vector đặc trưng: {stats.filtered}, "
+                 f"loại nhờ cận dưới: {stats.pruned}, chạy A*: {stats.searched}", ""]
+        if not results:
+            lines.append("Không có ảnh nào cùng số object chuyển đổi được.")
+        for rank, result in enumerate(results, start=1):
+            lines.append(f"{rank}. {result.name} - tổng chi phí: {result.cost:.2f}")
+            for conversion in result.conversions:
+                steps = ", ".join(step.operator.name for step in conversion.plan) or "không cần biến đổi"
+                lines.append(f"    {conversion.source_id} -> {conversion.target_id}: {steps}")
+        if stats.unknown:
+            lines.append("")
+            lines.append(f"Chưa xác định được chi phí (hết giới hạn tìm kiếm): {', '.join(stats.unknown)}")
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, "\n".join(lines))
@@ -291,6 +291,7 @@ class TabSequence:
                     result_text.delete(1.0, tk.END)
                     stage_message = f"Stage {stage}: {operator_name} {params} cho {obj_id}"
                     operator_instance.apply(obj)
+                    self.db.update_image(img.name)
                     save_database(self.db, self.db_file)
 
                     # Tính chi phí
@@ -220,5 +220,6 @@ class TabTLM:
         for obj in img.objects:
             if obj.obj_id == object_id:
                 operator.apply(obj)
+                self.db.update_image(img_name)
                 save_database(self.db, self.db_file)
                 return
\ No newline at end of file
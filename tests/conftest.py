@@ -0,0 +1,77 @@
+import heapq
+import itertools
+import math
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cost_function_server import CostFunctionServer
+from object_converter import ObjectConvertor
+from object_manager import ImageObjectRegion, ObjectState, unpack_color
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+
+# Cặp object mà heuristic cũ đánh giá quá cao (tối ưu 1.2574: scale 1.5 hai lần rồi co y 0.5)
+REPRO_PAIR = (ObjectState(200, 550, 240, 650, 0x00FF00), ObjectState(175, 487, 265, 543, 0x00FF00))
+
+
+@pytest.fixture(scope="session")
+def convertor():
+    tlm = TransformationLibraryManager()
+    for op in create_default_object_operators():
+        tlm.TLMinsert(op)
+    cfs = CostFunctionServer(os.path.join(ROOT, "data", "cost_function.json"))
+    return ObjectConvertor(tlm, cfs, os.path.join(ROOT, "data", "transformations.json"))
+
+
+def region(state, name="o"):
+    """ImageObjectRegion tương ứng với một ObjectState"""
+    return ImageObjectRegion(name, state.x1, state.y1, state.x2, state.y2, unpack_color(state.color))
+
+
+def dijkstra(convertor, start, goal, max_coord=1000, limit=100000):
+    """Chi phí tối ưu và đường đi (state, chi phí tới state) bằng Dijkstra, None nếu vượt limit state"""
+    ops = convertor.operator_catalogue
+    dist = {start: 0.0}
+    prev = {}
+    tie = itertools.count()
+    heap = [(0.0, next(tie), start)]
+    while heap:
+        d, _, state = heapq.heappop(heap)
+        if d > dist[state]:
+            continue
+        if state == goal:
+            path = [state]
+            while path[-1] in prev:
+                path.append(prev[path[-1]])
+            return d, [(s, dist[s]) for s in reversed(path)]
+        if len(dist) > limit:
+            return None
+        for nxt, cost, _ in convertor.successors(state, ops, max_coord):
+            if d + cost < dist.get(nxt, math.inf):
+                dist[nxt] = d + cost
+                prev[nxt] = state
+                heapq.heappush(heap, (d + cost, next(tie), nxt))
+    return None
+
+
+def reachable_pairs(convertor, count, seed=0, steps=3, max_coord=1000):
+    """Các cặp (start, goal, chi phí tối ưu, đường đi) ngẫu nhiên mà goal tới được từ start"""
+    rng = random.Random(seed)
+    ops = convertor.operator_catalogue
+    pairs = []
+    while len(pairs) < count:
+        x1, y1 = rng.randrange(100, 400), rng.randrange(100, 400)
+        start = ObjectState(x1, y1, x1 + rng.randrange(20, 120), y1 + rng.randrange(20, 120),
+                            rng.choice([0xFF0000, 0x00FF00, 0x0000FF]))
+        goal = start
+        for _ in range(rng.randrange(1, steps + 1)):
+            goal = rng.choice([s for s, _, _ in convertor.successors(goal, ops, max_coord)])
+        found = dijkstra(convertor, start, goal, max_coord)
+        if found is not None:
+            pairs.append((start, goal) + found)
+    return pairs
@@ -0,0 +1,90 @@
+import random
+
+from attribute_index import ATTRIBUTES, AttributeIndex, AttributeMatch
+from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion
+
+
+def random_image(rng, name, count):
+    objects = []
+    for i in range(count):
+        x1, y1 = rng.randrange(0, 400), rng.randrange(0, 400)
+        color = tuple(rng.choice([0, 40, 100, 200, 255]) for _ in range(3))
+        objects.append(ImageObjectRegion(f"{name}-{i}", x1, y1, x1 + rng.randrange(1, 200),
+                                         y1 + rng.randrange(1, 200), color))
+    return ImageMeta(name, 1000, 1000, objects)
+
+
+def linear_scan(index, db, obj, min_match=None, radius=0, attributes=ATTRIBUTES, exclude=None):
+    """Kết quả query tính bằng cách duyệt mọi object của db"""
+    query_keys = dict(index.keys(obj))
+    matches = []
+    for name, image in db.images.items():
+        if name == exclude:
+            continue
+        for i, other in enumerate(image.objects):
+            score = 0
+            for attribute, value in index.keys(other):
+                if attribute not in attributes:
+                    continue
+                wanted = query_keys[attribute]
+                if attribute == "color" or radius <= 0:
+                    score += value == wanted
+                else:
+                    score += all(abs(a - b) <= radius for a, b in zip(value, wanted))
+            if score >= (len(attributes) if min_match is None else min_match) and score > 0:
+                matches.append(AttributeMatch(name, i, score))
+    matches.sort(key=lambda m: (-m.score, m.image, m.index))
+    return matches
+
+
+def expected_postings(index, db):
+    postings = {}
+    for name, image in db.images.items():
+        for i, obj in enumerate(image.objects):
+            for key in index.keys(obj):
+                postings.setdefault(key, set()).add((name, i))
+    return postings
+
+
+def test_query_matches_linear_scan():
+    rng = random.Random(0)
+    db = ImageDatabase()
+    for i in range(30):
+        db.add_image(random_image(rng, f"img{i}", rng.randrange(1, 5)))
+    index = AttributeIndex(db)
+    try:
+        assert index.postings == expected_postings(index, db)
+        assert len(index) == sum(len(image.objects) for image in db.images.values())
+        for _ in range(40):
+            obj = rng.choice(rng.choice(list(db.images.values())).objects)
+            for options in (dict(), dict(min_match=1), dict(min_match=2, radius=1),
+                            dict(attributes=("size", "cell"), radius=2), dict(min_match=1, exclude="img3")):
+                assert index.query(obj, **options) == linear_scan(index, db, obj, **options), options
+    finally:
+        index.close()
+
+
+def test_postings_follow_database_events():
+    rng = random.Random(1)
+    db = ImageDatabase()
+    index = AttributeIndex(db)
+    try:
+        for i in range(10):
+            db.add_image(random_image(rng, f"img{i}", 3))
+        assert index.postings == expected_postings(index, db)
+        # Sửa object tại chỗ rồi báo update
+        image = db.images["img4"]
+        image.objects[0] = random_image(rng, "new", 1).objects[0]
+        image.objects.pop()
+        db.update_image("img4")
+        assert index.postings == expected_postings(index, db)
+        db.delete_image("img7")
+        assert index.postings == expected_postings(index, db)
+        assert all(posting[0] != "img7" for postings in index.postings.values() for posting in postings)
+        obj = db.images["img4"].objects[0]
+        assert index.query(obj) == linear_scan(index, db, obj)
+    finally:
+        index.close()
+    # Sau close chỉ mục không còn nghe sự kiện
+    db.add_image(random_image(rng, "late", 2))
+    assert all(posting[0] != "late" for postings in index.postings.values() for posting in postings)
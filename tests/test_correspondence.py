@@ -0,0 +1,52 @@
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+from conftest import REPRO_PAIR, region
+from correspondence import lower_bound_matrix, match_objects, solve_assignment
+from object_manager import ImageObjectRegion, ObjectState
+
+
+def test_match_objects_stops_on_max_expansions(convertor):
+    start, goal = REPRO_PAIR
+    conversions = match_objects(convertor, [region(start)], [region(goal)], max_expansions=3)
+    assert conversions[0].plan is None
+    assert conversions[0].lower_bound <= 1.2573593128807148 + 1e-9
+    # Cùng ngưỡng max_expansions khi có cutoff: không lặp mãi, bỏ cặp không chuyển được
+    assert match_objects(convertor, [region(start)], [region(goal)], cutoff=2.0, max_expansions=3) is None
+    conversions = match_objects(convertor, [region(start)], [region(goal)], cutoff=2.0, max_coord=1000)
+    assert math.isclose(conversions[0].cost, 1.2573593128807148)
+
+
+def test_solve_assignment_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(100):
+        n = rng.randrange(1, 6)
+        m = n + rng.randrange(0, 3)
+        cost = np.array([[rng.choice([rng.random(), rng.randrange(3), math.inf]) for _ in range(m)] for _ in range(n)])
+        assignment = solve_assignment(cost)
+        assert len(set(assignment)) == n
+        best = min((sum(cost[i, j] for i, j in enumerate(columns)) for columns in itertools.permutations(range(m), n)),
+                   key=lambda total: (math.isinf(total), total))
+        total = sum(cost[i, j] for i, j in enumerate(assignment))
+        assert total == best or math.isclose(total, best)
+
+
+def test_lower_bound_matrix_matches_estimate(convertor):
+    rng = random.Random(2)
+    objects = []
+    for i in range(12):
+        x1, y1 = rng.randrange(0, 500), rng.randrange(0, 500)
+        objects.append(ImageObjectRegion(f"o{i}", x1, y1, x1 + rng.randrange(0, 200), y1 + rng.randrange(1, 200),
+                                         rng.choice([(255, 0, 0), (0, 255, 0), (0, 0, 255), (12, 34, 56)])))
+    bounds = lower_bound_matrix(convertor, objects[:5], objects)
+    assert bounds.shape == (5, 12)
+    model = convertor.heuristic_model
+    for i, a in enumerate(objects[:5]):
+        for j, b in enumerate(objects):
+            expected = model.estimate(ObjectState.from_region(a), ObjectState.from_region(b))
+            assert bounds[i, j] == pytest.approx(expected, rel=1e-7, abs=1e-9), (a, b)
+    assert lower_bound_matrix(convertor, [], objects).shape == (0, 12)
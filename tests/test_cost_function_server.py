@@ -0,0 +1,134 @@
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from cost_function_server import CostFunctionServer
+from object_converter import ObjectConvertor
+from transformation_manager import TransformationLibraryManager, create_default_object_operators
+
+FUNCTIONS = [
+    {"name": "translate_cost", "type": "translate", "formula": "(abs(dx) + abs(dy)) / 100"},
+    {"name": "scale_cost", "type": "scale", "formula": "abs(scale - 1.0)"},
+    {"name": "ratio_cost", "type": "ratio", "formula": "a / b + sqrt(c)"},
+    {"name": "branch_cost", "type": "branch", "formula": "a if a > 0 else -2 * a"},
+    {"name": "sum_cost", "type": "total", "formula": "sum((a, b)) / 2"},
+    {"name": "color_cost", "type": "paint", "formula": "diff(color1, color2) + area / 10000"},
+]
+
+
+def write_functions(path, functions):
+    with open(path, "w") as f:
+        json.dump(functions, f)
+    # Đảm bảo mtime khác lần ghi trước kể cả trên hệ thống file có độ phân giải thô
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = tmp_path / "cost_function.json"
+    write_functions(path, FUNCTIONS)
+    return CostFunctionServer(str(path))
+
+
+def test_edit_reloads_and_recompiles(server):
+    version = server.version
+    assert server.EvaluateCall({"type": "translate", "params": {"dx": 100, "dy": -50}}) == 1.5
+    edited = [dict(f, formula="abs(dx) + abs(dy)") if f["type"] == "translate" else f for f in FUNCTIONS]
+    write_functions(server.path, edited)
+    assert server.EvaluateCall({"type": "translate", "params": {"dx": 100, "dy": -50}}) == 150
+    assert server.version == version + 1
+    # Chỉ đổi mtime, nội dung giữ nguyên: mã băm trùng nên không biên dịch lại
+    compiled = server.get_cost_function("translate")
+    write_functions(server.path, edited)
+    assert server.get_cost_function("translate") is compiled
+    assert server.version == version + 1
+
+
+def test_cost_insert_bumps_version(server):
+    version = server.version
+    server.CostInsert({"name": "rotate_cost", "type": "rotate", "formula": "(angle / 180) ** 2"})
+    assert server.version == version + 1
+    assert server.EvaluateCall({"type": "rotate", "params": {"angle": 90}}) == 0.25
+    # File vừa ghi không bị đọc lại lần nữa
+    assert not server.reload()
+    assert server.version == version + 1
+    with pytest.raises(Exception):
+        server.CostInsert({"name": "other", "type": "rotate", "formula": "angle"})
+
+
+def test_operator_catalogue_rebuilds_on_version_change(tmp_path):
+    path = tmp_path / "cost_function.json"
+    with open(os.path.join(ROOT, "data", "cost_function.json")) as f:
+        write_functions(path, json.load(f))
+    tlm = TransformationLibraryManager()
+    for op in create_default_object_operators():
+        tlm.TLMinsert(op)
+    server = CostFunctionServer(str(path))
+    convertor = ObjectConvertor(tlm, server, os.path.join(ROOT, "data", "transformations.json"))
+    catalogue, model = convertor.operator_catalogue, convertor.heuristic_model
+    assert convertor.operator_catalogue is catalogue and convertor.heuristic_model is model
+
+    with open(path) as f:
+        functions = json.load(f)
+    write_functions(path, [dict(f, formula="(abs(dx) + abs(dy)) / 50") if f["type"] == "translate" else f
+                           for f in functions])
+    rebuilt = convertor.operator_catalogue
+    assert rebuilt is not catalogue and convertor.heuristic_model is not model
+    translate = next(op for op in rebuilt if op.operator.name == "translate")
+    assert translate.cost_function.formula == "(abs(dx) + abs(dy)) / 50"
+    assert convertor.heuristic_model.translate_rate == pytest.approx(model.translate_rate / 2)
+
+
+def rows(params, size):
+    """Bộ tham số thứ i của các cột trong params"""
+    for i in range(size):
+        yield {name: (tuple(value[i]) if np.ndim(value[i]) else value[i])
+               if isinstance(value, (list, np.ndarray)) else value for name, value in params.items()}
+
+
+def assert_matches_calls(server, type_, params, size):
+    batch = server.EvaluateBatch(type_, params)
+    func = server.get_cost_function(type_)
+    assert np.array_equal(batch, server.evaluate_batch(func, params), equal_nan=True)
+    assert batch.shape == (size,)
+    for value, row in zip(batch.tolist(), rows(params, size)):
+        try:
+            expected = server.EvaluateCall({"type": type_, "params": row})
+            expected = expected if math.isfinite(expected) else math.nan
+        except Exception:
+            expected = math.nan
+        if math.isnan(expected):
+            assert math.isnan(value), (type_, row, value)
+        else:
+            assert value == pytest.approx(expected, rel=1e-12), (type_, row, value)
+    return batch
+
+
+def test_batch_matches_evaluate_call(server):
+    rng = np.random.default_rng(0)
+    a = rng.integers(-5, 5, 50)
+    assert_matches_calls(server, "translate", {"dx": a, "dy": rng.integers(-300, 300, 50)}, 50)
+    assert_matches_calls(server, "scale", {"scale": rng.uniform(0.1, 3, 50)}, 50)
+    # Nhánh điều kiện và sum: tính từng bộ tham số
+    assert_matches_calls(server, "branch", {"a": a}, 50)
+    assert_matches_calls(server, "total", {"a": a, "b": 3}, 50)
+    colors = rng.integers(0, 256, (50, 3))
+    assert_matches_calls(server, "paint", {"color1": (10, 20, 30), "color2": colors, "area": 500}, 50)
+
+
+def test_batch_nan_fallbacks(server):
+    # Chia cho 0 và căn số âm: EvaluateCall báo lỗi, EvaluateBatch trả nan đúng vị trí
+    batch = assert_matches_calls(server, "ratio", {"a": [1, 2, 3, 4], "b": [1, 0, 2, 1], "c": [4, 1, -1, 0]}, 4)
+    assert np.isnan(batch).tolist() == [False, True, True, False]
+    # Cột lẫn kiểu (số và chuỗi) không tính được trên mảng: từng bộ, lỗi thành nan
+    batch = assert_matches_calls(server, "scale", {"scale": [2, "x", 0.5]}, 3)
+    assert np.isnan(batch).tolist() == [False, True, False]
+    with pytest.raises(ValueError):
+        server.EvaluateBatch("ratio", {"a": [1, 2], "b": [1, 2, 3], "c": 1})
+    with pytest.raises(ValueError):
+        server.EvaluateBatch("ratio", {"a": [1, 2]})
@@ -0,0 +1,38 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import REPRO_PAIR, reachable_pairs, region
+from feature_filter import FeatureMatrix, geometry_bounds
+from object_manager import ImageDatabase, ImageMeta, ObjectState
+
+
+def test_object_bounds_not_above_optimum(convertor):
+    pairs = [REPRO_PAIR + (1.2573593128807148, None)] + reachable_pairs(convertor, 8, seed=5)
+    db = ImageDatabase()
+    for i, (_, goal, _, _) in enumerate(pairs):
+        db.add_image(ImageMeta(f"img{i}", 1000, 1000, [region(goal)]))
+    matrix = FeatureMatrix(db)
+    try:
+        for i, (start, _, optimum, _) in enumerate(pairs):
+            bounds = matrix.object_bounds(convertor, ImageMeta("query", 1000, 1000, [region(start)]))
+            assert bounds[0, i] <= optimum + 1e-9, (start, optimum, bounds[0, i])
+        assert matrix.features.shape == (len(pairs), 4)
+    finally:
+        matrix.close()
+
+
+def test_geometry_bounds_match_heuristic(convertor):
+    # Bản NumPy phải trùng với CostHeuristic.geometry_cost trên từng cặp, kể cả kích thước 0
+    rng = random.Random(3)
+    boxes = []
+    for _ in range(40):
+        x1, y1 = rng.randrange(0, 500), rng.randrange(0, 500)
+        boxes.append((x1, y1, x1 + rng.choice([0, 1, rng.randrange(1, 300)]), y1 + rng.randrange(0, 300)))
+    model = convertor.heuristic_model
+    bounds = geometry_bounds(model, np.array(boxes), np.array(boxes[::-1]))
+    for i, a in enumerate(boxes):
+        for j, b in enumerate(boxes[::-1]):
+            expected = model.geometry_cost(ObjectState(*a, 0), ObjectState(*b, 0)) if a != b else 0.0
+            assert bounds[i, j] == pytest.approx(expected, rel=1e-7, abs=1e-9), (a, b)
@@ -0,0 +1,24 @@
+from conftest import REPRO_PAIR, dijkstra, reachable_pairs
+
+
+def assert_admissible(model, goal, optimum, path):
+    # Trên đường đi tối ưu, chi phí còn lại tới goal là h* chính xác
+    for state, cost_so_far in path:
+        assert model.estimate(state, goal) <= optimum - cost_so_far + 1e-9, (state, goal)
+
+
+def test_repro_pair_admissible(convertor):
+    start, goal = REPRO_PAIR
+    optimum, path = dijkstra(convertor, start, goal)
+    assert abs(optimum - 1.2573593) < 1e-6
+    assert_admissible(convertor.heuristic_model, goal, optimum, path)
+
+
+def test_random_pairs_admissible(convertor):
+    for start, goal, optimum, path in reachable_pairs(convertor, 6, seed=1):
+        assert_admissible(convertor.heuristic_model, goal, optimum, path)
+
+
+def test_goal_estimate_is_zero(convertor):
+    start, goal = REPRO_PAIR
+    assert convertor.heuristic_model.estimate(goal, goal) == 0
@@ -0,0 +1,82 @@
+import random
+
+from metric_index import ImageIndex, VPTree
+from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion
+
+
+class BoxIndex(ImageIndex):
+    """ImageIndex với khoảng cách L1 giữa các hình chữ nhật thay cho chi phí chuyển đổi (để test nhanh)"""
+
+    def distance(self, a, b):
+        return float(sum(abs(p - q) for o1, o2 in zip(a.objects, b.objects)
+                         for p, q in zip((o1.x1, o1.y1, o1.x2, o1.y2), (o2.x1, o2.y1, o2.x2, o2.y2))))
+
+    lower_bound = distance
+
+
+def random_objects(rng):
+    x, y = rng.randrange(0, 500), rng.randrange(0, 500)
+    return [ImageObjectRegion("o", x, y, x + rng.randrange(1, 100), y + rng.randrange(1, 100), (0, 0, 255))]
+
+
+def brute_force(index, db, query):
+    return sorted(index.distance(query, image) for name, image in db.images.items() if name != query.name)
+
+
+def test_knn_and_within_match_brute_force_after_updates():
+    rng = random.Random(0)
+    db = ImageDatabase()
+    for i in range(40):
+        db.add_image(ImageMeta(f"img{i}", 1000, 1000, random_objects(rng)))
+    index = BoxIndex(None, db, leaf_size=2)
+    try:
+        for _ in range(200):
+            # Sửa object tại chỗ rồi báo update, kể cả ảnh đang là điểm neo của cây
+            name = rng.choice(sorted(db.images))
+            db.images[name].objects[:] = random_objects(rng)
+            db.update_image(name)
+            query = db.images[rng.choice(sorted(db.images))]
+            expected = brute_force(index, db, query)
+            assert [d for _, d in index.knn(query, 3)] == expected[:3]
+            assert [d for _, d in index.within(query, 200.0)] == [d for d in expected if d <= 200.0]
+    finally:
+        index.close()
+
+
+def test_vptree_insert_delete_matches_brute_force():
+    rng = random.Random(1)
+    points = {i: (rng.random(), rng.random()) for i in range(60)}
+
+    def distance(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    tree = VPTree(distance, points.items(), leaf_size=3)
+    for step in range(150):
+        key = rng.randrange(80)
+        if key in points and rng.random() < 0.5:
+            del points[key]
+            tree.delete(key)
+        else:
+            points[key] = (rng.random(), rng.random())
+            tree.insert(key, points[key])
+        query = (rng.random(), rng.random())
+        expected = sorted(distance(query, p) for p in points.values())
+        assert len(tree) == len(points)
+        assert [d for _, d in tree.knn(query, 5)] == expected[:5]
+        assert [d for _, d in tree.within(query, 0.3)] == [d for d in expected if d <= 0.3]
+
+
+def test_leaf_split_skips_deleted_items():
+    def distance(a, b):
+        return abs(a - b)
+
+    tree = VPTree(distance, leaf_size=2)
+    for key in range(4):
+        tree.insert(key, float(key))
+    for key in range(3):
+        tree.delete(key)
+    # Lá có 1 phần tử còn hiệu lực và 3 phần tử đã xóa: thêm một phần tử không được tách lá theo phần tử đã xóa
+    tree.insert(10, 10.0)
+    assert tree.root.items is not None and len(tree.root.items) == 2
+    assert sorted(tree._entries[i][0] for i in tree.root.items) == [3, 10]
+    assert tree.knn(0.0, 5) == [(3, 3.0), (10, 10.0)]
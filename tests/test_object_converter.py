@@ -0,0 +1,153 @@
+import math
+import random
+
+from conftest import REPRO_PAIR, reachable_pairs, region
+from object_converter import BoundExceeded, ObjectConvertor, SearchStats
+from object_manager import ObjectState
+from transformation_manager import get_inverse
+
+
+def test_anytime_lower_bound_not_above_optimum(convertor):
+    pairs = [REPRO_PAIR + (1.2573593128807148, None)] + reachable_pairs(convertor, 4, seed=2)
+    for start, goal, optimum, _ in pairs:
+        result = convertor.convert_anytime(region(start), region(goal), deadline=None)
+        assert abs(result.cost - optimum) < 1e-9
+        assert result.lower_bound <= optimum + 1e-9
+        assert result.optimal
+        # Dừng sớm: cận dưới vẫn không vượt tối ưu, chỉ "optimal" khi chi phí đúng bằng tối ưu
+        early = convertor.convert_anytime(region(start), region(goal), deadline=None, max_steps=3)
+        assert early.lower_bound <= optimum + 1e-9
+        assert not early.optimal or abs(early.cost - optimum) < 1e-9
+
+
+def test_bound_exceeded_is_sound(convertor):
+    start, goal = REPRO_PAIR
+    optimum = 1.2573593128807148
+    for algorithm in ("astar", "bidirectional", "anytime", "ida"):
+        options = dict(algorithm=algorithm, max_coord=1000, deadline=None)
+        for max_cost in (0.5, 1.2, optimum):
+            result = convertor.convert(region(start), region(goal), max_cost=max_cost, **options)
+            assert isinstance(result, BoundExceeded), (algorithm, max_cost)
+            assert max_cost <= result.lower_bound <= optimum + 1e-9, (algorithm, result)
+        # Ngưỡng vừa lớn hơn tối ưu phải trả về lời giải tối ưu
+        for max_cost in (optimum + 1e-6, 1.27, 1.28):
+            plan = convertor.convert(region(start), region(goal), max_cost=max_cost, **options)
+            assert isinstance(plan, list), (algorithm, max_cost, plan)
+            assert abs(convertor.plan_cost(region(start), plan) - optimum) < 1e-9
+        stopped = convertor.convert(region(start), region(goal), max_expansions=3, **options)
+        assert isinstance(stopped, BoundExceeded) and stopped.reason == "max_expansions"
+        assert stopped.lower_bound <= optimum + 1e-9
+
+
+def test_astar_max_cost_on_random_pairs(convertor):
+    for start, goal, optimum, _ in reachable_pairs(convertor, 4, seed=4):
+        below = convertor.convert(region(start), region(goal), max_cost=optimum * 0.9, max_coord=1000)
+        assert isinstance(below, BoundExceeded) and below.lower_bound <= optimum + 1e-9
+        plan = convertor.convert(region(start), region(goal), max_cost=optimum + 1e-6, max_coord=1000)
+        assert abs(convertor.plan_cost(region(start), plan) - optimum) < 1e-9
+
+
+def test_batched_matches_scalar_successors(convertor):
+    batched = ObjectConvertor(convertor.tlm, convertor.cost_function_server, convertor.transformations_file,
+                              batched=True)
+    ops = convertor.operator_catalogue
+    for start, goal, optimum, path in reachable_pairs(convertor, 4, seed=6):
+        # Cùng trạng thái con, cùng phép biến đổi và cùng chi phí trên mọi nút của đường đi tối ưu
+        for state, _ in path:
+            scalar = sorted((s, c, str(op)) for s, c, op in convertor.successors(state, ops, 1000))
+            grouped = sorted((s, c, str(op)) for s, c, op in batched.successors(state, ops, 1000))
+            assert [(s, op) for s, _, op in scalar] == [(s, op) for s, _, op in grouped]
+            assert all(abs(a[1] - b[1]) < 1e-9 for a, b in zip(scalar, grouped))
+        plans = [c.convert(region(start), region(goal), max_coord=1000) for c in (convertor, batched)]
+        for plan in plans:
+            assert isinstance(plan, list)
+            assert abs(convertor.plan_cost(region(start), plan) - optimum) < 1e-9
+        assert [str(op) for op in plans[0]] == [str(op) for op in plans[1]]
+
+
+def test_anytime_stopped_early_is_not_no_solution(convertor):
+    start, goal = REPRO_PAIR
+    # Hết max_steps/deadline trước khi có lời giải: BoundExceeded("deadline") thay vì None
+    stopped = convertor.convert(region(start), region(goal), algorithm="anytime", max_steps=3, deadline=None)
+    assert isinstance(stopped, BoundExceeded) and stopped.reason == "deadline"
+    assert stopped.lower_bound <= 1.2573593128807148 + 1e-9
+
+
+def test_skipped_parameters_counted_not_printed(convertor, capsys):
+    convertor.transformations_data = [{"name": "translate", "parameters": {"dx": 10, "dz": 0}},
+                                      {"name": "translate", "parameters": {"dx": 10, "dy": 0}}]
+    try:
+        stats = SearchStats()
+        operators = convertor.instantiate_operators(stats)
+    finally:
+        convertor.transformations_data = convertor.load_transformations(convertor.transformations_file)
+    assert [op.params for op in operators] == [{"dx": 10, "dy": 0}]
+    assert stats.errors == 1 and capsys.readouterr().out == ""
+
+
+def test_inverse_functions_round_trip(convertor):
+    rng = random.Random(9)
+    colors = [0xFF0000, 0x00FF00, 0x0000FF, 0x123456]
+    operators = [op for op in convertor.operator_catalogue if get_inverse(op.operator.name) is not None]
+    assert {op.operator.name for op in operators} >= {"translate", "scale", "nonuniform_scale", "paint"}
+    for _ in range(30):
+        x1, y1 = rng.randrange(100, 500), rng.randrange(100, 500)
+        state = ObjectState(x1, y1, x1 + rng.randrange(1, 150), y1 + rng.randrange(1, 150), rng.choice(colors))
+        for op in operators:
+            after = op.apply_state(state)
+            candidates = list(get_inverse(op.operator.name)(op.params, after, colors))
+            # Trạng thái ban đầu luôn là ứng viên (trừ tô màu không đổi màu, đã bị loại khi sinh con)
+            if after != state:
+                assert state in candidates, (op, state, after)
+            # predecessors chỉ giữ ứng viên thật sự biến thành after, với chi phí như chiều xuôi
+            found = {pred: cost for pred, cost, _ in convertor.predecessors(
+                after, [(op, get_inverse(op.operator.name))], colors, 10000, SearchStats())}
+            assert all(op.apply_state(pred) == after for pred in found)
+            if after != state:
+                assert found[state] == convertor.evaluate_cost(op, state, after)
+
+
+def test_bidirectional_matches_astar(convertor):
+    for start, goal, optimum, _ in reachable_pairs(convertor, 4, seed=10):
+        plan = convertor.convert(region(start), region(goal), algorithm="bidirectional", max_coord=1000)
+        assert isinstance(plan, list)
+        assert abs(convertor.plan_cost(region(start), plan) - optimum) < 1e-9
+
+
+def test_factored_paints_at_cheapest_position(convertor):
+    # Chi phí tô màu tăng theo diện tích: tô sau khi thu nhỏ, trước khi phóng to
+    big, small = ObjectState(100, 100, 300, 300, 0xFF0000), ObjectState(150, 150, 250, 250, 0xFF0000)
+    for start, goal, painted_at in ((big, small._replace(color=0x00FF00), 1),
+                                    (small, big._replace(color=0x00FF00), 0)):
+        plan = convertor.convert(region(start), region(goal), factored=True, max_coord=1000)
+        names = [op.operator.name for op in plan]
+        assert names.index("paint") == painted_at, names
+        states, cost = convertor.replay(start, plan, max_coord=1000)
+        assert states[-1] == goal
+        # Mọi vị trí chèn khác của phép tô đều không rẻ hơn, và bằng tối ưu của tìm kiếm chung
+        paint = plan[painted_at]
+        rest = plan[:painted_at] + plan[painted_at + 1:]
+        for i in range(len(rest) + 1):
+            assert cost <= convertor.plan_cost(region(start), rest[:i] + [paint] + rest[i:]) + 1e-9
+        optimum = convertor.plan_cost(region(start), convertor.convert(region(start), region(goal), max_coord=1000))
+        assert abs(cost - optimum) < 1e-9
+
+
+def test_ida_respects_limits_on_random_pairs(convertor):
+    for start, goal, optimum, _ in reachable_pairs(convertor, 4, seed=12):
+        # IDA* mở lại nút ở mỗi vòng nên bỏ giới hạn max_steps, chỉ kiểm tra max_cost/max_expansions
+        options = dict(algorithm="ida", max_steps=math.inf, max_coord=1000)
+        below = convertor.convert(region(start), region(goal), max_cost=optimum * 0.9, **options)
+        assert isinstance(below, BoundExceeded) and below.reason == "max_cost"
+        assert optimum * 0.9 <= below.lower_bound <= optimum + 1e-9
+        plan = convertor.convert(region(start), region(goal), max_cost=optimum + 1e-6, **options)
+        assert isinstance(plan, list)
+        assert abs(convertor.plan_cost(region(start), plan) - optimum) < 1e-9
+        # Dừng sau 2 nút mở rộng: cận dưới là ngưỡng f của vòng đang chạy, không vượt tối ưu
+        stopped, stats = convertor.convert(region(start), region(goal), max_expansions=2, return_stats=True,
+                                           **options)
+        assert stats.expanded <= 2
+        if isinstance(stopped, BoundExceeded):
+            assert stopped.reason == "max_expansions" and stopped.lower_bound <= optimum + 1e-9
+        else:
+            assert abs(convertor.plan_cost(region(start), stopped) - optimum) < 1e-9
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from object_manager import pack_color, unpack_color
+
+
+def test_pack_color_accepts_integral_values():
+    expected = pack_color((255, 128, 0))
+    assert unpack_color(expected) == (255, 128, 0)
+    assert pack_color(np.array([255, 128, 0], dtype=np.uint8)) == expected
+    assert pack_color((np.int64(255), 128.0, np.float32(0))) == expected
+    assert pack_color([255, 128, 0]) == expected
+
+
+@pytest.mark.parametrize("color", [(256, 0, 0), (-1, 0, 0), (0.5, 0, 0), ("a", 0, 0), (float("nan"), 0, 0),
+                                   (0, 0), (0, 0, 0, 0)])
+def test_pack_color_rejects_invalid_values(color):
+    with pytest.raises(ValueError):
+        pack_color(color)
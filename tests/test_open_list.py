@@ -0,0 +1,57 @@
+import random
+from collections import namedtuple
+
+import pytest
+
+from open_list import OPEN_LISTS
+
+Node = namedtuple("Node", "state cost")
+
+
+def reference_order(operations):
+    """Thứ tự lấy ra theo (f, -g, thứ tự thêm), mỗi trạng thái chỉ giữ mục có g tốt nhất"""
+    best_g, entries, order, counter = {}, {}, [], 0
+    for operation in operations:
+        if operation is None:
+            if entries:
+                state = min(entries, key=entries.get)
+                f, neg_g, _ = entries.pop(state)
+                order.append((f, state, -neg_g))
+            continue
+        f, state, g = operation
+        if best_g.get(state, float("inf")) <= g:
+            continue
+        best_g[state] = g
+        entries[state] = (f, -g, counter)
+        counter += 1
+    return order
+
+
+@pytest.mark.parametrize("name", sorted(OPEN_LISTS))
+def test_pop_order_matches_heapq(name):
+    rng = random.Random(7)
+    for _ in range(20):
+        operations = []
+        for _ in range(300):
+            if rng.random() < 0.3:
+                operations.append(None)
+            else:
+                # f = g + h(trạng thái) như trong A*: nhiều f cùng thùng (resolution 1000), trạng thái
+                # lặp lại với g khác nhau
+                state = rng.randrange(40)
+                g = rng.choice([0.5, 1.0, 1.0004, 1.5, 2.0]) + rng.randrange(3) * 1e-4
+                operations.append((g + state % 4 * 3e-4, state, g))
+        operations.extend([None] * 300)
+        open_list, order = OPEN_LISTS[name](), []
+        for operation in operations:
+            if operation is None:
+                if len(open_list):
+                    f, node = open_list.pop()
+                    order.append((f, node.state, node.cost))
+            else:
+                f, state, g = operation
+                open_list.push(f, Node(state, g))
+        assert order == reference_order(operations)
+        assert len(open_list) == 0
+        with pytest.raises(IndexError):
+            open_list.pop()
@@ -0,0 +1,77 @@
+import math
+import os
+
+import pytest
+
+import parallel_convertor
+from conftest import ROOT, REPRO_PAIR, reachable_pairs, region
+from parallel_convertor import ConversionPool, convert_many
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Các cặp (source_id, target_id) thật sự được tìm kiếm tuần tự bởi convert_many"""
+    calls = []
+    convert_pair = parallel_convertor.convert_pair
+
+    def counting(converter, index, o1, o2, options):
+        calls.append((o1.obj_id, o2.obj_id))
+        return convert_pair(converter, index, o1, o2, options)
+
+    monkeypatch.setattr(parallel_convertor, "convert_pair", counting)
+    return calls
+
+
+def test_duplicate_pairs_searched_once(convertor, searches):
+    start, goal = REPRO_PAIR
+    # Cùng trạng thái, khác tên: chỉ tìm một lần, kết quả mang tên và vị trí của từng cặp
+    pairs = [(region(start, "a"), region(goal, "b")), (region(goal, "c"), region(start, "d")),
+             (region(start, "e"), region(goal, "f"))]
+    results = list(convert_many(convertor, pairs, max_coord=1000))
+    assert searches == [("a", "b"), ("c", "d")]
+    assert [(r.index, r.source_id, r.target_id) for r in results] == [(0, "a", "b"), (1, "c", "d"), (2, "e", "f")]
+    assert results[0].plan == results[2].plan and math.isclose(results[2].cost, 1.2573593128807148)
+
+
+def test_transposition_table_reuses_plan_suffix(convertor, searches):
+    start, goal = REPRO_PAIR
+    plan = convertor.convert(region(start), region(goal), max_coord=1000)
+    states, _ = convertor.replay(start, plan, max_coord=1000)
+    middle = states[1]
+    pairs = [(region(start, "a"), region(goal, "b")), (region(middle, "m"), region(goal, "n"))]
+    results = list(convert_many(convertor, pairs, max_coord=1000))
+    assert searches == [("a", "b")]
+    assert results[1].plan == results[0].plan[1:]
+    assert math.isclose(results[1].cost, convertor.plan_cost(region(middle), results[1].plan))
+    # Thuật toán không tối ưu: đoạn cuối lời giải không chắc tối ưu nên không dùng lại
+    searches.clear()
+    list(convert_many(convertor, pairs, algorithm="anytime", deadline=None, max_coord=1000))
+    assert searches == [("a", "b"), ("m", "n")]
+
+
+def test_ordered_and_completion_order(convertor):
+    start, goal = REPRO_PAIR
+    other = region(goal._replace(x1=goal.x1 + 100, x2=goal.x2 + 100), "z")
+    pairs = [(region(start, "a"), region(goal, "b")), (region(goal, "c"), other), (region(start, "e"), region(goal, "f"))]
+    ordered = list(convert_many(convertor, pairs, max_coord=1000))
+    assert [r.index for r in ordered] == [0, 1, 2]
+    # Không theo thứ tự: cặp trùng được trả ngay cùng cặp đầu tiên của nhóm
+    unordered = list(convert_many(convertor, pairs, ordered=False, max_coord=1000))
+    assert [r.index for r in unordered] == [0, 2, 1]
+    assert sorted(unordered) == ordered
+
+
+def test_pool_matches_sequential(convertor):
+    pairs = [(region(start, f"s{i}"), region(goal, f"g{i}"))
+             for i, (start, goal, _, _) in enumerate(reachable_pairs(convertor, 4, seed=8))]
+    pairs.append(pairs[0])
+    sequential = list(convert_many(convertor, pairs, max_coord=1000))
+    with ConversionPool(convertor.tlm, os.path.join(ROOT, "data", "cost_function.json"),
+                        os.path.join(ROOT, "data", "transformations.json"), max_workers=2) as pool:
+        parallel = list(convert_many(convertor, pairs, pool, max_coord=1000))
+        completed = list(convert_many(convertor, pairs, pool, ordered=False, max_coord=1000))
+    assert [r.index for r in parallel] == list(range(len(pairs)))
+    assert sorted(r.index for r in completed) == list(range(len(pairs)))
+    for a, b in zip(sequential, parallel):
+        assert a.error is None and b.error is None
+        assert math.isclose(a.cost, b.cost, abs_tol=1e-12), (a, b)
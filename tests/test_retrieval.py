@@ -0,0 +1,30 @@
+import math
+
+from conftest import REPRO_PAIR, region
+from object_manager import ImageDatabase, ImageMeta
+from retrieval import image_cost, top_k
+
+
+def test_top_k_keeps_images_cheaper_than_max_cost(convertor):
+    start, goal = REPRO_PAIR
+    db = ImageDatabase()
+    query = ImageMeta("query", 1000, 1000, [region(start, "a")])
+    db.add_image(query)
+    db.add_image(ImageMeta("target", 1000, 1000, [region(goal, "b")]))
+    results = top_k(convertor, db, query, k=1, max_cost=1.28, max_coord=1000)
+    assert [r.name for r in results] == ["target"]
+    assert math.isclose(results[0].cost, 1.2573593128807148)
+    assert top_k(convertor, db, query, k=1, max_cost=1.25, max_coord=1000) == []
+
+
+def test_top_k_reports_stopped_searches_as_unknown(convertor):
+    start, goal = REPRO_PAIR
+    db = ImageDatabase()
+    query = ImageMeta("query", 1000, 1000, [region(start, "a")])
+    db.add_image(query)
+    db.add_image(ImageMeta("target", 1000, 1000, [region(goal, "b")]))
+    # Dừng sau 3 nút: chưa biết chi phí, không được coi là không chuyển được hay xếp hạng
+    for options in (dict(max_expansions=3), dict(algorithm="anytime", max_steps=3, deadline=None)):
+        results, stats = top_k(convertor, db, query, k=1, max_coord=1000, return_stats=True, **options)
+        assert results == [] and stats.unknown == ["target"] and stats.searched == 0
+    assert math.isnan(image_cost(convertor, query, db.images["target"], max_coord=1000, max_expansions=3))
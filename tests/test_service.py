@@ -0,0 +1,136 @@
+import asyncio
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from service import ConversionService, HTTPError, MicroBatcher, parse_options
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ConversionService(str(tmp_path / "db.pkl"), os.path.join(ROOT, "data", "cost_function.json"),
+                                os.path.join(ROOT, "data", "transformations.json"), workers=1)
+    yield service
+    service.close()
+
+
+@pytest.mark.parametrize("options", [
+    {"algorithm": "nope"}, {"factored": "yes"}, {"max_steps": "10"}, {"max_coord": -1}, {"bound": 0.5},
+    {"max_cost": None}, {"max_expansions": True}, {"deadline": "soon"}, {"unknown": 1}, [],
+])
+def test_parse_options_rejects_invalid_values(options):
+    with pytest.raises(HTTPError) as error:
+        parse_options({"options": options})
+    assert error.value.status == 400
+
+
+def test_parse_options_accepts_valid_values():
+    options = {"algorithm": "ida", "factored": True, "max_steps": 100, "max_coord": 1000.0, "deadline": None,
+               "bound": 1.5, "max_cost": 3, "max_expansions": 50}
+    assert parse_options({"options": options}) == options
+
+
+def test_service_uses_one_converter_per_thread(tmp_path):
+    service = ConversionService(str(tmp_path / "db.pkl"), os.path.join(ROOT, "data", "cost_function.json"),
+                                os.path.join(ROOT, "data", "transformations.json"), workers=1)
+    try:
+        converters = [service.converter]
+        thread = threading.Thread(target=lambda: converters.append(service.converter))
+        thread.start()
+        thread.join()
+        assert converters[0] is service.converter and converters[1] is not converters[0]
+
+        body = json.dumps({"source": {"x1": 0, "y1": 0, "x2": 10, "y2": 10, "color": [0, 0, 0]},
+                           "target": {"x1": 0, "y1": 0, "x2": 10, "y2": 10, "color": [0, 0, 0]},
+                           "options": {"algorithm": "nope"}}).encode()
+        status, payload, _ = asyncio.run(service.dispatch("POST", "/convert", body))
+        assert status == 400 and "algorithm" in payload["error"]
+    finally:
+        service.close()
+
+
+def test_micro_batcher_coalesces_requests():
+    calls = []
+
+    async def handler(items, resolve):
+        calls.append(list(items))
+        for i, item in enumerate(items):
+            if item != "skip":
+                resolve(i, item * 2)
+
+    async def run():
+        batcher = MicroBatcher(handler, window=0.05, max_size=4)
+        # Đến trong cùng cửa sổ: một lô; đủ max_size thì gửi ngay không chờ cửa sổ
+        first = [batcher.submit(i) for i in range(3)]
+        results = await asyncio.gather(*first)
+        full = [batcher.submit(i) for i in range(5)] + [batcher.submit("skip")]
+        done = await asyncio.gather(*full, return_exceptions=True)
+        return results, done, batcher.snapshot()
+
+    results, done, snapshot = asyncio.run(run())
+    assert results == [0, 2, 4]
+    assert calls == [[0, 1, 2], [0, 1, 2, 3], [4, "skip"]]
+    # Yêu cầu handler không trả kết quả nhận lỗi thay vì treo
+    assert done[:5] == [0, 2, 4, 6, 8] and isinstance(done[5], RuntimeError)
+    assert snapshot == {"batches": 3, "items": 9, "mean_batch_size": 3.0}
+
+
+def cost_request(**extra):
+    return json.dumps({"type": "translate", "params": {"dx": 100, "dy": 0}, **extra}).encode()
+
+
+def test_backpressure_rejects_with_503(service):
+    service.max_pending = 1
+    service.pending = 1
+    status, payload, headers = asyncio.run(service.dispatch("POST", "/cost", cost_request()))
+    assert status == 503 and headers == {"Retry-After": "1"}
+    # GET không bị giới hạn
+    assert asyncio.run(service.dispatch("GET", "/health", b""))[0] == 200
+    service.pending = 0
+    status, payload, _ = asyncio.run(service.dispatch("POST", "/cost", cost_request()))
+    assert status == 200 and payload == {"cost": 1.0}
+    assert service.metrics["/cost"].rejected == 1
+
+
+def test_deadline_returns_504_and_holds_slot(service):
+    async def run():
+        status, payload, _ = await service.dispatch("POST", "/cost", cost_request(timeout=0))
+        # Việc hết hạn vẫn giữ chỗ trong hàng đợi tới khi chạy xong
+        held = service.pending
+        for _ in range(100):
+            if service.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        return status, held, service.pending
+
+    status, held, pending = asyncio.run(run())
+    assert status == 504 and held == 1 and pending == 0
+    assert service.metrics["/cost"].timeouts == 1
+
+
+@pytest.mark.parametrize("timeout", [-1, "5", True, None, float("nan")])
+def test_invalid_timeout_rejected_before_work(service, timeout):
+    status, payload, _ = asyncio.run(service.dispatch("POST", "/cost", cost_request(timeout=timeout)))
+    assert status == 400 and "timeout" in payload["error"]
+    assert service.cost_batcher.items == 0
+
+
+def test_response_maps_non_finite_to_null():
+    class Writer:
+        data = b""
+
+        def write(self, data):
+            self.data += data
+
+    writer = Writer()
+    payload = {"cost": math.inf, "lower_bound": float("nan"), "values": [1.5, np.float64(-np.inf)],
+               "array": np.array([np.nan, 2.0]), "nested": {"x": (math.inf, 3)}}
+    ConversionService._write_response(writer, 200, payload, {}, keep_alive=True)
+    body = writer.data.split(b"\r\n\r\n", 1)[1]
+    assert json.loads(body) == {"cost": None, "lower_bound": None, "values": [1.5, None], "array": [None, 2.0],
+                                "nested": {"x": [None, 3]}}
@@ -0,0 +1,66 @@
+import math
+import random
+
+from object_manager import ImageDatabase, ImageMeta, ImageObjectRegion
+from spatial_index import ObjectSpatialIndex, RTree
+
+
+def random_box(rng):
+    x, y = rng.randrange(0, 1000), rng.randrange(0, 1000)
+    return x, y, x + rng.randrange(0, 80), y + rng.randrange(0, 80)
+
+
+def point_distance(x, y, box):
+    return math.hypot(max(box[0] - x, 0, x - box[2]), max(box[1] - y, 0, y - box[3]))
+
+
+def test_rtree_queries_match_brute_force_after_updates():
+    rng = random.Random(0)
+    boxes = {key: random_box(rng) for key in range(300)}
+    tree = RTree(((box, key) for key, box in boxes.items()), max_entries=6)
+    for step in range(400):
+        key = rng.randrange(400)
+        if key in boxes:
+            assert tree.delete(boxes.pop(key), key)
+        if rng.random() < 0.6:
+            boxes[key] = random_box(rng)
+            tree.insert(boxes[key], key)
+        assert len(tree) == len(boxes)
+        if step % 10:
+            continue
+        window = random_box(rng)
+        window = window[:2] + (window[2] + 200, window[3] + 200)
+        assert sorted(k for _, k in tree.intersecting(window)) == sorted(
+            k for k, b in boxes.items() if b[0] <= window[2] and window[0] <= b[2]
+            and b[1] <= window[3] and window[1] <= b[3])
+        assert sorted(k for _, k in tree.within(window)) == sorted(
+            k for k, b in boxes.items() if window[0] <= b[0] and window[1] <= b[1]
+            and b[2] <= window[2] and b[3] <= window[3])
+        x, y = rng.randrange(0, 1000), rng.randrange(0, 1000)
+        assert sorted(k for _, k in tree.containing((x, y, x, y))) == sorted(
+            k for k, b in boxes.items() if b[0] <= x <= b[2] and b[1] <= y <= b[3])
+        expected = sorted(point_distance(x, y, b) for b in boxes.values())[:5]
+        assert [d for d, _, _ in tree.nearest(x, y, 5)] == expected
+
+
+def test_object_index_follows_in_place_updates():
+    rng = random.Random(1)
+    db = ImageDatabase()
+    for i in range(20):
+        db.add_image(ImageMeta(f"img{i}", 1000, 1000, [
+            ImageObjectRegion(str(j), *random_box(rng), (0, 0, 0)) for j in range(3)]))
+    index = ObjectSpatialIndex(db, max_entries=4)
+    try:
+        for _ in range(30):
+            name = rng.choice(sorted(db.images))
+            db.images[name].objects[rng.randrange(3)] = ImageObjectRegion("x", *random_box(rng), (0, 0, 0))
+            db.update_image(name)
+            if rng.random() < 0.2:
+                db.delete_image(rng.choice(sorted(db.images)))
+            x, y = rng.randrange(0, 1000), rng.randrange(0, 1000)
+            expected = sorted((n, i) for n, image in db.images.items() for i, o in enumerate(image.objects)
+                              if o.x1 <= x <= o.x2 and o.y1 <= y <= o.y2)
+            assert index.containing(x, y) == expected
+            assert len(index) == sum(len(image.objects) for image in db.images.values())
+    finally:
+        index.close()
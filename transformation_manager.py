@@ -1,8 +1,13 @@
-from dataclasses import dataclass
-from typing import Callable, Dict, Tuple, Any, List, Optional, get_args, get_origin
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple, Any, Iterable, List, Optional, get_args, get_origin
 import json
+import math
 import os
 
+import numpy as np
+
+from object_manager import ObjectState, pack_color
+
 TRANSFORMATION_JSON_FILE = "data/transformations.json"
 
 
@@ -11,15 +16,25 @@ class TransformationOperator:
     name: str
     parameters: Dict[str, type]
     apply_function: Callable[[Dict[str, Any], Any], Any]  # Apply to an object or coordinate
+    state_function: Optional[Callable[[Dict[str, Any], ObjectState], ObjectState]] = None  # Pure variant on ObjectState
 
 @dataclass
 class InstantiatedOperator:
     operator: TransformationOperator
     params: Dict[str, Any]
+    # Hàm chi phí đã biên dịch gắn sẵn (do ObjectConvertor gán), None nếu chưa gắn
+    cost_function: Any = field(default=None, compare=False, repr=False)
 
     def apply(self, target):
         return self.operator.apply_function(self.params, target)
 
+    def apply_state(self, state: ObjectState) -> ObjectState:
+        """Áp dụng lên trạng thái bất biến, trả về trạng thái mới"""
+        if self.operator.state_function is not None:
+            return self.operator.state_function(self.params, state)
+        # Toán tử không có biến thể thuần: đi qua ImageObjectRegion tạm thời
+        return ObjectState.from_region(self.apply(state.to_region()))
+
 class TransformationLibraryManager:
     def __init__(self):
         self.operators: Dict[str, TransformationOperator] = {}
@@ -38,6 +53,8 @@ class TransformationLibraryManager:
         
 
         if params is not None:
+            # Làm việc trên bản sao để không sửa dict của bên gọi
+            params = dict(params)
             for param, value in params.items():
                 expected_type = operator.parameters[param]
                 if expected_type == Tuple[int, int, int] and isinstance(value, list):
@@ -122,33 +139,221 @@ def move(params: Dict[str, Any], obj):
     return obj
 
 
+# --- Pure state functions (ObjectState vào -> ObjectState ra) ---
+def translate_state(params: Dict[str, Any], state: ObjectState) -> ObjectState:
+    dx = params["dx"]
+    dy = params["dy"]
+    return ObjectState(state.x1 + dx, state.y1 + dy, state.x2 + dx, state.y2 + dy, state.color)
+
+def scale_state(params: Dict[str, Any], state: ObjectState) -> ObjectState:
+    cx = (state.x1 + state.x2) / 2
+    cy = (state.y1 + state.y2) / 2
+    w = (state.x2 - state.x1) * params["scale"] / 2
+    h = (state.y2 - state.y1) * params["scale"] / 2
+    return ObjectState(int(cx - w), int(cy - h), int(cx + w), int(cy + h), state.color)
+
+def nonuniform_scaling_state(params: Dict[str, Any], state: ObjectState) -> ObjectState:
+    new_w = (state.x2 - state.x1) * params["scale_x"]
+    new_h = (state.y2 - state.y1) * params["scale_y"]
+    x1 = int(state.x1)
+    y1 = int(state.y1)
+    return ObjectState(x1, y1, x1 + int(new_w), y1 + int(new_h), state.color)
+
+def paint_state(params: Dict[str, Any], state: ObjectState) -> ObjectState:
+    color = params.get("color")
+    if not isinstance(color, tuple) or len(color) != 3:
+        raise ValueError("Tham số 'color' phải là tuple gồm 3 phần tử (r, g, b)")
+    return ObjectState(state.x1, state.y1, state.x2, state.y2, pack_color(color))
+
+def move_state(params: Dict[str, Any], state: ObjectState) -> ObjectState:
+    axis = params["axis"].lower()
+    distance = params["distance"]
+
+    if axis == "x":
+        return ObjectState(state.x1 + distance, state.y1, state.x2 + distance, state.y2, state.color)
+    if axis == "y":
+        return ObjectState(state.x1, state.y1 + distance, state.x2, state.y2 + distance, state.color)
+    raise ValueError("Tham số 'axis' phải là 'x' hoặc 'y'.")
+
+
+# --- Inverse functions (dùng cho tìm kiếm ngược) ---
+# Mỗi hàm nhận (params, state, colors) và trả về các trạng thái có thể đứng trước
+# state qua phép biến đổi với params; colors là các màu (đã đóng gói) cần xét cho
+# phép tô màu. Kết quả chỉ là ứng viên, bên gọi phải kiểm tra lại bằng apply_state
+# vì các phép co giãn làm tròn tọa độ.
+InverseFunction = Callable[[Dict[str, Any], ObjectState, Iterable[int]], Iterable[ObjectState]]
+
+INVERSE_FUNCTIONS: Dict[str, InverseFunction] = {}
+
+def register_inverse(operator_name: str, inverse_function: InverseFunction):
+    INVERSE_FUNCTIONS[operator_name] = inverse_function
+
+def get_inverse(operator_name: str) -> Optional[InverseFunction]:
+    return INVERSE_FUNCTIONS.get(operator_name)
+
+def translate_inverse(params: Dict[str, Any], state: ObjectState, colors):
+    return [translate_state({"dx": -params["dx"], "dy": -params["dy"]}, state)]
+
+def _scale_axis_inverse(a1: int, a2: int, scale: float):
+    # Đảo scale trên một trục rồi thử lệch quanh đó để bù phần làm tròn của int();
+    # scale < 1 gộp nhiều tọa độ vào một nên cửa sổ thử rộng cỡ 1 / scale
+    c = (a1 + a2) / 2
+    half = (a2 - a1) / scale / 2
+    b1, b2 = int(c - half), int(c + half)
+    span = max(1, math.ceil(1 / abs(scale)))
+    result = []
+    for p1 in range(b1 - span, b1 + span + 1):
+        for p2 in range(b2 - span, b2 + span + 1):
+            pc = (p1 + p2) / 2
+            ph = (p2 - p1) * scale / 2
+            if p1 <= p2 and int(pc - ph) == a1 and int(pc + ph) == a2:
+                result.append((p1, p2))
+    return result
+
+def scale_inverse(params: Dict[str, Any], state: ObjectState, colors):
+    scale = params["scale"]
+    if scale == 0:
+        return []
+    xs = _scale_axis_inverse(state.x1, state.x2, scale)
+    ys = _scale_axis_inverse(state.y1, state.y2, scale)
+    return [ObjectState(x1, y1, x2, y2, state.color) for x1, x2 in xs for y1, y2 in ys]
+
+def _size_preimage(size: int, scale: float):
+    lo = int(size / scale) - 1
+    hi = int((size + 1) / scale) + 1
+    return [w for w in range(max(lo, 0), hi + 1) if int(w * scale) == size]
+
+def nonuniform_scaling_inverse(params: Dict[str, Any], state: ObjectState, colors):
+    if params["scale_x"] == 0 or params["scale_y"] == 0:
+        return []
+    # int() cắt phần thập phân nên mọi kích thước trong [n / s, (n + 1) / s) đều cho cùng n
+    widths = _size_preimage(state.x2 - state.x1, params["scale_x"])
+    heights = _size_preimage(state.y2 - state.y1, params["scale_y"])
+    return [ObjectState(state.x1, state.y1, state.x1 + pw, state.y1 + ph, state.color)
+            for pw in widths for ph in heights]
+
+def paint_inverse(params: Dict[str, Any], state: ObjectState, colors):
+    # Tô màu là lũy đẳng: chỉ đứng trước được trạng thái đã có đúng màu đích
+    if state.color != pack_color(params["color"]):
+        return []
+    return [state._replace(color=color) for color in colors if color != state.color]
+
+def move_inverse(params: Dict[str, Any], state: ObjectState, colors):
+    return [move_state({"axis": params["axis"], "distance": -params["distance"]}, state)]
+
+register_inverse("translate", translate_inverse)
+register_inverse("scale", scale_inverse)
+register_inverse("nonuniform_scale", nonuniform_scaling_inverse)
+register_inverse("paint", paint_inverse)
+register_inverse("move", move_inverse)
+
+
+
+# --- Batch functions (một trạng thái, nhiều bộ tham số cùng lúc) ---
+# Mỗi hàm nhận (params, state) với params là tên tham số -> mảng NumPy (mỗi bộ tham
+# số một phần tử, màu là mảng (k, 3)) và trả về mảng int64 (k, 5) gồm x1, y1, x2, y2
+# và màu đã đóng gói. Phép tính giữ đúng thứ tự như hàm state tương ứng để kết quả
+# trùng khớp từng trạng thái; tham số không hợp lệ thì raise để bên gọi quay về
+# cách tính từng phép một.
+BatchFunction = Callable[[Dict[str, np.ndarray], ObjectState], np.ndarray]
+
+BATCH_FUNCTIONS: Dict[str, BatchFunction] = {}
+
+def register_batch(operator_name: str, batch_function: BatchFunction):
+    BATCH_FUNCTIONS[operator_name] = batch_function
+
+def get_batch(operator_name: str) -> Optional[BatchFunction]:
+    return BATCH_FUNCTIONS.get(operator_name)
+
+def _stack_states(k: int, x1, y1, x2, y2, color) -> np.ndarray:
+    result = np.empty((k, 5), dtype=np.int64)
+    for column, values in enumerate((x1, y1, x2, y2, color)):
+        result[:, column] = values
+    return result
+
+def _integer(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind not in "iu":
+        raise ValueError("Tham số dịch chuyển phải là số nguyên")
+    return values
+
+def translate_batch(params: Dict[str, np.ndarray], state: ObjectState) -> np.ndarray:
+    dx = _integer(params["dx"])
+    dy = _integer(params["dy"])
+    return _stack_states(len(dx), state.x1 + dx, state.y1 + dy, state.x2 + dx, state.y2 + dy, state.color)
+
+def scale_batch(params: Dict[str, np.ndarray], state: ObjectState) -> np.ndarray:
+    scale = params["scale"]
+    cx = (state.x1 + state.x2) / 2
+    cy = (state.y1 + state.y2) / 2
+    w = (state.x2 - state.x1) * scale / 2
+    h = (state.y2 - state.y1) * scale / 2
+    return _stack_states(len(scale), np.trunc(cx - w), np.trunc(cy - h), np.trunc(cx + w), np.trunc(cy + h),
+                         state.color)
+
+def nonuniform_scaling_batch(params: Dict[str, np.ndarray], state: ObjectState) -> np.ndarray:
+    new_w = (state.x2 - state.x1) * params["scale_x"]
+    new_h = (state.y2 - state.y1) * params["scale_y"]
+    x1 = int(state.x1)
+    y1 = int(state.y1)
+    return _stack_states(len(new_w), x1, y1, x1 + np.trunc(new_w), y1 + np.trunc(new_h), state.color)
+
+def paint_batch(params: Dict[str, np.ndarray], state: ObjectState) -> np.ndarray:
+    color = params["color"]
+    if color.ndim != 2 or color.shape[1] != 3:
+        raise ValueError("Tham số 'color' phải là tuple gồm 3 phần tử (r, g, b)")
+    if color.dtype.kind not in "iu" or color.min() < 0 or color.max() > 255:
+        raise ValueError("Màu phải gồm 3 số nguyên trong khoảng 0-255")
+    packed = (color[:, 0].astype(np.int64) << 16) | (color[:, 1].astype(np.int64) << 8) | color[:, 2]
+    return _stack_states(len(color), state.x1, state.y1, state.x2, state.y2, packed)
+
+def move_batch(params: Dict[str, np.ndarray], state: ObjectState) -> np.ndarray:
+    axis = np.char.lower(params["axis"].astype(str))
+    distance = _integer(params["distance"])
+    on_x = axis == "x"
+    if not np.all(on_x | (axis == "y")):
+        raise ValueError("Tham số 'axis' phải là 'x' hoặc 'y'.")
+    dx = np.where(on_x, distance, 0)
+    dy = np.where(on_x, 0, distance)
+    return _stack_states(len(distance), state.x1 + dx, state.y1 + dy, state.x2 + dx, state.y2 + dy, state.color)
+
+register_batch("translate", translate_batch)
+register_batch("scale", scale_batch)
+register_batch("nonuniform_scale", nonuniform_scaling_batch)
+register_batch("paint", paint_batch)
+register_batch("move", move_batch)
+
 # --- Default operators ---
 def create_default_object_operators() -> List[TransformationOperator]:
     return [
         TransformationOperator(
             name="translate",
             parameters={"dx": int, "dy": int},
-            apply_function=translate_object
+            apply_function=translate_object,
+            state_function=translate_state
         ),
         TransformationOperator(
             name="scale",
             parameters={"scale": float},
-            apply_function=scale_object
+            apply_function=scale_object,
+            state_function=scale_state
         ),
         TransformationOperator(
             name="nonuniform_scale",
             parameters={"scale_x": float, "scale_y": float},
-            apply_function=nonuniform_scaling
+            apply_function=nonuniform_scaling,
+            state_function=nonuniform_scaling_state
         ),
         TransformationOperator(
             name="paint",
             parameters={"color": Tuple[int, int, int]},
-            apply_function=paint
+            apply_function=paint,
+            state_function=paint_state
         ),
         TransformationOperator(
             name="move",
             parameters={"axis": str, "distance": int},
-            apply_function=move
+            apply_function=move,
+            state_function=move_state
         ),
     ]
 